@@ -43,7 +43,6 @@ class Application:
         # that instead.
         self.plumbing_bridge.load_from_files([find_resource('example.pdl')])
         self.procedures_bridge.load_from_file(find_resource('example.proc'))
-        self.controls_bridge.refresh()
 
     def _make_main_window(self):
         # TODO(jacob): Should we move this code somewhere else (maybe
@@ -11,21 +11,18 @@ class ControlsBridge(QObject):
         QObject.__init__(self)
 
         self.plumbing_bridge = plumb
+        plumb.engineLoaded.connect(self.refresh)
         self.plumbing_eng = self.plumbing_bridge.engine
         self.toggleable_components = []
         self._states = []
+        self._watch = None
+        self._watched_eng = None
 
     def set_component_states(self, index, state):
         if state == 'open':
             self.plumbing_eng.set_component_state(self.toggleable_components[index], 'open')
         elif state == 'closed':
             self.plumbing_eng.set_component_state(self.toggleable_components[index], 'closed')
-        if len(self.toggleable_components) <= 1:
-            self._states = [self.plumbing_eng.current_state(self.toggleable_components)]
-        else:
-            self._states = list(self.plumbing_eng.current_state(
-                self.toggleable_components).values())
-        self.component_state_sig.emit()
 
     def get_component_states(self):
         return self._states
@@ -39,10 +36,22 @@ class ControlsBridge(QObject):
         else:
             self._states = list(self.plumbing_eng.current_state(
                 self.toggleable_components).values())
+
+        # Keep the states up to date as components change, rather than re-querying all of them
+        if self._watch is not None:
+            self._watched_eng.unwatch(self._watch)
+        self._watch = self.plumbing_eng.watch_states(self._state_changed,
+                                                     self.toggleable_components)
+        self._watched_eng = self.plumbing_eng
+
         self.component_state_sig.emit()
         self.number_of_component_sig.emit()
         self.components_sig.emit()
 
+    def _state_changed(self, component, state, time):
+        self._states[self.toggleable_components.index(component)] = state
+        self.component_state_sig.emit()
+
     states = Property(list, get_component_states, set_component_states, notify=component_state_sig)
 
     @Property(int, notify=number_of_component_sig)
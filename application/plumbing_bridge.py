@@ -89,18 +89,9 @@ class PlumbingBridge(QObject):
     @Slot()
     def timeAdvance(self):
         self.paused = True
-        initial_time = self.engine.time
         states = self.engine.solve(return_resolution=self.step_size)
 
-        # TODO(jacob/wendi): Change the data format returned by
-        # PlumbingEngine.solve so we don't need to rearrange the data on
-        # this side.
-        pressures = {node: [] for node in states[0]}
-        for state in states:
-            for node, pressure in state.items():
-                pressures[node].append(pressure)
-        pressures_np = {node: np.array(pvals) for node, pvals in pressures.items()}
-
-        times = np.arange(len(states)) * self.step_size + initial_time + self.step_size
+        pressures_np = {node: states.node_pressures(node) for node in states.nodes}
+        times = states.times
 
         self.dataUpdated.emit(pressures_np, times)
@@ -19,7 +19,7 @@ class ProceduresBridge(QObject):
         self._proc_eng = top.ProceduresEngine()
         self.plumb = plumb
         plumb.engineLoaded.connect(self.updatePlumbingEngine)
-        plumb.dataUpdated.connect(self.refresh)
+        plumb.dataUpdated.connect(self.refreshConditions)
         self.control_bridge = control
 
         self._proc_steps = ProcedureStepsModel()
@@ -75,6 +75,13 @@ class ProceduresBridge(QObject):
         self._proc_eng.update_conditions()
         self._refresh_procedure_view()
 
+    @Slot()
+    def refreshConditions(self):
+        # Conditions are only re-evaluated once the plumbing engine's pressure watches say they
+        # could have changed, so the view only needs refreshing then
+        if self._proc_eng.update_conditions():
+            self._refresh_procedure_view()
+
     # Procedure controls
 
     @Slot(top.PlumbingEngine)
@@ -106,7 +113,6 @@ class ProceduresBridge(QObject):
     def procStepForward(self):
         self._proc_eng.next_step()
         self.refresh()
-        self.control_bridge.refresh()
 
     @Slot()
     def procAdvance(self):
@@ -122,8 +128,9 @@ class ProceduresBridge(QObject):
         while current_proc.index_of(self._proc_eng.current_step.step_id) < dest_index and \
                 len(self._proc_eng.current_step.conditions) > 0 and \
                 self._proc_eng._plumb.time < top.s_to_micros(utils.MAX_PLUMBING_TIME_S):
-            self._proc_eng.step_time()
             if self._proc_eng.step_position == top.StepPosition.Before:
                 self._proc_eng.execute_current()
-            if self._proc_eng.ready_to_proceed():
+            time_left = utils.MAX_PLUMBING_TIME_S - \
+                top.micros_to_s(self._proc_eng._plumb.time)
+            if self._proc_eng.run_until_transition(time_left):
                 self._proc_eng.next_step()
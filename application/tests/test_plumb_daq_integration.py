@@ -25,9 +25,11 @@ class MockPlumbingEngine:
 
     def solve(self, return_resolution):
         states = []
+        times = []
         for i in range(5):
-            states.append(self.step(return_resolution))
-        return states
+            states.append(list(self.step(return_resolution).values()))
+            times.append(self.time)
+        return top.Trajectory(self.pressures.keys(), times, states)
 
     def reset(self):
         self.time = 0
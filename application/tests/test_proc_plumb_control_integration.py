@@ -121,3 +121,24 @@ def test_control_panel_affects_plumbing_engine():
     assert(plumb_eng.current_state('injector_valve') == 'open')
     control_b.set_component_states(0, 'closed')
     assert(plumb_eng.current_state('injector_valve') == 'closed')
+
+
+def test_control_panel_follows_plumbing_engine():
+    plumb_b = PlumbingBridge()
+    control_b = ControlsBridge(plumb_b)
+
+    plumb_eng = make_plumbing_engine()
+    plumb_b.load_engine(plumb_eng)
+    assert control_b.toggleable_components == ['injector_valve']
+    assert control_b.states[0] == 'closed'
+
+    plumb_eng.set_component_state('injector_valve', 'open')
+    assert control_b.states[0] == 'open'
+
+    new_eng = make_plumbing_engine()
+    plumb_b.load_engine(new_eng)
+    assert control_b.states[0] == 'closed'
+
+    plumb_eng.set_component_state('injector_valve', 'closed')
+    new_eng.set_component_state('injector_valve', 'open')
+    assert control_b.states[0] == 'open'
@@ -39,4 +39,7 @@ setup(
         'Topic :: Scientific/Engineering',
     ],
     packages=find_packages(exclude=['application']),
+    entry_points={
+        'console_scripts': ['topside=topside.__main__:main'],
+    },
 )
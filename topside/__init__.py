@@ -7,6 +7,9 @@ from topside.plumbing import *
 import topside.procedures
 from topside.procedures import *
 
+import topside.simulate
+import topside.sweep
+
 import topside.visualization
 from topside.visualization import *
 
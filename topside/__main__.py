@@ -0,0 +1,116 @@
+import argparse
+import pathlib
+import sys
+
+import topside.simulate as simulate
+
+
+def _read_jobs(path):
+    """
+    Read a job file, with one simulation per line: the path to a ProcLang file followed by the
+    paths to one or more PDL files, separated by whitespace. Relative paths are relative to the
+    job file, and blank lines and lines starting with # are ignored.
+    """
+    base = pathlib.Path(path).parent
+    jobs = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if len(fields) < 2:
+                raise ValueError(f'{path}: expected a ProcLang file and PDL files, got "{line}"')
+            jobs.append((base / fields[0], [base / pdl for pdl in fields[1:]]))
+    return jobs
+
+
+def _output_paths(jobs, output_dir):
+    """Name the output file for each job after its ProcLang file, keeping the names unique."""
+    paths = []
+    used = set()
+    for proc_path, _ in jobs:
+        name = pathlib.Path(proc_path).stem
+        idx = 1
+        while name in used:
+            idx += 1
+            name = f'{pathlib.Path(proc_path).stem}_{idx}'
+        used.add(name)
+        paths.append(pathlib.Path(output_dir) / f'{name}.npz')
+    return paths
+
+
+def _simulate(args):
+    if args.jobs is not None:
+        try:
+            jobs = _read_jobs(args.jobs)
+        except (OSError, ValueError) as err:
+            print(f'simulate: {err}', file=sys.stderr)
+            return 2
+    elif args.proc_path is not None and args.pdl_paths:
+        jobs = [(args.proc_path, args.pdl_paths)]
+    else:
+        print('simulate: give a ProcLang file and PDL files, or --jobs', file=sys.stderr)
+        return 2
+
+    if args.jobs is None and args.output is not None:
+        outputs = [pathlib.Path(args.output)]
+    else:
+        output_dir = pathlib.Path(args.output if args.output is not None else '.')
+        output_dir.mkdir(parents=True, exist_ok=True)
+        outputs = _output_paths(jobs, output_dir)
+
+    kwargs = {
+        'nodes': args.nodes,
+        'max_time': args.max_time,
+        'resolution': args.resolution,
+        'decimation': args.decimate,
+    }
+    jobs = [(proc_path, pdl_paths, output) for (proc_path, pdl_paths), output in zip(jobs, outputs)]
+    workers = 1 if len(jobs) == 1 else args.workers
+    results = simulate.simulate_batch(jobs, workers, **kwargs)
+
+    failed = 0
+    for (proc_path, _, output), (transition, error) in zip(jobs, results):
+        if error is not None:
+            failed += 1
+            print(f'{proc_path}: FAILED: {error}', file=sys.stderr)
+        else:
+            time, proc, step = transition
+            print(f'{proc_path}: ended in {proc}.{step} at {time / 1e6:g}s -> {output}')
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    """Run the topside command line interface, returning its exit code."""
+    parser = argparse.ArgumentParser(prog='topside')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sim = subparsers.add_parser(
+        'simulate', help='Run procedures on plumbing engines without a display.',
+        description='Run a ProcLang procedure suite on the engine described by PDL files, '
+                    'writing node pressures and step transitions to an .npz file.')
+    sim.add_argument('proc_path', nargs='?', help='path to the ProcLang file')
+    sim.add_argument('pdl_paths', nargs='*', help='paths to the PDL files')
+    sim.add_argument('--jobs', help='file listing one ProcLang file and its PDL files per line, '
+                                    'to run several simulations in parallel')
+    sim.add_argument('-o', '--output', help='output file, or output directory with --jobs '
+                                            '(default: the current directory)')
+    sim.add_argument('--nodes', nargs='+', help='nodes to record (default: every node)')
+    sim.add_argument('--decimate', type=int, default=1,
+                     help='keep only every DECIMATE-th sample (default: 1)')
+    sim.add_argument('--resolution', type=int,
+                     help='longest time between samples, in microseconds '
+                          '(default: the engine time resolution)')
+    sim.add_argument('--max-time', type=float, default=simulate.DEFAULT_MAX_TIME_S,
+                     help='longest time to simulate, in seconds '
+                          f'(default: {simulate.DEFAULT_MAX_TIME_S})')
+    sim.add_argument('-j', '--workers', type=int,
+                     help='number of worker processes (default: one per processor)')
+    sim.set_defaults(run=_simulate)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,4 +3,5 @@ from topside.plumbing.invalid_reasons import *
 from topside.plumbing.plumbing_component import *
 from topside.plumbing.plumbing_engine import *
 from topside.plumbing.plumbing_utils import *
+from topside.plumbing.trajectory import *
 from topside.plumbing.node import *
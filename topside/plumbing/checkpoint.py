@@ -0,0 +1,199 @@
+import dataclasses
+import json
+
+import networkx as nx
+import numpy as np
+
+import topside.plumbing.exceptions as exceptions
+import topside.plumbing.invalid_reasons as invalid
+import topside.plumbing.node as node_types
+import topside.plumbing.plumbing_component as plumbing_component
+
+
+# A checkpoint file is laid out as:
+#   - MAGIC, followed by the format version and the length of the header as little-endian uint32s
+#   - a UTF-8 JSON header, describing the topology, the scalar state and the arrays that follow
+#   - the arrays themselves, each starting at a multiple of ALIGNMENT from the start of the file,
+#     so that they can be memory-mapped in place
+MAGIC = b'TSCK'
+VERSION = 1
+ALIGNMENT = 64
+_PREFIX = np.dtype([('magic', 'S4'), ('version', '<u4'), ('header_len', '<u4')])
+
+
+def _encode(value):
+    """Encode a value as JSON-compatible data, keeping the types that JSON would lose."""
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_encode(item) for item in value]
+        if isinstance(value, list):
+            return items
+        return {'tuple' if isinstance(value, tuple) else 'set': items}
+    if isinstance(value, dict):
+        return {'dict': [[_encode(key), _encode(val)] for key, val in value.items()]}
+    if isinstance(value, invalid.PlumbingInvalidReason):
+        return {'error': type(value).__name__,
+                'fields': {field.name: _encode(getattr(value, field.name))
+                           for field in dataclasses.fields(value)}}
+    if isinstance(value, plumbing_component.PlumbingComponent):
+        return {'component': value.name,
+                'edges': _encode(list(value.component_graph.edges(keys=True))),
+                'states': _encode(value.states),
+                'current_state': value.current_state,
+                'errors': _encode(value.error_set)}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _decode(data):
+    """Invert _encode()."""
+    if isinstance(data, list):
+        return [_decode(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    if 'tuple' in data:
+        return tuple(_decode(item) for item in data['tuple'])
+    if 'set' in data:
+        return {_decode(item) for item in data['set']}
+    if 'dict' in data:
+        return {_decode(key): _decode(val) for key, val in data['dict']}
+    if 'error' in data:
+        reason = getattr(invalid, data['error'])
+        return reason(**{name: _decode(val) for name, val in data['fields'].items()})
+    if 'component' in data:
+        # Components are rebuilt directly rather than through __init__, which would convert
+        # their (already converted) FCs again.
+        component = plumbing_component.PlumbingComponent.__new__(
+            plumbing_component.PlumbingComponent)
+        component.name = data['component']
+        component.component_graph = nx.MultiDiGraph(_decode(data['edges']))
+        component.states = _decode(data['states'])
+        component.current_state = data['current_state']
+        component.error_set = _decode(data['errors'])
+        return component
+    raise exceptions.BadInputError(f'Unrecognized checkpoint data: {data}')
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save_checkpoint(engine, path):
+    """
+    Write the topology and state of a PlumbingEngine to a checkpoint file at path.
+
+    Node pressures, fixed flags and the endpoints and FCs of every edge are written as raw
+    NumPy arrays; everything else is described in the file's JSON header.
+    """
+    graph = engine.plumbing_graph
+    nodes = list(graph.nodes())
+    node_index = {node: idx for idx, node in enumerate(nodes)}
+    bodies = [engine.get_node_body(node) for node in nodes]
+    edges = list(graph.edges(keys=True, data='FC'))
+
+    arrays = {
+        'pressures': np.array([body.get_pressure() for body in bodies], dtype='<f8'),
+        'fixed': np.array([body.get_fixed() for body in bodies], dtype=bool),
+        'src': np.array([node_index[edge[0]] for edge in edges], dtype='<i8'),
+        'dst': np.array([node_index[edge[1]] for edge in edges], dtype='<i8'),
+        'fc': np.array([np.nan if fc is None else fc for _, _, _, fc in edges], dtype='<f8'),
+    }
+
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        layout[name] = {'dtype': arr.dtype.str, 'shape': list(arr.shape), 'offset': offset}
+        offset = _align(offset + arr.nbytes)
+
+    header = {
+        'time': engine.time,
+        'time_res': engine.time_res,
+        'nodes': _encode(nodes),
+        'edge_keys': [key for _, _, key, _ in edges],
+        'components': _encode(engine.component_dict),
+        'mapping': _encode(engine.mapping),
+        'fixed_pressures': _encode(engine.fixed_pressures),
+        'errors': _encode(engine.error_set),
+        'initial_components': _encode(engine.initial_components),
+        'initial_mapping': _encode(engine.initial_mapping),
+        'initial_pressures': _encode(engine.initial_pressure),
+        'initial_states': _encode(engine.initial_state),
+        'arrays': layout,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _align(_PREFIX.itemsize + len(header_bytes))
+    header_bytes = header_bytes.ljust(data_start - _PREFIX.itemsize)
+
+    prefix = np.array((MAGIC, VERSION, len(header_bytes)), dtype=_PREFIX)
+    with open(path, 'wb') as f:
+        f.write(prefix.tobytes())
+        f.write(header_bytes)
+        for name, arr in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(arr.tobytes())
+
+
+def read_checkpoint(path):
+    """
+    Read a checkpoint file without building an engine from it.
+
+    Returns a tuple of (header, arrays), where header is the decoded JSON header and arrays is
+    a dict of read-only arrays memory-mapped from the file.
+    """
+    with open(path, 'rb') as f:
+        prefix = np.frombuffer(f.read(_PREFIX.itemsize), dtype=_PREFIX)
+        if len(prefix) != 1 or prefix['magic'][0] != MAGIC:
+            raise exceptions.BadInputError(f'{path} is not a plumbing engine checkpoint.')
+        version = int(prefix['version'][0])
+        if version > VERSION:
+            raise exceptions.BadInputError(
+                f'Checkpoint version {version} is newer than the supported version {VERSION}.')
+        header_len = int(prefix['header_len'][0])
+        header = json.loads(f.read(header_len).decode('utf-8'))
+
+    data_start = _PREFIX.itemsize + header_len
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        shape = tuple(spec['shape'])
+        if np.prod(shape) == 0:
+            arrays[name] = np.zeros(shape, dtype=spec['dtype'])
+            continue
+        arrays[name] = np.memmap(path, dtype=spec['dtype'], mode='r', shape=shape,
+                                 offset=data_start + spec['offset'])
+    return header, arrays
+
+
+def load_checkpoint(engine, path):
+    """Replace the topology and state of a PlumbingEngine with those in a checkpoint file."""
+    header, arrays = read_checkpoint(path)
+
+    engine.initial_components = _decode(header['initial_components'])
+    engine.initial_mapping = _decode(header['initial_mapping'])
+    engine.initial_pressure = _decode(header['initial_pressures'])
+    engine.initial_state = _decode(header['initial_states'])
+
+    graph = nx.MultiDiGraph()
+    store = node_types.PressureStore(capacity=max(len(header['nodes']), 1))
+    graph.graph['pressures'] = store
+    nodes = _decode(header['nodes'])
+    for node in nodes:
+        graph.add_node(node, body=node_types.instantiate_node(node, store))
+    store.write(np.arange(len(nodes)), arrays['pressures'])
+    store.fixed[:len(nodes)] = arrays['fixed']
+
+    for src, dst, key, fc in zip(arrays['src'].tolist(), arrays['dst'].tolist(),
+                                 header['edge_keys'], arrays['fc'].tolist()):
+        if np.isnan(fc):
+            graph.add_edge(nodes[src], nodes[dst], key)
+        else:
+            graph.add_edge(nodes[src], nodes[dst], key, FC=fc)
+
+    engine.plumbing_graph = graph
+    engine.component_dict = _decode(header['components'])
+    engine.mapping = _decode(header['mapping'])
+    engine.fixed_pressures = _decode(header['fixed_pressures'])
+    engine.error_set = _decode(header['errors'])
+    engine.time = header['time']
+    engine.time_res = header['time_res']
+    engine._compiled = None
+    engine._topology_shared = False
@@ -0,0 +1,244 @@
+import numpy as np
+import scipy.sparse as sparse
+import scipy.sparse.csgraph as csgraph
+
+import topside.plumbing.plumbing_utils as utils
+
+
+class Island:
+    """
+    A set of nodes joined to each other, but to no other nodes, by edges with a nonzero FC.
+
+    Islands can't exchange flow with each other, so each one can be stepped on its own. An
+    Island exposes the same src, dst and fc arrays as a CompiledGraph, indexed locally to its
+    own nodes and edges, so that it can be passed to the integrator kernels in place of one.
+    """
+
+    def __init__(self, graph, label, nodes, edges):
+        """
+        Initialize an island.
+
+        Parameters
+        ----------
+
+        graph: CompiledGraph
+            graph is the compiled graph that the island is part of.
+
+        label: int
+            label is the island's label in graph.island_labels.
+
+        nodes: numpy.ndarray
+            nodes holds the indices in graph of the nodes in the island.
+
+        edges: numpy.ndarray
+            edges holds the indices in graph of the open edges between those nodes.
+        """
+        self.graph = graph
+        self.label = label
+        self.nodes = nodes
+        self.edges = edges
+
+        local = {node: idx for idx, node in enumerate(nodes.tolist())}
+        self.src = np.array([local[node] for node in graph.src[edges].tolist()], dtype=np.intp)
+        self.dst = np.array([local[node] for node in graph.dst[edges].tolist()], dtype=np.intp)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def fc(self):
+        return self.graph.fc[self.edges]
+
+
+class CompiledGraph:
+    """
+    Array-backed representation of a plumbing graph, used for solving.
+
+    Nodes and edges of the networkx graph are assigned integer indices once, at
+    compilation time. Edge endpoints and FCs are then stored as flat arrays (with
+    CSR-style adjacency for per-node access), so that stepping the engine never
+    needs to go back through the networkx graph.
+
+    The graph is also split into islands of nodes joined by open (nonzero FC) edges.
+    These are kept up to date incrementally as FCs change: opening an edge merges the
+    two islands it joins, and closing one only re-examines the island it was in.
+
+    Islands can be parked once they have settled, so that stepping can skip them. A parked
+    island is woken whenever the FC of one of its edges or the pressure of one of its nodes
+    is changed from outside.
+
+    A CompiledGraph only captures topology and FCs; it must be recompiled whenever
+    nodes or edges are added to or removed from the graph it was built from.
+    """
+
+    def __init__(self, plumbing_graph):
+        """
+        Compile a plumbing graph.
+
+        Parameters
+        ----------
+
+        plumbing_graph: networkx.MultiDiGraph
+            plumbing_graph is the main graph of a PlumbingEngine. Every node must
+            have a 'body' attribute and every edge an 'FC' attribute.
+        """
+        self.graph = plumbing_graph
+
+        self.nodes = list(plumbing_graph.nodes())
+        self.node_index = {node: idx for idx, node in enumerate(self.nodes)}
+        self.bodies = [plumbing_graph.nodes[node]['body'] for node in self.nodes]
+        # When every body is a view into the same PressureStore, pressures are gathered and
+        # scattered through it as a vector rather than one body at a time.
+        stores = {id(body.store): body.store for body in self.bodies if hasattr(body, 'store')}
+        if len(stores) == 1 and all(hasattr(body, 'store') for body in self.bodies):
+            self.store = next(iter(stores.values()))
+            self.slots = np.array([body.slot for body in self.bodies], dtype=np.intp)
+        else:
+            self.store = None
+            self.slots = None
+
+        self.edges = list(plumbing_graph.edges(keys=True))
+        self.edge_index = {edge: idx for idx, edge in enumerate(self.edges)}
+
+        num_nodes = len(self.nodes)
+        self.src = np.array([self.node_index[edge[0]] for edge in self.edges], dtype=np.intp)
+        self.dst = np.array([self.node_index[edge[1]] for edge in self.edges], dtype=np.intp)
+        self.fc = np.array([fc for _, _, fc in plumbing_graph.edges(data='FC')], dtype=float)
+
+        # Maps a vector of edge flows to the net flow into every node.
+        edge_ids = np.arange(len(self.edges))
+        self.incidence = sparse.csr_matrix(
+            (np.concatenate([np.ones(len(self.edges)), -np.ones(len(self.edges))]),
+             (np.concatenate([self.dst, self.src]), np.concatenate([edge_ids, edge_ids]))),
+            shape=(num_nodes, len(self.edges)))
+
+        open_edges = self.fc > 0
+        links = sparse.coo_matrix((np.ones(np.count_nonzero(open_edges)),
+                                   (self.src[open_edges], self.dst[open_edges])),
+                                  shape=(num_nodes, num_nodes))
+        num_islands, self.island_labels = csgraph.connected_components(links, directed=False)
+        self._next_label = num_islands
+        # Islands are built lazily, and rebuilt after an edge in them opens or closes.
+        self._islands = {}
+        self._split_labels = set()
+        self._parked = set()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def edge_ids(self, edges):
+        """Return an array of the indices of the given edges."""
+        return np.array([self.edge_index[edge] for edge in edges], dtype=np.intp)
+
+    def update_fc(self, edge_fcs):
+        """Update the FCs of compiled edges from a dict of {edge: FC}."""
+        self.set_fc(self.edge_ids(edge_fcs.keys()), edge_fcs.values())
+
+    def set_fc(self, edge_ids, fcs):
+        """Update the FCs of compiled edges, given by index, from a matching iterable of FCs."""
+        for idx, fc in zip(edge_ids, fcs):
+            if self.fc[idx] == fc:
+                continue
+            was_open = self.fc[idx] > 0
+            self.fc[idx] = fc
+            src_label = self.island_labels[self.src[idx]]
+            dst_label = self.island_labels[self.dst[idx]]
+            self._parked.discard(src_label)
+            self._parked.discard(dst_label)
+            if was_open == (fc > 0):
+                continue
+
+            if fc > 0:
+                self._merge_islands(src_label, dst_label)
+            else:
+                self._islands.pop(src_label, None)
+                self._split_labels.add(src_label)
+
+    def _merge_islands(self, label, other_label):
+        """Join two islands into one, keeping label."""
+        self._islands.pop(label, None)
+        if label == other_label:
+            return
+        self._islands.pop(other_label, None)
+        self.island_labels[self.island_labels == other_label] = label
+        if other_label in self._split_labels:
+            self._split_labels.discard(other_label)
+            self._split_labels.add(label)
+
+    def _split_island(self, label):
+        """Relabel the nodes of an island that may have come apart after an edge closed."""
+        nodes = np.flatnonzero(self.island_labels == label)
+        local = np.full(len(self.nodes), -1, dtype=np.intp)
+        local[nodes] = np.arange(len(nodes))
+        edges = (local[self.src] >= 0) & (self.fc > 0)
+        links = sparse.coo_matrix((np.ones(np.count_nonzero(edges)),
+                                   (local[self.src[edges]], local[self.dst[edges]])),
+                                  shape=(len(nodes), len(nodes)))
+        num_parts, parts = csgraph.connected_components(links, directed=False)
+        if num_parts > 1:
+            self.island_labels[nodes] = self._next_label + parts
+            self._next_label += num_parts
+
+    def islands(self):
+        """Return a list of the Islands that the graph is currently split into."""
+        for label in self._split_labels:
+            self._split_island(label)
+        self._split_labels.clear()
+
+        labels = np.unique(self.island_labels)
+        for label in labels.tolist():
+            if label not in self._islands:
+                nodes = np.flatnonzero(self.island_labels == label)
+                edges = np.flatnonzero((self.island_labels[self.src] == label) & (self.fc > 0))
+                self._islands[label] = Island(self, label, nodes, edges)
+        for label in set(self._islands) - set(labels.tolist()):
+            del self._islands[label]
+        self._parked &= set(labels.tolist())
+
+        return [self._islands[label] for label in labels.tolist()]
+
+    def park(self, island):
+        """Mark an island as settled, so that it can be skipped until it is woken."""
+        self._parked.add(island.label)
+
+    def is_parked(self, island):
+        """Return True if island has been parked and not woken since."""
+        return island.label in self._parked
+
+    def parked(self):
+        """Return the labels of the islands that are currently parked."""
+        return frozenset(self._parked)
+
+    def set_parked(self, labels):
+        """Park exactly the islands labelled in labels, waking every other island."""
+        self._parked = set(labels)
+
+    def wake(self, node=None):
+        """Wake the island containing node, or every island if node is None."""
+        if node is None:
+            self._parked.clear()
+        else:
+            self._parked.discard(self.island_labels[self.node_index[node]])
+
+    def free_mask(self, fixed_pressures):
+        """Return a boolean array that is True for every node whose pressure may change."""
+        free = np.ones(len(self.nodes), dtype=bool)
+        for node in fixed_pressures:
+            free[self.node_index[node]] = False
+        if utils.ATM in self.node_index:
+            free[self.node_index[utils.ATM]] = False
+        return free
+
+    def gather_pressures(self):
+        """Return a vector of the current pressure at every compiled node."""
+        if self.store is not None:
+            return self.store.pressure[self.slots]
+        return np.array([body.get_pressure() for body in self.bodies], dtype=float)
+
+    def scatter_pressures(self, pressures, free):
+        """Write pressures back to the node bodies of every free node."""
+        if self.store is not None:
+            self.store.write(self.slots[free], pressures[free])
+            return
+        for idx in np.flatnonzero(free):
+            self.bodies[idx].update_pressure(float(pressures[idx]))
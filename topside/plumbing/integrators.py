@@ -0,0 +1,539 @@
+import numpy as np
+import scipy.linalg
+import scipy.sparse as sparse
+import scipy.sparse.csgraph as csgraph
+import scipy.sparse.linalg as sparse_linalg
+
+# Blocks of linked nodes up to this size are exponentiated as dense matrices, which copes
+# with stiff (fast teq) edges in a handful of squarings. Larger blocks use the sparse
+# expm-action instead.
+DENSE_EXPM_MAX_NODES = 64
+
+# Backward Euler steps on graphs up to this many nodes solve a dense linear system, which is
+# much cheaper to set up than a sparse one.
+DENSE_IMPLICIT_MAX_NODES = 64
+
+# Relative tolerance on pressure differences used to decide whether the flow direction along
+# an edge changed over an exponential step.
+PATTERN_RTOL = 1e-9
+
+# Maximum number of times a backward Euler step is re-solved with an updated set of flowing
+# edges before its result is accepted.
+IMPLICIT_MAX_ITERATIONS = 4
+
+# Fraction of a TR-BDF2 step taken by its trapezoidal stage. With this choice both stages solve
+# the same kind of backward Euler system, and the method is L-stable.
+TRBDF2_GAMMA = 2 - np.sqrt(2)
+
+# Maximum number of times the set of flowing edges is refined when solving directly for the
+# steady state of a system with fixed pressures.
+STEADY_STATE_MAX_ITERATIONS = 20
+
+# Highest time derivative of pressure examined when deciding which way flow will start along
+# an edge whose ends are at equal pressure.
+MAX_TIE_ORDER = 32
+
+
+def flow_rates(graph, pressures):
+    """
+    Return the rate of change of pressure at every node, as if no node were fixed.
+
+    Each edge carries a flow of FC * (p_source - p_target) if its source is at a
+    higher pressure than its target, and no flow otherwise. Flows are then summed
+    into their target nodes and subtracted from their source nodes.
+    """
+    flows = np.maximum(pressures[graph.src] - pressures[graph.dst], 0) * graph.fc
+    num_nodes = len(pressures)
+    return np.bincount(graph.dst, flows, num_nodes) - np.bincount(graph.src, flows, num_nodes)
+
+
+def euler_step(graph, pressures, free, time_res):
+    """
+    Advance node pressures by a single forward Euler step.
+
+    Rates of change are computed by flow_rates(); fixed nodes (including the
+    atmosphere) are masked out and keep their current pressure.
+
+    Parameters
+    ----------
+
+    graph: CompiledGraph
+        graph is the compiled plumbing graph to step.
+
+    pressures: numpy.ndarray
+        pressures is the vector of current node pressures, indexed the same
+        way as the nodes of graph.
+
+    free: numpy.ndarray
+        free is a boolean mask of the nodes whose pressure may change; all
+        other nodes keep their current pressure.
+
+    time_res: int
+        time_res is the length of the step, in microseconds.
+
+    Returns a new vector of node pressures.
+    """
+    dp = flow_rates(graph, pressures)
+    return pressures + np.where(free, dp, 0) * time_res
+
+
+def multirate_euler_step(graph, pressures, free, time_res, fast, fine_res):
+    """
+    Advance node pressures by time_res, sub-cycling fast edges with shorter forward Euler steps.
+
+    Slow edges that touch either end of a fast edge are sub-cycled along with the fast edges, so
+    that they see the fast transient at their ends. Nodes at either end of a sub-cycled edge take
+    steps of fine_res, recomputing flows along sub-cycled edges each time. Flows along the
+    remaining slow edges are computed once, from the current pressures, and held for the whole
+    of time_res; nodes with only those edges take a single step with them, and sub-cycled nodes
+    add the held flows to every fine step, so that what flows across a slow edge is the same at
+    both of its ends.
+
+    Parameters
+    ----------
+
+    graph: CompiledGraph
+        graph is the compiled plumbing graph to step.
+
+    pressures: numpy.ndarray
+        pressures is the vector of current node pressures, indexed the same
+        way as the nodes of graph.
+
+    free: numpy.ndarray
+        free is a boolean mask of the nodes whose pressure may change; all
+        other nodes keep their current pressure.
+
+    time_res: int
+        time_res is the length of the step, in microseconds.
+
+    fast: numpy.ndarray
+        fast is a boolean mask of the edges of graph to sub-cycle.
+
+    fine_res: int
+        fine_res is the length of each sub-cycled step, in microseconds.
+
+    Returns a new vector of node pressures.
+    """
+    num_nodes = len(pressures)
+    fast_ends = np.unique(np.concatenate([graph.src[fast], graph.dst[fast]]))
+    fast = fast | np.isin(graph.src, fast_ends) | np.isin(graph.dst, fast_ends)
+    slow = ~fast
+    src = graph.src[slow]
+    dst = graph.dst[slow]
+    flows = np.maximum(pressures[src] - pressures[dst], 0) * graph.fc[slow]
+    slow_dp = np.bincount(dst, flows, num_nodes) - np.bincount(src, flows, num_nodes)
+    slow_dp = np.where(free, slow_dp, 0)
+    new_pressures = pressures + slow_dp * time_res
+
+    fast_nodes = np.unique(np.concatenate([graph.src[fast], graph.dst[fast]]))
+    fast_src = np.searchsorted(fast_nodes, graph.src[fast])
+    fast_dst = np.searchsorted(fast_nodes, graph.dst[fast])
+    fast_fc = graph.fc[fast]
+    fast_free = free[fast_nodes]
+    fast_slow_dp = slow_dp[fast_nodes]
+    fast_pressures = pressures[fast_nodes]
+    num_fast = len(fast_nodes)
+
+    elapsed = 0
+    while elapsed < time_res:
+        dt = min(fine_res, time_res - elapsed)
+        flows = np.maximum(fast_pressures[fast_src] - fast_pressures[fast_dst], 0) * fast_fc
+        dp = np.bincount(fast_dst, flows, num_fast) - np.bincount(fast_src, flows, num_fast)
+        fast_pressures = fast_pressures + (np.where(fast_free, dp, 0) + fast_slow_dp) * dt
+        elapsed += dt
+
+    new_pressures[fast_nodes] = fast_pressures
+    return new_pressures
+
+
+def ensemble_euler_step(graph, pressures, fcs, free, time_res):
+    """
+    Advance the node pressures of many variants of one graph by a single forward Euler step.
+
+    This is euler_step() applied to every row of pressures at once, with the FCs of each
+    variant taken from the matching row of fcs instead of from graph.
+
+    Parameters
+    ----------
+
+    graph: CompiledGraph
+        graph is the compiled plumbing graph that every variant shares the topology of.
+
+    pressures: numpy.ndarray
+        pressures is a (K, N) matrix of current node pressures, with one row per variant and
+        columns indexed the same way as the nodes of graph.
+
+    fcs: numpy.ndarray
+        fcs is a (K, E) matrix of edge FCs, with one row per variant and columns indexed the
+        same way as the edges of graph.
+
+    free: numpy.ndarray
+        free is a boolean mask of the nodes whose pressure may change, shared by all variants.
+
+    time_res: int
+        time_res is the length of the step, in microseconds.
+
+    Returns a new (K, N) matrix of node pressures.
+    """
+    flows = np.maximum(pressures[:, graph.src] - pressures[:, graph.dst], 0) * fcs
+    dp = (graph.incidence @ flows.T).T
+    return pressures + np.where(free, dp, 0) * time_res
+
+
+def active_edges(graph, pressures):
+    """Return a boolean mask of the edges that currently carry flow."""
+    return (pressures[graph.src] > pressures[graph.dst]) & (graph.fc > 0)
+
+
+def _rate_entries(graph, active, free):
+    """
+    Return the (rows, cols, vals) entries of the rate matrix for a set of active edges.
+
+    Entries in rows belonging to nodes that are not free are dropped, so those nodes keep
+    their pressure.
+    """
+    src = graph.src[active]
+    dst = graph.dst[active]
+    fc = graph.fc[active]
+
+    rows = np.concatenate([dst, dst, src, src])
+    cols = np.concatenate([src, dst, src, dst])
+    vals = np.concatenate([fc, -fc, -fc, fc])
+    keep = free[rows]
+    return rows[keep], cols[keep], vals[keep]
+
+
+def rate_matrix(graph, active, free):
+    """Return the sparse matrix A such that dp/dt = A p while the active edges stay active."""
+    num_nodes = len(free)
+    rows, cols, vals = _rate_entries(graph, active, free)
+    return sparse.csr_matrix((vals, (rows, cols)), shape=(num_nodes, num_nodes))
+
+
+def _resolve_ties(graph, pressures, free, active):
+    """
+    Add edges whose ends are at equal pressure but which will start carrying flow immediately.
+
+    An edge between two equal pressures starts flowing if the first time derivative of
+    pressure that differs between its ends is larger at its source. Derivatives are found
+    by repeatedly applying the rate matrix, which is rebuilt as tied edges are resolved.
+    """
+    tol = PATTERN_RTOL * max(1, np.max(np.abs(pressures)))
+    diff = pressures[graph.src] - pressures[graph.dst]
+    undecided = ~active & (graph.fc > 0) & (np.abs(diff) <= tol)
+    if not np.any(undecided):
+        return active
+
+    active = active.copy()
+    rates = rate_matrix(graph, active, free)
+    derivative = pressures
+    for _ in range(MAX_TIE_ORDER):
+        derivative = rates @ derivative
+        scale = np.max(np.abs(derivative))
+        if scale == 0:
+            break
+        derivative = derivative / scale
+
+        diff = derivative[graph.src] - derivative[graph.dst]
+        starting = undecided & (diff > PATTERN_RTOL)
+        undecided &= np.abs(diff) <= PATTERN_RTOL
+        if np.any(starting):
+            active |= starting
+            rates = rate_matrix(graph, active, free)
+        if not np.any(undecided):
+            break
+
+    return active
+
+
+def _pattern_changed(graph, active, pressures):
+    """Return True if advancing to pressures reversed or started flow along any edge."""
+    tol = PATTERN_RTOL * max(1, np.max(np.abs(pressures)))
+    diff = pressures[graph.src] - pressures[graph.dst]
+    reversed_flow = active & (diff < -tol)
+    started_flow = ~active & (graph.fc > 0) & (diff > tol)
+    return np.any(reversed_flow | started_flow)
+
+
+def _expm_advance(graph, pressures, free, active, dt):
+    """Advance pressures by dt assuming that exactly the active edges carry flow throughout."""
+    num_nodes = len(pressures)
+    new_pressures = pressures.copy()
+    if not np.any(active):
+        return new_pressures
+
+    # Only nodes joined by an active edge influence each other, so each linked block can be
+    # exponentiated on its own.
+    links = sparse.coo_matrix((np.ones(np.count_nonzero(active)),
+                               (graph.src[active], graph.dst[active])),
+                              shape=(num_nodes, num_nodes))
+    num_blocks, labels = csgraph.connected_components(links, directed=False)
+    block_sizes = np.bincount(labels, minlength=num_blocks)
+    block_starts = np.cumsum(block_sizes) - block_sizes
+    node_order = np.argsort(labels, kind='stable')
+    local = np.empty(num_nodes, dtype=np.intp)
+    local[node_order] = np.arange(num_nodes) - np.repeat(block_starts, block_sizes)
+
+    rows, cols, vals = _rate_entries(graph, active, free)
+    entry_labels = labels[rows]
+    entry_order = np.argsort(entry_labels, kind='stable')
+    entry_counts = np.bincount(entry_labels, minlength=num_blocks)
+    entry_starts = np.cumsum(entry_counts) - entry_counts
+
+    for label in np.flatnonzero(entry_counts):
+        block = node_order[block_starts[label]:block_starts[label] + block_sizes[label]]
+        entries = entry_order[entry_starts[label]:entry_starts[label] + entry_counts[label]]
+        size = len(block)
+        block_rates = (vals[entries] * dt, (local[rows[entries]], local[cols[entries]]))
+
+        if size <= DENSE_EXPM_MAX_NODES:
+            dense_rates = np.zeros((size, size))
+            np.add.at(dense_rates, block_rates[1], block_rates[0])
+            new_pressures[block] = scipy.linalg.expm(dense_rates) @ pressures[block]
+        else:
+            sparse_rates = sparse.csc_matrix(block_rates, shape=(size, size))
+            new_pressures[block] = sparse_linalg.expm_multiply(sparse_rates, pressures[block])
+
+    new_pressures[~free] = pressures[~free]
+    return new_pressures
+
+
+def expm_step(graph, pressures, free, timestep, min_step):
+    """
+    Advance node pressures by timestep using the exact solution of the linear dynamics.
+
+    As long as no edge changes flow direction, dp/dt = A p for a fixed rate matrix A, so
+    the pressures after a time dt are exactly expm(A dt) p. The step is split up whenever
+    the set of active edges changes part way through, halving the interval until it either
+    stays consistent or reaches min_step, and growing it back afterwards. Edges between equal
+    pressures that are about to start flowing are counted as active from the outset.
+
+    Parameters
+    ----------
+
+    graph: CompiledGraph
+        graph is the compiled plumbing graph to step.
+
+    pressures: numpy.ndarray
+        pressures is the vector of current node pressures, indexed the same
+        way as the nodes of graph.
+
+    free: numpy.ndarray
+        free is a boolean mask of the nodes whose pressure may change.
+
+    timestep: int
+        timestep is the total time to advance by, in microseconds.
+
+    min_step: int
+        min_step is the shortest interval, in microseconds, that the step will be split
+        into when looking for a change in flow direction.
+
+    Returns a new vector of node pressures.
+    """
+    elapsed = 0
+    dt = timestep
+    while elapsed < timestep:
+        dt = min(dt, timestep - elapsed)
+        active = _resolve_ties(graph, pressures, free, active_edges(graph, pressures))
+        new_pressures = _expm_advance(graph, pressures, free, active, dt)
+
+        if dt > min_step and _pattern_changed(graph, active, new_pressures):
+            dt = max(dt // 2, min_step)
+            continue
+
+        pressures = new_pressures
+        elapsed += dt
+        dt *= 2
+
+    return pressures
+
+
+def implicit_step(graph, pressures, free, time_res):
+    """
+    Advance node pressures by a single backward Euler step.
+
+    The new pressures p' satisfy p' = p + time_res * A p', where A is the rate matrix for
+    the edges that carry flow at p'. That set of edges is guessed from the current
+    pressures and refined by re-solving the sparse linear system until it stops changing.
+    Unlike euler_step(), this is stable for any time_res, however fast the edges.
+
+    Parameters are the same as for euler_step().
+
+    Returns a new vector of node pressures.
+    """
+    num_nodes = len(pressures)
+    diagonal = np.arange(num_nodes)
+
+    active = _resolve_ties(graph, pressures, free, active_edges(graph, pressures))
+    for _ in range(IMPLICIT_MAX_ITERATIONS):
+        # Assemble I - time_res * A in one go, since building it with sparse matrix arithmetic
+        # costs far more than solving it
+        rows, cols, vals = _rate_entries(graph, active, free)
+        if num_nodes <= DENSE_IMPLICIT_MAX_NODES:
+            system = np.identity(num_nodes)
+            np.add.at(system, (rows, cols), vals * -time_res)
+            new_pressures = np.linalg.solve(system, pressures)
+        else:
+            system = sparse.csc_matrix(
+                (np.concatenate([vals * -time_res, np.ones(num_nodes)]),
+                 (np.concatenate([rows, diagonal]), np.concatenate([cols, diagonal]))),
+                shape=(num_nodes, num_nodes))
+            new_pressures = sparse_linalg.spsolve(system, pressures)
+        if not _pattern_changed(graph, active, new_pressures):
+            break
+        active = active_edges(graph, new_pressures)
+
+    new_pressures[~free] = pressures[~free]
+    return new_pressures
+
+
+def doubling_step(graph, pressures, free, time_res):
+    """
+    Advance node pressures by time_res and estimate the local error of doing so.
+
+    The step is taken both as one backward Euler step of time_res and as two of time_res / 2;
+    the two-step result is returned and the largest difference between the two is returned
+    as its error estimate.
+
+    Parameters are the same as for euler_step().
+
+    Returns a tuple of (new vector of node pressures, error estimate).
+    """
+    full = implicit_step(graph, pressures, free, time_res)
+    half = implicit_step(graph, pressures, free, time_res / 2)
+    double = implicit_step(graph, half, free, time_res / 2)
+    return double, np.max(np.abs(double - full), initial=0)
+
+
+def trbdf2_step(graph, pressures, free, time_res, rates):
+    """
+    Advance node pressures by one second-order TR-BDF2 step and estimate its local error.
+
+    A trapezoidal stage first advances pressures by TRBDF2_GAMMA * time_res, then a BDF2 stage
+    uses both the start and the end of that stage to reach time_res. Each stage is a backward
+    Euler solve, so the step is as stable as implicit_step(), but its error shrinks with the
+    cube of time_res instead of the square, which lets adaptive steps grow much longer. The
+    error is estimated from the rates of change at the start, middle and end of the step.
+
+    Parameters are the same as for euler_step(), except for:
+
+    rates: numpy.ndarray
+        rates is the rate of change of every node's pressure at the start of the step, as
+        returned by the previous step, with zeros at nodes that are not free.
+
+    Returns a tuple of (new vector of node pressures, error estimate, new rates of change).
+    """
+    gamma = TRBDF2_GAMMA
+    stage_res = gamma / 2 * time_res
+
+    # The rates at the end of each stage follow from the backward Euler system it solved, which
+    # stays accurate across stiff edges where evaluating flow_rates() would not
+    trapezoid_start = pressures + stage_res * rates
+    middle = implicit_step(graph, trapezoid_start, free, stage_res)
+    middle_rates = (middle - trapezoid_start) / stage_res
+
+    bdf_start = (middle - (1 - gamma)**2 * pressures) / (gamma * (2 - gamma))
+    new_pressures = implicit_step(graph, bdf_start, free, stage_res)
+    new_rates = (new_pressures - bdf_start) / stage_res
+
+    error_constant = (-3 * gamma**2 + 4 * gamma - 2) / (12 * (2 - gamma))
+    curvature = rates / gamma - middle_rates / (gamma * (1 - gamma)) + \
+        new_rates / (1 - gamma)
+    error = 2 * abs(error_constant) * time_res * np.max(np.abs(curvature), initial=0)
+    return new_pressures, error, new_rates
+
+
+def interpolate(pressures, new_pressures, rates, new_rates, time_res, fraction):
+    """
+    Return the node pressures a fraction of the way through a step of time_res.
+
+    If the rates of change at both ends of the step are known, pressures are interpolated with
+    the cubic that matches them, which is as accurate as a TR-BDF2 step. If rates is None, they
+    are interpolated linearly instead.
+    """
+    if rates is None:
+        return pressures + (new_pressures - pressures) * fraction
+
+    # Cubic Hermite basis functions
+    start = (1 + 2 * fraction) * (1 - fraction)**2
+    start_slope = fraction * (1 - fraction)**2
+    end = fraction**2 * (3 - 2 * fraction)
+    end_slope = fraction**2 * (fraction - 1)
+    return start * pressures + end * new_pressures + \
+        time_res * (start_slope * rates + end_slope * new_rates)
+
+
+def steady_state(graph, pressures, free):
+    """
+    Solve directly for the pressures that the engine settles at, without stepping in time.
+
+    Nodes are grouped into blocks joined by open edges. A block without any fixed node conserves
+    the sum of its pressures, so it settles at their mean. In a block with fixed nodes, the free
+    pressures satisfy A p = 0, where A is the rate matrix for the edges that carry flow at p;
+    that set of edges is guessed and refined until it agrees with the solution.
+
+    Where check valves keep a block from being strongly connected, pressure can be trapped part
+    way through settling, so that the result depends on the path taken. Without a fixed node,
+    such a block is never solved directly. With one, the solution is only accepted if each of
+    its strongly connected parts either has a fixed node or has flow both into and out of it
+    from the rest of the block, so that it could have been approached from either side.
+
+    Parameters are the same as for euler_step(), without time_res.
+
+    Returns a new vector of node pressures, or None if the steady state can't be found directly.
+    """
+    num_nodes = len(pressures)
+    # Edges between two fixed nodes can't change anything, so they don't join blocks.
+    open_edges = (graph.fc > 0) & (free[graph.src] | free[graph.dst])
+    links = sparse.coo_matrix((np.ones(np.count_nonzero(open_edges)),
+                               (graph.src[open_edges], graph.dst[open_edges])),
+                              shape=(num_nodes, num_nodes))
+    num_blocks, labels = csgraph.connected_components(links, connection='weak')
+    num_parts, strong_labels = csgraph.connected_components(links, connection='strong')
+
+    lowest = np.full(num_blocks, num_nodes)
+    highest = np.full(num_blocks, -1)
+    np.minimum.at(lowest, labels, strong_labels)
+    np.maximum.at(highest, labels, strong_labels)
+    one_way = lowest != highest
+    bounded = np.bincount(labels[~free], minlength=num_blocks) > 0
+    if np.any(one_way & ~bounded):
+        return None
+
+    new_pressures = pressures.copy()
+    closed_nodes = ~bounded[labels]
+    means = np.bincount(labels, pressures, num_blocks) / np.bincount(labels, minlength=num_blocks)
+    new_pressures[closed_nodes] = means[labels[closed_nodes]]
+
+    unknown = free & bounded[labels]
+    if not np.any(unknown):
+        return new_pressures
+
+    tol = PATTERN_RTOL * max(1, np.max(np.abs(pressures)))
+    candidates = open_edges & bounded[labels[graph.src]]
+    active = candidates
+    for _ in range(STEADY_STATE_MAX_ITERATIONS):
+        rates = rate_matrix(graph, active, free)[unknown]
+        rhs = -(rates[:, ~unknown] @ pressures[~unknown])
+        try:
+            new_pressures[unknown] = sparse_linalg.splu(rates[:, unknown].tocsc()).solve(rhs)
+        except RuntimeError:
+            # Some free node has no flowing edges with this guess.
+            return None
+
+        diff = new_pressures[graph.src] - new_pressures[graph.dst]
+        new_active = candidates & (diff >= -tol)
+        if np.array_equal(new_active, active):
+            src_parts = strong_labels[graph.src]
+            dst_parts = strong_labels[graph.dst]
+            crossing = active & (src_parts != dst_parts)
+            flows_in = np.bincount(dst_parts[crossing], minlength=num_parts) > 0
+            flows_out = np.bincount(src_parts[crossing], minlength=num_parts) > 0
+            pinned = np.bincount(strong_labels[~free], minlength=num_parts) > 0
+            settled = (pinned | flows_in & flows_out)[strong_labels]
+            if np.any(unknown & one_way[labels] & ~settled):
+                return None
+            return new_pressures
+        active = new_active
+
+    return None
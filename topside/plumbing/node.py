@@ -1,31 +1,90 @@
 from abc import ABC, abstractmethod
 
 import networkx as nx
+import numpy as np
 
 import topside.plumbing.plumbing_utils as utils
 
 
-def instantiate_node(type_id=None):
+def instantiate_node(type_id=None, store=None):
     """
     Return the proper child node class depending on provided type_id.
 
     type_id should be a string that indicates the desired node type. If an unrecognized
-    string (or no string) is provided, we create a generic node.
+    string (or no string) is provided, we create a generic node. If a PressureStore is
+    provided, the node keeps its pressure in it.
     """
     ret = None
     if type_id == utils.ATM:
-        ret = AtmNode()
+        ret = AtmNode(store=store)
     else:
-        ret = GenericNode()
+        ret = GenericNode(store=store)
     return ret
 
 
+class PressureStore:
+    """
+    Contiguous storage for the pressures of a set of nodes.
+
+    Every node owns one slot of the pressure and fixed arrays, so that the pressures of
+    many nodes can be read and written as a single vector. Slots released by nodes that have
+    been removed from a graph are reused by the next nodes added.
+    """
+
+    def __init__(self, capacity=16):
+        self.pressure = np.zeros(capacity, dtype=float)
+        self.fixed = np.zeros(capacity, dtype=bool)
+        # Number of slots ever allocated, including released ones; only the first size entries
+        # of pressure and fixed are in use.
+        self.size = 0
+        self._released = []
+        # Incremented on every write, so that readers can tell when cached values are stale.
+        self.version = 0
+        # Incremented whenever a slot is allocated or released.
+        self.layout_version = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, pressure=0, fixed=False):
+        """Allocate a slot with the given pressure and fixed value, and return its index."""
+        if self._released:
+            idx = self._released.pop()
+        else:
+            if self.size == len(self.pressure):
+                self.pressure = np.concatenate([self.pressure, np.zeros(len(self.pressure))])
+                self.fixed = np.concatenate([self.fixed, np.zeros(len(self.fixed), dtype=bool)])
+            idx = self.size
+            self.size += 1
+        self.pressure[idx] = pressure
+        self.fixed[idx] = fixed
+        self.version += 1
+        self.layout_version += 1
+        return idx
+
+    def release(self, slot):
+        """Free a slot whose node has been removed, so that it can be reused."""
+        self.pressure[slot] = 0
+        self.fixed[slot] = False
+        self._released.append(slot)
+        self.version += 1
+        self.layout_version += 1
+
+    def write(self, slots, pressures):
+        """Set the pressures at an array of slots from a matching array of pressures."""
+        self.pressure[slots] = pressures
+        self.version += 1
+
+
 class Node(ABC):
     """
     Abstract base class for all nodes.
 
     Should never be used directly, so we tag all its methods as abstract.
     """
+
+    __slots__ = ()
+
     @abstractmethod
     def update_pressure(self, new_pressure, **kwargs):
         """Update pressure, kwargs are if additional params are needed."""
@@ -47,35 +106,60 @@ class GenericNode(Node):
     """
     A generic node, i.e. any node that doesn't require special consideration
     in calculating its pressure.
+
+    A GenericNode is a view into one slot of a PressureStore. Nodes created without one
+    get a store of their own.
     """
 
-    def __init__(self, pressure=0, fixed=False):
-        self.__pressure = pressure
-        self.fixed = fixed
+    __slots__ = ('store', 'slot')
+
+    def __init__(self, pressure=0, fixed=False, store=None):
+        if store is None:
+            store = PressureStore(capacity=1)
+        self.store = store
+        self.slot = store.add(pressure, fixed)
 
     def __str__(self):
-        return f'[GenericNode] pressure: {self.__pressure}, fixed: {self.fixed}'
+        return f'[GenericNode] pressure: {self.get_pressure()}, fixed: {self.fixed}'
 
     def update_pressure(self, new_pressure, **kwargs):
-        self.__pressure = new_pressure
+        self.store.pressure[self.slot] = new_pressure
+        self.store.version += 1
 
     def get_pressure(self):
-        return self.__pressure
+        return float(self.store.pressure[self.slot])
+
+    @property
+    def fixed(self):
+        return bool(self.store.fixed[self.slot])
 
     def update_fixed(self, fixed):
-        self.fixed = fixed
+        self.store.fixed[self.slot] = fixed
+        self.store.version += 1
 
     def get_fixed(self):
         return self.fixed
 
     def __eq__(self, other):
         return isinstance(other, GenericNode) and \
-            self.__pressure == other.__pressure and \
+            self.get_pressure() == other.get_pressure() and \
             self.fixed == other.fixed
 
 
 class AtmNode(Node):
-    """The atmosphere node."""
+    """
+    The atmosphere node.
+
+    Its slot in a PressureStore always holds a pressure of 0 and is always fixed.
+    """
+
+    __slots__ = ('store', 'slot')
+
+    def __init__(self, store=None):
+        if store is None:
+            store = PressureStore(capacity=1)
+        self.store = store
+        self.slot = store.add(0, True)
 
     def __str__(self):
         return f'[AtmNode] pressure: 0, fixed: True'
@@ -0,0 +1,122 @@
+import numpy as np
+
+
+class PressureWatch:
+    """A request to be notified when the pressure at a node crosses a threshold."""
+
+    def __init__(self, node, threshold, callback, above, terminal=False):
+        self.node = node
+        self.threshold = threshold
+        self.callback = callback
+        # Whether the node's pressure was at or above threshold when last checked
+        self.above = above
+        # Whether a step should stop as soon as the threshold is crossed
+        self.terminal = terminal
+
+
+class StateWatch:
+    """A request to be notified when the state of one of a set of components changes."""
+
+    def __init__(self, components, callback):
+        self.components = components
+        self.callback = callback
+
+
+class Observers:
+    """
+    The set of watches registered on a PlumbingEngine.
+
+    Pressure watches are checked together, as vectors, every time the engine writes back node
+    pressures, so checking them costs little more than indexing the new pressures. Watches belong
+    to one engine; copies of the engine start out with none.
+    """
+
+    def __init__(self):
+        self.pressure_watches = []
+        self.state_watches = []
+        self._graph = None
+        self._index = None
+        self._thresholds = None
+        self._above = None
+
+    def __deepcopy__(self, memo):
+        return Observers()
+
+    def add_pressure_watch(self, watch):
+        self.pressure_watches.append(watch)
+        self._graph = None
+
+    def add_state_watch(self, watch):
+        self.state_watches.append(watch)
+
+    def remove(self, watch):
+        """Remove a watch, returning True if it was registered."""
+        for watches in [self.pressure_watches, self.state_watches]:
+            if watch in watches:
+                watches.remove(watch)
+                self._graph = None
+                return True
+        return False
+
+    def _layout(self, graph):
+        """Index every pressure watch into the pressure vectors of a compiled graph."""
+        if graph is not self._graph:
+            self._graph = graph
+            self._index = np.array([graph.node_index.get(watch.node, -1)
+                                    for watch in self.pressure_watches], dtype=np.intp)
+            self._thresholds = np.array([watch.threshold for watch in self.pressure_watches],
+                                        dtype=float)
+            self._above = np.array([watch.above for watch in self.pressure_watches], dtype=bool)
+
+    def _check(self, graph, pressures):
+        """Return whether each pressure watch is above its threshold, given compiled pressures."""
+        self._layout(graph)
+        index = self._index
+        return np.where(index >= 0, pressures[index] >= self._thresholds, self._above)
+
+    def crossings(self, graph, pressures):
+        """
+        Return the indices into pressure_watches of the watches whose nodes would cross their
+        threshold if the pressures of a compiled graph changed to pressures.
+        """
+        if not self.pressure_watches:
+            return []
+        return np.flatnonzero(self._check(graph, pressures) != self._above).tolist()
+
+    def pressures_changed(self, graph, pressures, time, crossing_times=None):
+        """
+        Notify the watches whose nodes crossed their threshold, given new compiled pressures.
+
+        crossing_times optionally maps the indices of watches into pressure_watches to the time at
+        which they crossed, if that is earlier than time.
+        """
+        if not self.pressure_watches:
+            return
+        above = self._check(graph, pressures)
+        crossed = np.flatnonzero(above != self._above)
+        self._above = above
+        index = self._index
+        if crossing_times is None:
+            crossing_times = {}
+
+        # Snapshot the watches first, in case a callback adds or removes one
+        watches = list(self.pressure_watches)
+        for idx in crossed.tolist():
+            watch = watches[idx]
+            watch.above = bool(above[idx])
+            watch.callback(watch.node, crossing_times.get(idx, time), float(pressures[index[idx]]),
+                           watch.above)
+
+    def pressure_changed(self, node, pressure, time):
+        """Notify the watches on node that crossed their threshold, given its new pressure."""
+        for watch in list(self.pressure_watches):
+            if watch.node == node and (pressure >= watch.threshold) != watch.above:
+                watch.above = not watch.above
+                self._graph = None
+                watch.callback(node, time, pressure, watch.above)
+
+    def state_changed(self, component, state, time):
+        """Notify the watches on component that it has changed to state."""
+        for watch in list(self.state_watches):
+            if watch.components is None or component in watch.components:
+                watch.callback(component, state, time)
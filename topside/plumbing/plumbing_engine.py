@@ -1,11 +1,56 @@
 import copy
 
 import networkx as nx
+import numpy as np
 
+import topside.plumbing.checkpoint as checkpoint
+import topside.plumbing.compiled_graph as compiled
 import topside.plumbing.node as node_types
 import topside.plumbing.exceptions as exceptions
+import topside.plumbing.integrators as integrators
 import topside.plumbing.invalid_reasons as invalid
+import topside.plumbing.observers as observers
 import topside.plumbing.plumbing_utils as utils
+import topside.plumbing.trajectory as trajectory
+
+
+class _ResolvedState:
+    """A component state, resolved to the main graph edges that it sets and their FCs."""
+
+    def __init__(self, edges, edge_data, fcs):
+        self.edges = edges
+        self.edge_data = edge_data
+        self.fcs = fcs
+        # Indices of edges in the compiled graph, filled in on first use
+        self.compiled = None
+        self.edge_ids = None
+
+
+class EngineSnapshot:
+    """
+    The state of a PlumbingEngine at one point in time, as captured by PlumbingEngine.snapshot().
+
+    Only the state that changes as the engine runs (node pressures, edge FCs, component states,
+    fixed pressures and time) is copied. The topology (main graph, components, mapping and errors)
+    is shared with the engine, which copies it before it next edits it.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.plumbing_graph = engine.plumbing_graph
+        self.component_dict = engine.component_dict
+        self.mapping = engine.mapping
+        self.error_set = engine.error_set
+
+        store = engine._pressure_store()
+        self.pressures = store.pressure[:len(store)].copy()
+        self.fixed = store.fixed[:len(store)].copy()
+        self.fcs = [fc for _, _, fc in engine.plumbing_graph.edges(data='FC')]
+        self.states = {name: component.current_state
+                       for name, component in engine.component_dict.items()}
+        self.fixed_pressures = dict(engine.fixed_pressures)
+        self.time = engine.time
+        self.time_res = engine.time_res
 
 
 class PlumbingEngine:
@@ -56,10 +101,24 @@ class PlumbingEngine:
         self.initial_pressure = initial_pressures
         self.initial_state = initial_states
         self.time_res = utils.DEFAULT_TIME_RESOLUTION_MICROS
+        # If True, forward Euler steps let edges slower than the fastest one in the engine step
+        # at coarser resolutions than time_res; see _euler_island().
+        self.multirate = True
         self.time = 0
         self.plumbing_graph = nx.MultiDiGraph()
         self.error_set = set()
         self.fixed_pressures = {}
+        self._compiled = None
+        self._component_edges = {}
+        self._edge_components = {}
+        self._resolved_states = {}
+        self._indexed_graph = self.plumbing_graph
+        self._pressure_layout = (None, None)
+        self._pressure_snapshot = (None, None)
+        # True while an EngineSnapshot shares the topology, which must then be copied before
+        # being edited.
+        self._topology_shared = False
+        self._observers = observers.Observers()
         self.load_graph(components, mapping, initial_pressures, initial_states)
 
     def reset(self, reset_component=False):
@@ -137,11 +196,21 @@ class PlumbingEngine:
         initial_pressures = copy.deepcopy(initial_pressures)
         initial_states = copy.deepcopy(initial_states)
 
+        if self._topology_shared:
+            self.plumbing_graph = nx.MultiDiGraph()
+            self.error_set = set()
+            self._topology_shared = False
+
         self.component_dict = copy.deepcopy(components)
         self.mapping = copy.deepcopy(mapping)
 
         self.plumbing_graph.clear()
         self.error_set.clear()
+        self._compiled = None
+        self._component_edges = {}
+        self._edge_components = {}
+        self._resolved_states = {}
+        self._indexed_graph = self.plumbing_graph
 
         for name, component in self.component_dict.items():
             if not component.is_valid():
@@ -165,10 +234,9 @@ class PlumbingEngine:
                 continue
 
             # Only pass in those pressures that are relevant to the current component
-            node_pressures = {}
-            for node, pressure in initial_pressures.items():
-                if node in self.mapping[name].values():
-                    node_pressures[node] = pressure
+            node_pressures = {node: initial_pressures[node]
+                              for node in dict.fromkeys(self.mapping[name].values())
+                              if node in initial_pressures}
 
             self.add_component(
                 component, mapping[name], initial_states[name], node_pressures, fail_silently=True)
@@ -186,19 +254,34 @@ class PlumbingEngine:
             raise exceptions.BadInputError(
                 f"Component '{component_name}' not found in mapping dict.")
 
-        # Map from component to graph node for this component
-        component_map = self.mapping[component_name]
         component = self.component_dict[component_name]
 
         if state_id not in component.states:
             raise exceptions.BadInputError(
                 f"State '{state_id}' not found in {component_name} states dict.")
 
+        old_state = component.current_state
+        component.current_state = state_id
+
+        self._sync_index()
+        resolved = self._resolved_states.get(component_name)
+        if resolved is not None:
+            self._apply_resolved_state(resolved[state_id])
+        else:
+            self._set_unresolved_state(component_name, state_id)
+
+        if state_id != old_state:
+            self._observers.state_changed(component_name, state_id, self.time)
+
+    def _set_unresolved_state(self, component_name, state_id):
+        """Set a component's state on the main graph, recording errors for unmapped nodes."""
+        # Map from component to graph node for this component
+        component_map = self.mapping[component_name]
+        component = self.component_dict[component_name]
+
         # Dict of {edges: FC} with component node names
         state_edges_component = component.states[state_id]
 
-        component.current_state = state_id
-
         # Create new dict keyed by graph edges rather than component ones
         state_edges_graph = {}
         for cedge in state_edges_component.keys():
@@ -225,6 +308,151 @@ class PlumbingEngine:
 
         # Set FC on main graph according to new dict
         nx.classes.function.set_edge_attributes(self.plumbing_graph, state_edges_graph, 'FC')
+        if self._compiled is not None:
+            self._compiled.update_fc(state_edges_graph)
+
+    def snapshot(self):
+        """
+        Return an EngineSnapshot of the engine's current state, which restore() can return to.
+
+        Snapshots are much cheaper than copying the engine, since they share its topology.
+        """
+        self._topology_shared = True
+        return EngineSnapshot(self)
+
+    def restore(self, snapshot):
+        """Return the engine to the state captured in an EngineSnapshot."""
+        if snapshot.plumbing_graph is not self.plumbing_graph:
+            self.plumbing_graph = snapshot.plumbing_graph
+            self.component_dict = snapshot.component_dict
+            self.mapping = snapshot.mapping
+            self.error_set = snapshot.error_set
+            self._compiled = None
+        self._topology_shared = True
+        self._sync_index()
+
+        old_states = {name: component.current_state
+                      for name, component in self.component_dict.items()}
+        for name, state in snapshot.states.items():
+            self.component_dict[name].current_state = state
+        for (_, _, data), fc in zip(self.plumbing_graph.edges(data=True), snapshot.fcs):
+            data['FC'] = fc
+
+        store = self._pressure_store()
+        store.pressure[:len(snapshot.pressures)] = snapshot.pressures
+        store.fixed[:len(snapshot.fixed)] = snapshot.fixed
+        store.version += 1
+
+        self.fixed_pressures = dict(snapshot.fixed_pressures)
+        self.time = snapshot.time
+        self.time_res = snapshot.time_res
+
+        if self._compiled is not None:
+            self._compiled.set_fc(range(len(snapshot.fcs)), snapshot.fcs)
+            self._compiled.wake()
+            self._observers.pressures_changed(self._compiled, self._compiled.gather_pressures(),
+                                              self.time)
+
+        for name, state in old_states.items():
+            if self.component_dict[name].current_state != state:
+                self._observers.state_changed(name, self.component_dict[name].current_state,
+                                              self.time)
+
+    def save_checkpoint(self, path):
+        """
+        Save the engine's topology and state to a binary checkpoint file at path.
+
+        The engine can be recreated exactly from the file with load_checkpoint().
+        """
+        checkpoint.save_checkpoint(self, path)
+
+    @classmethod
+    def load_checkpoint(cls, path):
+        """Return a new PlumbingEngine recreated from a checkpoint file saved at path."""
+        engine = cls()
+        checkpoint.load_checkpoint(engine, path)
+        return engine
+
+    def _unshare_topology(self):
+        """Copy the topology before it is edited, if an EngineSnapshot still shares it."""
+        if not self._topology_shared:
+            return
+        # Copied together, so that the node bodies in the new graph share a new pressure store.
+        self.plumbing_graph, self.component_dict, self.mapping, self.error_set = copy.deepcopy(
+            (self.plumbing_graph, self.component_dict, self.mapping, self.error_set))
+        self._topology_shared = False
+
+    def _sync_index(self):
+        """Rebuild the component edge index if the main graph has been swapped out from under it."""
+        # This happens when a procedure's state stack is restored, for example.
+        if self._indexed_graph is self.plumbing_graph:
+            return
+        self._indexed_graph = self.plumbing_graph
+        self._component_edges = {}
+        self._edge_components = {}
+        self._resolved_states = {}
+        for name in self.component_dict:
+            self._index_component(name)
+
+    def _index_component(self, component_name):
+        """Record which main graph edges belong to a component, and resolve its states onto them."""
+        self._unindex_component(component_name)
+        component = self.component_dict[component_name]
+        component_map = self.mapping.get(component_name, {})
+
+        edges = {}
+        for start_node, end_node, key in component.component_graph.edges(keys=True):
+            if start_node not in component_map or end_node not in component_map:
+                continue
+            edge = (component_map[start_node], component_map[end_node],
+                    component_name + '.' + key)
+            if self.plumbing_graph.has_edge(*edge):
+                edges[(start_node, end_node, key)] = edge
+                self._edge_components[edge] = component_name
+
+        self._component_edges[component_name] = edges
+        self._resolve_states(component_name)
+
+    def _unindex_component(self, component_name):
+        """Drop a component from the component edge index."""
+        for edge in self._component_edges.pop(component_name, {}).values():
+            del self._edge_components[edge]
+        self._resolved_states.pop(component_name, None)
+
+    def _resolve_states(self, component_name):
+        """
+        Resolve every state of a component to the main graph edges that it sets, once, so that
+        set_component_state() can write the FCs straight onto them.
+
+        Components with edges that can't be resolved are left to set_component_state() to record
+        errors for.
+        """
+        self._resolved_states.pop(component_name, None)
+        component_edges = self._component_edges[component_name]
+        component = self.component_dict[component_name]
+
+        resolved = {}
+        for state_id, edge_fcs in component.states.items():
+            edges = []
+            for cedge in edge_fcs:
+                if cedge not in component_edges:
+                    return
+                edges.append(component_edges[cedge])
+            edge_data = [self.plumbing_graph.edges[edge] for edge in edges]
+            resolved[state_id] = _ResolvedState(edges, edge_data, list(edge_fcs.values()))
+
+        self._resolved_states[component_name] = resolved
+
+    def _apply_resolved_state(self, resolved):
+        """Write the FCs of a resolved component state onto the main and compiled graphs."""
+        for data, fc in zip(resolved.edge_data, resolved.fcs):
+            data['FC'] = fc
+
+        if self._compiled is not None:
+            if resolved.compiled is not self._compiled:
+                resolved.compiled = self._compiled
+                resolved.edge_ids = self._compiled.edge_ids(resolved.edges)
+            self._compiled.set_fc(resolved.edge_ids, resolved.fcs)
 
     def _set_time_res(self, component_name):
         """Given a component, set a time resolution based on its lowest teq (highest FC)."""
@@ -278,6 +506,8 @@ class PlumbingEngine:
         component_graph = component.component_graph
 
         # Updating the plumbing engine's records about itself with new component
+        self._unshare_topology()
+        self._sync_index()
         self.component_dict[name] = component
         self.mapping[name] = copy.deepcopy(mapping)
         self._set_time_res(name)
@@ -311,11 +541,14 @@ class PlumbingEngine:
                     start_map_node, end_map_node, component.name + '.' + edge_key)
 
                 for node in [start_map_node, end_map_node]:
-                    if node in self.nodes(data=False) and 'body' in self.plumbing_graph.nodes[node]:
+                    if 'body' in self.plumbing_graph.nodes[node]:
                         continue
-                    body = node_types.instantiate_node(node)
+                    body = node_types.instantiate_node(node, self._pressure_store())
                     self.plumbing_graph.nodes[node]['body'] = body
 
+        self._compiled = None
+        self._index_component(name)
+
         self.set_component_state(component.name, state_id)
 
         # Assign specified node pressures
@@ -343,22 +576,28 @@ class PlumbingEngine:
             raise exceptions.BadInputError(
                 f"Component with name {input_component_name} not found in component dict.")
 
+        self._unshare_topology()
         component = self.component_dict[input_component_name]
         component_name = component.name
 
         # Remove all edges associated with component
-        to_remove = []
-        for edge in self.plumbing_graph.edges(keys=True):
-            if component_name in edge[2]:
-                to_remove.append(edge)
-        self.plumbing_graph.remove_edges_from(to_remove)
+        self._sync_index()
+        component_edges = self._component_edges.get(component_name, {})
+        self.plumbing_graph.remove_edges_from(component_edges.values())
+        self._unindex_component(component_name)
 
-        # Remove unconnected (redundant) nodes
+        # Remove unconnected (redundant) nodes, and free their pressure slots for reuse
         to_remove = []
         for node in self.plumbing_graph.nodes():
             if not list(self.plumbing_graph.neighbors(node)):
                 to_remove.append(node)
+        store = self._pressure_store()
+        for node in to_remove:
+            body = self.get_node_body(node)
+            if getattr(body, 'store', None) is store:
+                store.release(body.slot)
         self.plumbing_graph.remove_nodes_from(to_remove)
+        self._compiled = None
 
         # Self info housekeeping
         self._resolve_errors(input_component_name)
@@ -402,13 +641,15 @@ class PlumbingEngine:
                 "Consider adjusting direction manually.")
 
         # Reverse orientation by switching direction of FCs
-        to_switch = [e for e in self.plumbing_graph.edges(keys=True) if component_name in e[2]]
-        edge1 = list(to_switch[0])
-        edge2 = list(to_switch[1])
+        self._sync_index()
+        edge1, edge2 = self._component_edges[component_name].values()
 
         temp = self.plumbing_graph.edges[edge1]['FC']
         self.plumbing_graph.edges[edge1]['FC'] = self.plumbing_graph.edges[edge2]['FC']
         self.plumbing_graph.edges[edge2]['FC'] = temp
+        if self._compiled is not None:
+            self._compiled.update_fc({edge: self.plumbing_graph.edges[edge]['FC']
+                                      for edge in [edge1, edge2]})
 
     def set_pressure(self, node_name, pressure, fixed=False):
         """Set pressure at given node."""
@@ -423,6 +664,10 @@ class PlumbingEngine:
 
         self.get_node_body(node_name).update_pressure(pressure)
         self.get_node_body(node_name).update_fixed(fixed)
+        if self._compiled is not None:
+            self._compiled.wake(node_name)
+        self._observers.pressure_changed(
+            node_name, self.get_node_body(node_name).get_pressure(), self.time)
         if fixed:
             self.fixed_pressures[node_name] = pressure
 
@@ -441,6 +686,7 @@ class PlumbingEngine:
             raise exceptions.BadInputError(
                 f"Component name '{component_name}' not found in component dict.")
 
+        self._unshare_topology()
         component = self.component_dict[component_name]
         which_edge = copy.deepcopy(which_edge)
 
@@ -463,6 +709,9 @@ class PlumbingEngine:
 
                 component.states[state_id][edge] = utils.teq_to_FC(teq)
 
+        self._sync_index()
+        self._resolve_states(component_name)
+
         # Update teq changes on main plumbing graph
         if component.current_state in which_edge.keys():
             self.set_component_state(component_name, component.current_state)
@@ -507,8 +756,7 @@ class PlumbingEngine:
         """
 
         if len(args) == 0:
-            return {n: self.get_node_body(n).get_pressure()
-                    for n in self.plumbing_graph.nodes()}
+            return dict(self._pressures_snapshot())
 
         # If passed a list, unpack those list elements into args
         args = utils.flatten(args)
@@ -524,6 +772,70 @@ class PlumbingEngine:
     def get_node_body(self, node_name):
         return self.plumbing_graph.nodes[node_name]['body']
 
+    def node_slots(self, *args):
+        """Given one or more nodes, return an array of their indices into pressure_view().
+
+        Can accept lists, tuples, series of separate arguments, or any combination of the above.
+        The indices stay valid until the engine's topology is next edited.
+        """
+        args = utils.flatten(args)
+        store = self._pressure_store()
+        slots = np.empty(len(args), dtype=np.intp)
+        for idx, node in enumerate(args):
+            if node not in self.plumbing_graph:
+                raise exceptions.BadInputError(f"Node {node} not found in graph.")
+            body = self.get_node_body(node)
+            if getattr(body, 'store', None) is not store:
+                raise exceptions.BadInputError(f"Node {node} has no slot in the pressure store.")
+            slots[idx] = body.slot
+        return slots
+
+    def pressure_view(self):
+        """Return a read-only view of the pressures of every node, indexed by node_slots().
+
+        Unlike current_pressures(), this doesn't build anything: reading the pressures at a few
+        nodes after every step costs one indexing operation. The view follows later steps, but
+        should be fetched again after the engine's topology is edited or its state is restored.
+        """
+        store = self._pressure_store()
+        view = store.pressure[:len(store)]
+        view.flags.writeable = False
+        return view
+
+    def _pressure_store(self):
+        """Return the PressureStore holding the pressures of the main graph's nodes."""
+        # The store lives on the graph itself, so that it follows the graph when the graph is
+        # swapped out (e.g. when restoring a procedure's state stack).
+        return self.plumbing_graph.graph.setdefault('pressures', node_types.PressureStore())
+
+    def _pressures_snapshot(self):
+        """Return a dict of {node: pressure} for every node, cached until a pressure changes."""
+        store = self._pressure_store()
+
+        layout_key = (self.plumbing_graph, len(self.plumbing_graph), store.layout_version)
+        key, layout = self._pressure_layout
+        if key != layout_key:
+            nodes = list(self.plumbing_graph.nodes())
+            bodies = [self.get_node_body(node) for node in nodes]
+            slots = None
+            if all(getattr(body, 'store', None) is store for body in bodies):
+                slots = np.array([body.slot for body in bodies], dtype=np.intp)
+            layout = (nodes, slots)
+            self._pressure_layout = (layout_key, layout)
+
+        snapshot_key = layout_key + (store.version,)
+        key, snapshot = self._pressure_snapshot
+        if key != snapshot_key:
+            nodes, slots = layout
+            if slots is not None:
+                pressures = store.pressure[slots].tolist()
+            else:
+                pressures = [self.get_node_body(node).get_pressure() for node in nodes]
+            snapshot = dict(zip(nodes, pressures))
+            self._pressure_snapshot = (snapshot_key, snapshot)
+
+        return snapshot
+
     def current_FC(self, *args):
         """Given a component_name or edge_id, return a dict of corresponding FCs.
 
@@ -539,16 +851,16 @@ class PlumbingEngine:
         # If passed a list, unpack those list elements into args
         args = utils.flatten(args, unpack_tuples=False)
 
-        if len(args) == 1 and args[0] in list(self.plumbing_graph.edges(keys=True)):
+        self._sync_index()
+        if len(args) == 1 and args[0] in self._edge_components:
             return self.plumbing_graph.edges[args[0]]['FC']
 
         ret = {}
         for arg in args:
             if arg in self.component_dict:
-                for edge in self.plumbing_graph.edges(keys=True):
-                    if edge[2].startswith(arg + '.'):
-                        ret[edge] = self.plumbing_graph.edges[edge]['FC']
-            elif arg in list(self.plumbing_graph.edges(keys=True)):
+                for edge in self._component_edges[arg].values():
+                    ret[edge] = self.plumbing_graph.edges[edge]['FC']
+            elif arg in self._edge_components:
                 ret[arg] = self.plumbing_graph.edges[arg]['FC']
             else:
                 raise exceptions.BadInputError(
@@ -568,7 +880,24 @@ class PlumbingEngine:
     def components(self):
         return copy.deepcopy(self.component_dict)
 
-    def step(self, timestep=None):
+    def _compiled_graph(self):
+        """Return the compiled form of the main graph, compiling it first if necessary."""
+        # The graph can be swapped out from under us (e.g. when restoring a procedure's state
+        # stack), in which case the old compiled graph no longer describes it.
+        if self._compiled is None or self._compiled.graph is not self.plumbing_graph:
+            self._compiled = compiled.CompiledGraph(self.plumbing_graph)
+        return self._compiled
+
+    def _check_steppable(self):
+        """Raise an error if the engine can't be stepped in time."""
+        if not self.plumbing_graph:
+            raise exceptions.InvalidEngineError(
+                "Step() cannot be called on an empty engine.")
+        if not self.is_valid():
+            raise exceptions.InvalidEngineError(
+                "Step() cannot be called on an invalid engine. Check for errors.")
+
+    def step(self, timestep=None, integrator=utils.EULER):
         """ Return node pressures in the engine after timestep has elapsed.
 
         Step cannot be called on an empty or invalid plumbing engine.
@@ -584,14 +913,93 @@ class PlumbingEngine:
             calculations; however timestep must still be greater than MIN_TIME_RES. If not, an error
             will be raised.
 
+        integrator: string
+            integrator selects how pressures are advanced in time. With EULER (the default), the
+            engine takes forward Euler steps of time_res, or, if its multirate flag is set (as it
+            is by default), coarser ones along edges much slower than its fastest edge, up to
+            multirate_res(); a timestep of time_res leaves no room for coarser steps. With EXPM,
+            the flow equations are solved exactly with a matrix exponential over each interval in
+            which no edge changes flow direction, so a long timestep usually costs a single
+            evaluation; time_res is then only the shortest interval that timestep will be split
+            into. With IMPLICIT, the engine takes backward Euler steps of STABLE_TIME_RES_MICROS,
+            which are stable however fast the components are.
+
         Returns a dict of {node: pressure}, much like current_pressures().
         """
-        if not self.plumbing_graph:
-            raise exceptions.InvalidEngineError(
-                "Step() cannot be called on an empty engine.")
-        if not self.is_valid():
-            raise exceptions.InvalidEngineError(
-                "Step() cannot be called on an invalid engine. Check for errors.")
+        self._advance(timestep, integrator)
+
+        return self.current_pressures()
+
+    def iter_steps(self, dt=None, until=None, nodes=None, decimation=1, integrator=utils.EULER):
+        """Step the engine repeatedly, yielding (time, pressures) after each step.
+
+        Unlike calling step() in a loop, no dict of pressures is built per step; pressures is a
+        read-only array of the pressures at the requested nodes, in the order they were given.
+        The engine is stepped lazily, one step per item consumed.
+
+        Parameters
+        ----------
+
+        dt: int
+            dt is the timestep, in microseconds, passed to step(). Defaults to the engine's
+            current time_res.
+
+        until: int
+            until is the engine time, in microseconds, at which to stop. Like solve(), the engine
+            stops after the first step that reaches it, which may overshoot it. If None, the
+            generator never stops on its own.
+
+        nodes: iterable
+            nodes is the nodes whose pressures are yielded. If None, every node is yielded, in the
+            order given by nodes(data=False).
+
+        decimation: int
+            Only every decimation-th step is yielded. The step that reaches until is always
+            yielded.
+
+        integrator: string
+            integrator is passed through to step().
+        """
+        self._check_steppable()
+        if nodes is None:
+            nodes = self.nodes(data=False)
+        nodes = list(nodes)
+        for node in nodes:
+            if node not in self.plumbing_graph:
+                raise exceptions.BadInputError(f"Node {node} not found in graph.")
+        if int(decimation) != decimation or decimation < 1:
+            raise exceptions.BadInputError(
+                f"decimation ({decimation}) must be a positive integer.")
+
+        return self._iter_steps(dt, until, nodes, decimation, integrator)
+
+    def _iter_steps(self, dt, until, nodes, decimation, integrator):
+        """Implement iter_steps(), once its arguments have been checked."""
+        graph = None
+        count = 0
+        while until is None or self.time < until:
+            pressures, _ = self._advance(dt, integrator)
+            count += 1
+            if count % decimation and (until is None or self.time < until):
+                continue
+
+            # The graph is recompiled if it's edited between steps
+            if graph is not self._compiled:
+                graph = self._compiled
+                idx = np.array([graph.node_index[node] for node in nodes], dtype=np.intp)
+            selected = pressures[idx]
+            selected.flags.writeable = False
+            yield self.time, selected
+
+    def _advance(self, timestep, integrator):
+        """
+        Implement step(), returning the new vector of pressures at every compiled node along
+        with the largest rate of change (Pa/s) of any node's pressure over the step.
+        """
+        self._check_steppable()
+        if integrator not in utils.INTEGRATORS:
+            raise exceptions.BadInputError(
+                f"Integrator '{integrator}' not recognized, must be one of {utils.INTEGRATORS}.")
 
         if timestep is None:
             timestep = self.time_res
@@ -604,44 +1012,327 @@ class PlumbingEngine:
         if int(timestep) != timestep:
             raise exceptions.BadInputError(f"timestep ({timestep}) must be integer.")
 
-        new_pressures = {}
-        max_time = self.time + timestep
-        while self.time < max_time:
-            time_res = self.time_res
-            if self.time + self.time_res > max_time:
-                time_res = max_time - self.time
-            for node, data in self.nodes():
-                if node in self.fixed_pressures or node == utils.ATM:
-                    continue
-                dp = 0
-                pressure = data['body'].get_pressure()
-                for edge in self.plumbing_graph.out_edges(node, keys=True):
-                    neighbor = edge[1]
-                    npressure = self.current_pressures(neighbor)
-                    if pressure > npressure:
-                        fc = self.current_FC(edge)
-                        dp -= fc * (pressure - npressure)
-                for edge in self.plumbing_graph.in_edges(node, keys=True):
-                    neighbor = edge[0]
-                    npressure = self.current_pressures(neighbor)
-                    if pressure < npressure:
-                        fc = self.current_FC(edge)
-                        dp += fc * (npressure - pressure)
-                new_pressures[node] = pressure + dp*time_res
-
-            for node, pressure in new_pressures.items():
-                self.set_pressure(node, pressure)
-            self.time += time_res
+        graph = self._compiled_graph()
+        initial_pressures = graph.gather_pressures()
+        free = graph.free_mask(self.fixed_pressures)
+
+        if self._observers.pressure_watches:
+            timestep, pressures, crossing_times = self._integrate_watched(
+                graph, initial_pressures, free, timestep, integrator)
+        else:
+            pressures = self._integrate(graph, initial_pressures, free, timestep, integrator)
+            crossing_times = None
+        self._check_pressures(graph, pressures)
+        self.time += timestep
+        if integrator != utils.EULER:
+            graph.wake()
+
+        self._write_pressures(graph, pressures, free, crossing_times)
+
+        delta = np.max(np.abs(pressures - initial_pressures), initial=0)
+        return pressures, delta / utils.micros_to_s(timestep)
+
+    def _integrate(self, graph, pressures, free, timestep, integrator):
+        """Return the pressures of a compiled graph after timestep, starting from pressures."""
+        if integrator == utils.EXPM:
+            return integrators.expm_step(graph, pressures, free, int(timestep), self.time_res)
+
+        if integrator == utils.IMPLICIT:
+            elapsed = 0
+            while elapsed < timestep:
+                time_res = min(utils.STABLE_TIME_RES_MICROS, timestep - elapsed)
+                pressures = integrators.implicit_step(graph, pressures, free, time_res)
+                elapsed += time_res
+            return pressures
+
+        pressures = pressures.copy()
+        max_fc = np.max(graph.fc[graph.fc != utils.FC_MAX], initial=0)
+        for island in graph.islands():
+            island_free = free[island.nodes]
+            if np.any(island_free) and not graph.is_parked(island):
+                pressures[island.nodes] = self._euler_island(
+                    island, pressures[island.nodes], island_free, timestep, max_fc)
+        return pressures
+
+    def _substep_grid(self, integrator):
+        """
+        Return the interval, in microseconds, at which integrator ends its substeps, so that
+        splitting a step at multiples of it doesn't change the pressures that it reaches.
+        """
+        if integrator == utils.EULER:
+            return self.multirate_res() if self.multirate else self.time_res
+        if integrator == utils.IMPLICIT:
+            return utils.STABLE_TIME_RES_MICROS
+        return utils.MIN_TIME_RES_MICROS
 
-        return self.current_pressures()
+    def _integrate_watched(self, graph, initial_pressures, free, timestep, integrator):
+        """
+        Integrate a step of timestep while pressure watches are registered.
 
-    def solve(self, min_delta=0.1, max_time=30, return_resolution=None):
+        The step is integrated in chunks of WATCH_CHUNK_SUBSTEPS substeps (or in one go, for the
+        exact EXPM integrator), checking the watches after each. The chunk in which each watch
+        first crossed its threshold is kept, so that the crossing can then be localized within
+        it, and once a terminal watch crosses, no further chunks are integrated.
+
+        Returns a tuple of (timestep, pressures, crossing_times) as for _localize_crossings().
+        """
+        grid = self._substep_grid(integrator)
+        chunk = timestep if integrator == utils.EXPM else utils.WATCH_CHUNK_SUBSTEPS * grid
+        watches = self._observers.pressure_watches
+        terminal = {idx for idx, watch in enumerate(watches) if watch.terminal}
+
+        # The pressures, and the islands that were parked, at the ends of the chunks kept
+        trials = {0: initial_pressures}
+        trial_parked = {0: graph.parked()}
+        brackets = {}
+        elapsed = 0
+        pressures = initial_pressures
+        while elapsed < timestep:
+            start, start_pressures, start_parked = elapsed, pressures, graph.parked()
+            dt = min(chunk, timestep - elapsed)
+            pressures = self._integrate(graph, pressures, free, dt, integrator)
+            elapsed += dt
+
+            crossed = [idx for idx in self._observers.crossings(graph, pressures)
+                       if idx not in brackets]
+            if crossed:
+                trials[start] = start_pressures
+                trial_parked[start] = start_parked
+                trials[elapsed] = pressures
+                trial_parked[elapsed] = graph.parked()
+                for idx in crossed:
+                    brackets[idx] = (start, elapsed)
+                if not terminal.isdisjoint(crossed):
+                    break
+
+        crossed = self._observers.crossings(graph, pressures)
+        if not crossed:
+            return elapsed, pressures, None
+        trials[elapsed] = pressures
+        trial_parked[elapsed] = graph.parked()
+        return self._localize_crossings(graph, trials, trial_parked, brackets, elapsed, free,
+                                        integrator, crossed)
+
+    def _localize_crossings(self, graph, trials, trial_parked, brackets, timestep, free,
+                            integrator, crossed):
+        """
+        Find when, during a step of timestep, each pressure watch in crossed crossed its threshold.
+
+        trials maps times since the start of the step (including 0 and timestep) to the pressures
+        at those times, and trial_parked to the islands that were parked then. brackets maps each
+        watch in crossed to the pair of trial times that it first crossed between. Each crossing
+        is narrowed down to within MIN_TIME_RES_MICROS by regula falsi, and then interpolated
+        within that interval. Every new trial is integrated on from the latest trial before it
+        on the integrator's substep grid, so it gives the same pressures as a step of the same
+        length. If a terminal watch crossed, the step is cut short at the end of the earliest
+        such interval.
+
+        Returns a tuple of (timestep, pressures, crossing_times), where timestep and pressures
+        describe the (possibly shortened) step and crossing_times maps the indices in crossed to
+        their crossing times.
+        """
+        grid = self._substep_grid(integrator)
+
+        def integrate_to(dt):
+            if dt not in trials:
+                start = max(time for time in trials if time < dt and time % grid == 0)
+                graph.set_parked(trial_parked[start])
+                trials[dt] = self._integrate(graph, trials[start], free, dt - start, integrator)
+                trial_parked[dt] = graph.parked()
+
+        def trial(dt):
+            integrate_to(dt // grid * grid)
+            integrate_to(dt)
+            return trials[dt]
+
+        crossing_times = {}
+        stop = None
+        for idx in crossed:
+            watch = self._observers.pressure_watches[idx]
+            node = graph.node_index[watch.node]
+            if (trials[0][node] >= watch.threshold) == watch.above:
+                lo, hi = brackets[idx]
+            else:
+                # The watch was already across its threshold when the step started
+                lo = hi = 0
+            f_lo = trials[lo][node] - watch.threshold
+            f_hi = trials[hi][node] - watch.threshold
+            # Illinois variant of regula falsi, on whole microseconds
+            side = 0
+            while hi - lo > utils.MIN_TIME_RES_MICROS:
+                if f_lo == f_hi:
+                    dt = lo + (hi - lo) // 2
+                else:
+                    dt = lo + round((hi - lo) * f_lo / (f_lo - f_hi))
+                dt = min(max(dt, lo + utils.MIN_TIME_RES_MICROS), hi - utils.MIN_TIME_RES_MICROS)
+                f_dt = trial(dt)[node] - watch.threshold
+                if (f_dt >= 0) == (f_lo >= 0):
+                    lo, f_lo = dt, f_dt
+                    if side == -1:
+                        f_hi /= 2
+                    side = -1
+                else:
+                    hi, f_hi = dt, f_dt
+                    if side == 1:
+                        f_lo /= 2
+                    side = 1
+
+            # f_lo and f_hi may have been scaled down above, so interpolate from the trials
+            f_lo = trials[lo][node] - watch.threshold
+            f_hi = trials[hi][node] - watch.threshold
+            fraction = 1 if hi == lo or f_lo == f_hi else f_lo / (f_lo - f_hi)
+            crossing_times[idx] = float(self.time + lo + (hi - lo) * fraction)
+            if watch.terminal and hi > 0 and (stop is None or hi < stop):
+                stop = hi
+
+        if stop is None:
+            stop = timestep
+        graph.set_parked(trial_parked[stop])
+        return stop, trials[stop], crossing_times
+
+    def _check_pressures(self, graph, pressures):
+        """
+        Raise BadInputError if integrating left a node of a compiled graph with a negative or
+        non-finite pressure, which happens when a step is too long to be stable.
+        """
+        invalid = np.flatnonzero(~np.isfinite(pressures) | (pressures < 0))
+        if len(invalid) > 0:
+            idx = invalid[0]
+            raise exceptions.BadInputError(
+                f"Invalid pressure {pressures[idx]} reached at node {graph.nodes[idx]}; "
+                f"time resolution ({self.time_res} us) is too long for the step to be stable.")
+
+    def _write_pressures(self, graph, pressures, free, crossing_times=None):
+        """Write new pressures back to the free nodes of a compiled graph and notify watches."""
+        graph.scatter_pressures(pressures, free)
+        self._observers.pressures_changed(graph, pressures, self.time, crossing_times)
+
+    def watch_pressure(self, node, threshold, callback, terminal=False):
+        """
+        Call callback(node, time, pressure, above) whenever the pressure at node crosses threshold.
+
+        above is True if the pressure has risen to or above threshold, and False if it has fallen
+        below it. Crossings are checked every time the engine's pressures change: after every
+        step, solve, restore or set_pressure() call. Watches are not copied along with the engine.
+
+        When a crossing happens during step() (or iter_steps(), or solve() without adaptive), the
+        step is re-integrated to find when it happened, and time is that crossing time, in
+        microseconds, rather than the time at the end of the step. If terminal is True, the step
+        is also cut short just after the crossing, so that the engine time ends up within
+        MIN_TIME_RES_MICROS of it.
+
+        Returns the watch, which can be passed to unwatch().
+        """
+        if node not in self.plumbing_graph:
+            raise exceptions.BadInputError(f"Node {node} not found in graph.")
+        above = self.current_pressures(node) >= threshold
+        watch = observers.PressureWatch(node, threshold, callback, above, terminal)
+        self._observers.add_pressure_watch(watch)
+        return watch
+
+    def watch_states(self, callback, components=None):
+        """
+        Call callback(component_name, state_id, time) whenever a component changes state.
+
+        If components is given, only changes to the components in it are reported. Returns the
+        watch, which can be passed to unwatch().
+        """
+        if components is not None:
+            components = set(utils.flatten([components]))
+            for name in components:
+                if name not in self.component_dict:
+                    raise exceptions.BadInputError(
+                        f"Component '{name}' not found in component dict.")
+        watch = observers.StateWatch(components, callback)
+        self._observers.add_state_watch(watch)
+        return watch
+
+    def unwatch(self, watch):
+        """Stop calling back a watch returned by watch_pressure() or watch_states()."""
+        if not self._observers.remove(watch):
+            raise exceptions.BadInputError("Watch not registered with this engine.")
+
+    def multirate_res(self):
+        """
+        Return the coarsest resolution, in microseconds, of the forward Euler steps taken by
+        islands and edges when the multirate flag is set.
+
+        It is the longest power-of-two multiple of time_res that is no longer than
+        DEFAULT_TIME_RESOLUTION_MICROS (or time_res itself, if that's longer), so that it's a
+        multiple of the resolution of every edge.
+        """
+        ratio = max(utils.DEFAULT_TIME_RESOLUTION_MICROS // self.time_res, 1)
+        return self.time_res * 2 ** (int(ratio).bit_length() - 1)
+
+    def _euler_island(self, island, pressures, free, timestep, max_fc):
+        """
+        Step the pressures of a single island forward by timestep with forward Euler steps.
+
+        If the engine's multirate flag isn't set, the island takes steps of time_res. Otherwise,
+        each edge in the island is given a resolution that is about proportionally coarser the
+        slower it is than the fastest edge in the whole engine (max_fc being its FC, which sets
+        time_res), rounded down to a power-of-two multiple of time_res no longer than
+        multirate_res(). If some edges need a resolution at least MULTIRATE_RATIO times finer
+        than others, they are sub-cycled at the finest resolution while the rest of the island
+        takes steps as long as the slowest of those others allow; otherwise the whole island is
+        stepped at its finest resolution.
+
+        Once pressures in the island are estimated to have less than SLEEP_TOLERANCE (relative to
+        its largest pressure) left to change, the island is parked and the rest of timestep is
+        skipped. The estimate is the current rate of change over the FC of the slowest open edge,
+        so a slow leak between nodes at nearly the same pressure keeps being stepped until it
+        has equalized. Nothing outside the island can flow in, so it stays
+        parked until it is woken by a change to its FCs or pressures.
+        """
+        fcs = island.fc
+        coarsest = self.multirate_res() if self.multirate else self.time_res
+        edge_res = np.full(len(fcs), self.time_res)
+        if self.multirate and max_fc > 0:
+            ratio = np.full(len(fcs), float(coarsest // self.time_res))
+            open_edges = (fcs > 0) & (fcs != utils.FC_MAX)
+            ratio[open_edges] = np.minimum(max_fc / fcs[open_edges], ratio[open_edges])
+            ratio[fcs == utils.FC_MAX] = 1
+            edge_res = self.time_res * 2 ** np.floor(np.log2(ratio)).astype(int)
+        fine_res = int(np.min(edge_res, initial=coarsest))
+
+        step_res = fine_res
+        fast = None
+        slow_res = edge_res[edge_res >= utils.MULTIRATE_RATIO * fine_res]
+        if len(slow_res) > 0:
+            step_res = int(np.min(slow_res)) // fine_res * fine_res
+            fast = edge_res < step_res
+
+        open_fcs = fcs[fcs > 0]
+        slowest_fc = np.min(open_fcs) if len(open_fcs) > 0 else 0
+
+        elapsed = 0
+        while elapsed < timestep:
+            time_res = min(step_res, timestep - elapsed)
+            if fast is None:
+                new_pressures = integrators.euler_step(island, pressures, free, time_res)
+            else:
+                new_pressures = integrators.multirate_euler_step(island, pressures, free,
+                                                                 time_res, fast, fine_res)
+            delta = np.max(np.abs(new_pressures - pressures))
+            pressures = new_pressures
+            elapsed += time_res
+            remaining = delta / time_res / slowest_fc if slowest_fc > 0 else 0
+            scale = max(np.max(np.abs(pressures)), 1)
+            if remaining < utils.SLEEP_TOLERANCE * scale:
+                island.graph.park(island)
+                break
+
+        return pressures
+
+    def solve(self, min_delta=0.1, max_time=30, return_resolution=None, integrator=utils.EULER,
+              adaptive=False, tolerance=utils.ADAPTIVE_TOLERANCE):
         """Simulate time passing in the engine until node pressures reach steady state.
 
         The simulation proceeds until either all node pressures are no longer changing (within
         a certain tolerance), or until it times out. Depending on the value of return_resolution,
         it returns either a map of {node: pressure} for each node in the graph at the end of the
-        simulation, or a list of maps at intervals of return_resolution.
+        simulation, or a Trajectory of node pressures at intervals of return_resolution. A
+        Trajectory can still be indexed and iterated over like a list of such maps.
 
         Parameters
         ----------
@@ -656,23 +1347,257 @@ class PlumbingEngine:
             and ending.
 
         return_resolution: int
-            return_resolution specifies (in microseconds) the intervals at which dicts of engine
-            pressures will be taken (and returned). If set to None, only a {node: pressure} dict of
+            return_resolution specifies (in microseconds) the intervals at which engine pressures
+            will be taken (and returned). If set to None, only a {node: pressure} dict of
             the final state will be returned. return_resolution must be greater than
             MIN_TIME_RESOLUTION, otherwise an error will be raised. If less than
             self.time_res, time_res will be set to return_resolution.
+
+        integrator: string
+            integrator is passed through to step(); see step() for the available options. When
+            return_resolution isn't given, the engine is stepped in increments of time_res, or of
+            multirate_res() if integrator is EULER and the engine's multirate flag is set, or of
+            STABLE_TIME_RES_MICROS for the other integrators.
+
+        adaptive: bool
+            If True, integrator is ignored and the engine instead takes implicit, second-order
+            TR-BDF2 steps whose length is adjusted to keep their estimated local error below
+            tolerance, so steps grow as pressures settle. Pressures at multiples of
+            return_resolution are interpolated from the steps taken, and the simulation always
+            ends on one of those multiples.
+
+        tolerance: float
+            tolerance is the largest local error, in units of pressure, accepted for a single step
+            when adaptive is True.
         """
         max_time = self.time + utils.s_to_micros(max_time)
+        if adaptive:
+            return self._solve_adaptive(min_delta, max_time, return_resolution, tolerance)
 
         timestep = self.time_res
+        if integrator != utils.EULER:
+            timestep = utils.STABLE_TIME_RES_MICROS
+        elif self.multirate:
+            timestep = self.multirate_res()
         if return_resolution is not None:
             timestep = return_resolution
 
+        # Only the rate of change over the latest step is needed to tell when to stop, so no
+        # history is kept unless it is to be returned.
+        all_states = []
+        times = []
+        while self.time < max_time:
+            pressures, rate = self._advance(timestep, integrator)
+            if return_resolution is not None:
+                all_states.append(pressures)
+                times.append(self.time)
+            if rate < min_delta:
+                break
+
+        if return_resolution is None:
+            return self.current_pressures()
+
+        return trajectory.Trajectory(self._compiled_graph().nodes, times, all_states)
+
+    def _solve_adaptive(self, min_delta, max_time, return_resolution, tolerance):
+        """Implement solve() with an adaptive step size; max_time is an absolute time in us."""
+        self._check_steppable()
+        if return_resolution is not None and return_resolution < utils.MIN_TIME_RES_MICROS:
+            raise exceptions.BadInputError(
+                f"return_resolution ({return_resolution}) too low, must be greater than "
+                f"{utils.MIN_TIME_RES_MICROS} us.")
+
+        graph = self._compiled_graph()
+        pressures = graph.gather_pressures()
+        free = graph.free_mask(self.fixed_pressures)
+
+        samples = []
+        sample_times = []
+        next_sample = None
+        if return_resolution is not None:
+            next_sample = self.time + return_resolution
+
+        dt = self.time_res
+        rates = None
+        converged = False
+        while self.time < max_time:
+            if converged and (next_sample is None or
+                              self.time == next_sample - return_resolution):
+                break
+
+            step_dt = min(dt, max_time - self.time)
+            if converged:
+                # Finish on a sample so that the engine ends up in the last state returned.
+                step_dt = min(step_dt, next_sample - self.time)
+
+            # The first step has no rates of change to start from, so it is taken by step
+            # doubling, which only needs pressures. The error of that first-order step shrinks
+            # with the square of its length, and that of the TR-BDF2 steps after it with the cube.
+            if rates is None:
+                new_pressures, error = integrators.doubling_step(graph, pressures, free, step_dt)
+                new_rates = (new_pressures - pressures) / step_dt
+                order = 1
+            else:
+                new_pressures, error, new_rates = integrators.trbdf2_step(
+                    graph, pressures, free, step_dt, rates)
+                order = 2
+            if error > tolerance and step_dt > utils.MIN_TIME_RES_MICROS:
+                scale = max(0.2, 0.9 * (tolerance / error)**(1 / (order + 1)))
+                dt = max(int(step_dt * scale), utils.MIN_TIME_RES_MICROS)
+                continue
+
+            end_time = self.time + step_dt
+            while next_sample is not None and next_sample <= end_time:
+                fraction = (next_sample - self.time) / step_dt
+                samples.append(integrators.interpolate(
+                    pressures, new_pressures, rates, new_rates, step_dt, fraction))
+                sample_times.append(next_sample)
+                next_sample += return_resolution
+
+            rate = np.max(np.abs(new_pressures - pressures)) / utils.micros_to_s(step_dt)
+            converged = converged or rate < min_delta
+
+            pressures = new_pressures
+            rates = new_rates
+            self.time = end_time
+
+            scale = 4 if error == 0 else min(4, 0.9 * (tolerance / error)**(1 / (order + 1)))
+            dt = max(int(step_dt * scale), utils.MIN_TIME_RES_MICROS)
+
+        self._write_pressures(graph, pressures, free)
+        graph.wake()
+
+        if return_resolution is None:
+            return self.current_pressures()
+
+        return trajectory.Trajectory(graph.nodes, sample_times, samples)
+
+    def solve_steady_state(self, min_delta=0.1, max_time=30):
+        """Set node pressures in the engine to their steady state without simulating time.
+
+        Nodes joined by open edges but not by any fixed-pressure node settle at the mean of their
+        pressures; nodes that are joined to fixed-pressure nodes settle at the pressures that
+        balance the flows between them. The engine time is left unchanged.
+
+        Where a check valve lets pressure get trapped in part of the engine, the
+        steady state depends on how the engine gets there. In that case the engine falls back to
+        calling solve() with an adaptive step size, and the engine time advances as it would
+        there.
+
+        Parameters
+        ----------
+
+        min_delta: float
+            min_delta is passed through to solve() if the steady state can't be found directly.
+
+        max_time: int
+            max_time is passed through to solve() if the steady state can't be found directly.
+
+        Returns a dict of {node: pressure}, much like solve() without a return_resolution.
+        """
+        self._check_steppable()
+
+        graph = self._compiled_graph()
+        free = graph.free_mask(self.fixed_pressures)
+        pressures = integrators.steady_state(graph, graph.gather_pressures(), free)
+        if pressures is None:
+            return self.solve(min_delta, max_time, adaptive=True)
+
+        self._write_pressures(graph, pressures, free)
+        graph.wake()
+
+        return self.current_pressures()
+
+    def solve_ensemble(self, initial_pressures, fcs=None, min_delta=0.1, max_time=30,
+                       return_resolution=None):
+        """Simulate many variants of the engine at once, each from its own initial conditions.
+
+        Every variant shares the engine's nodes, edges and fixed-pressure nodes, but starts from
+        its own node pressures and may have its own edge FCs. All variants are stepped together
+        with forward Euler steps until every one of them reaches steady state (as in solve()) or
+        the simulation times out. The engine itself is left unchanged.
+
+        Nodes are ordered as in plumbing_graph.nodes() and edges as in
+        plumbing_graph.edges(keys=True).
+
+        Parameters
+        ----------
+
+        initial_pressures: array_like
+            initial_pressures is a (K, N) matrix of starting node pressures, with one row for each
+            of K variants and one column for each of N nodes. Fixed-pressure nodes stay at their
+            starting pressure in every variant.
+
+        fcs: array_like
+            fcs is a (K, E) matrix of edge FCs, with one row for each variant and one column for
+            each of E edges. If set to None, every variant uses the engine's current FCs.
+
+        min_delta: float
+            min_delta is the minimum delta pressure over time (Pa/s) for the simulation to keep
+            going, as in solve(). The simulation ends once it holds for every variant.
+
+        max_time: int
+            max_time is the maximum time in seconds that the simulation will run before timing out
+            and ending.
+
+        return_resolution: int
+            return_resolution specifies (in microseconds) the intervals at which node pressures
+            will be taken (and returned). If set to None, only the final state is returned.
+            return_resolution must be greater than MIN_TIME_RESOLUTION, otherwise an error will be
+            raised.
+
+        Returns a (K, T, N) array of the node pressures of every variant at each of T intervals
+        of return_resolution, or with T of 1 if return_resolution is None.
+        """
+        self._check_steppable()
+        if return_resolution is not None and return_resolution < utils.MIN_TIME_RES_MICROS:
+            raise exceptions.BadInputError(
+                f"return_resolution ({return_resolution}) too low, must be greater than "
+                f"{utils.MIN_TIME_RES_MICROS} us.")
+
+        graph = self._compiled_graph()
+        pressures = np.array(initial_pressures, dtype=float)
+        if pressures.ndim != 2 or pressures.shape[1] != len(graph.nodes):
+            raise exceptions.BadInputError(
+                f"initial_pressures must have shape (K, {len(graph.nodes)}), not "
+                f"{pressures.shape}.")
+
+        if fcs is None:
+            fcs = np.broadcast_to(graph.fc, (len(pressures), len(graph.edges)))
+        fcs = np.asarray(fcs, dtype=float)
+        if fcs.shape != (len(pressures), len(graph.edges)):
+            raise exceptions.BadInputError(
+                f"fcs must have shape ({len(pressures)}, {len(graph.edges)}), not {fcs.shape}.")
+
+        # As in _set_time_res(), but for the fastest edge of any variant.
+        time_res = self.time_res
+        stepped_fcs = fcs[fcs != utils.FC_MAX]
+        max_fc = np.max(stepped_fcs, initial=0)
+        if max_fc > utils.teq_to_FC(time_res * utils.DEFAULT_RESOLUTION_SCALE):
+            time_res = max(int(utils.FC_to_teq(max_fc) / utils.DEFAULT_RESOLUTION_SCALE),
+                           utils.MIN_TIME_RES_MICROS)
+
+        interval = time_res if return_resolution is None else return_resolution
+        free = graph.free_mask(self.fixed_pressures)
+
         all_states = []
-        while not utils.all_converged(all_states, timestep, min_delta) and self.time < max_time:
-            all_states.append(self.step(timestep))
+        time = 0
+        max_time = utils.s_to_micros(max_time)
+        while time < max_time:
+            previous = pressures
+            target = time + interval
+            while time < target:
+                step = min(time_res, target - time)
+                pressures = integrators.ensemble_euler_step(graph, pressures, fcs, free, step)
+                time += step
+
+            if return_resolution is not None:
+                all_states.append(pressures)
+            rate = np.max(np.abs(pressures - previous), initial=0) / utils.micros_to_s(interval)
+            if rate < min_delta:
+                break
 
         if return_resolution is None:
-            return all_states[-1]
+            all_states.append(pressures)
 
-        return all_states
+        return np.stack(all_states, axis=1)
@@ -6,6 +6,25 @@ FC_MAX = 4.5 / TEQ_MIN
 CLOSED = 'closed'
 ATM = 'atm'
 MAX_PLUMBING_TIME_S = 30
+EULER = 'euler'
+EXPM = 'expm'
+IMPLICIT = 'implicit'
+INTEGRATORS = [EULER, EXPM, IMPLICIT]
+# Step size for integrators that stay stable at any step size. It only needs to resolve the
+# slowest components accurately, so unlike time_res it doesn't shrink for fast components.
+STABLE_TIME_RES_MICROS = DEFAULT_TIME_RESOLUTION_MICROS
+# Islands of the graph whose pressures are estimated to have less than this much (relative to
+# their largest pressure) left to change are parked and skipped by forward Euler steps until
+# something disturbs them
+SLEEP_TOLERANCE = 1e-6
+# Edges that need a step at least this many times finer than the slowest edges of their island
+# are sub-cycled on their own by forward Euler steps
+MULTIRATE_RATIO = 10
+# Steps taken while pressure watches are registered are integrated in chunks of this many
+# substeps, so that a threshold crossing only has to be localized within the chunk it happened in
+WATCH_CHUNK_SUBSTEPS = 16
+# Largest estimated local error (in pressure units) accepted per step when solving adaptively
+ADAPTIVE_TOLERANCE = 0.01
 
 
 def teq_to_FC(teq):
@@ -44,19 +63,3 @@ def flatten(args, unpack_tuples=True):
             flattened_args.append(arg)
 
     return flattened_args
-
-
-def converged(p1, p2, d_t, eps):
-    return abs(p2 - p1) / micros_to_s(d_t) < eps
-
-
-def all_converged(all_states, d_t, eps):
-    if len(all_states) < 2:
-        return False
-    for node in all_states[0].keys():
-        p1 = all_states[-1][node]
-        p2 = all_states[-2][node]
-        if not converged(p1, p2, d_t, eps):
-            return False
-
-    return True
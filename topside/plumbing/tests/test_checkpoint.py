@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+import topside as top
+import topside.plumbing.checkpoint as checkpoint
+import topside.plumbing.exceptions as exceptions
+import topside.plumbing.tests.testing_utils as test
+import topside.plumbing.plumbing_utils as utils
+
+
+def assert_same_engine(plumb, other):
+    assert other.nodes() == plumb.nodes()
+    assert other.edges() == plumb.edges()
+    assert other.current_state() == plumb.current_state()
+    assert other.current_pressures() == plumb.current_pressures()
+    assert other.fixed_pressures == plumb.fixed_pressures
+    assert other.errors() == plumb.errors()
+    assert other.mapping == plumb.mapping
+    assert other.time == plumb.time
+    assert other.time_res == plumb.time_res
+    for name, component in plumb.component_dict.items():
+        assert other.component_dict[name].states == component.states
+
+
+def test_checkpoint_round_trip(tmp_path):
+    plumb = test.two_valve_setup_fixed(1, 1, utils.CLOSED, utils.CLOSED, 1, 0.5, 1, 1)
+    plumb.step(1e5)
+    plumb.set_component_state('valve1', 'closed')
+    pc = test.create_component(1, 1, 1, 1, 'vent', 'C')
+    plumb.add_component(pc, {1: 2, 2: utils.ATM}, 'open')
+    plumb.step(1e5)
+
+    path = tmp_path / 'engine.ckpt'
+    plumb.save_checkpoint(path)
+    loaded = top.PlumbingEngine.load_checkpoint(path)
+    assert_same_engine(plumb, loaded)
+    assert isinstance(loaded.get_node_body(utils.ATM), top.AtmNode)
+
+    plumb.step(1e5)
+    loaded.step(1e5)
+    assert_same_engine(plumb, loaded)
+
+    plumb.reset(True)
+    loaded.reset(True)
+    assert_same_engine(plumb, loaded)
+
+
+def test_checkpoint_invalid_engine(tmp_path):
+    wrong_component_name = 'potato'
+    pc1 = test.create_component(0, 0, 0, 0, 'valve1', 'A')
+    pc2 = test.create_component(0, 0, 0, 0, 'valve2', 'B')
+    mapping = {'valve1': {1: 1, 2: 2}, 'valve2': {1: 2, 2: 3}}
+    plumb = top.PlumbingEngine({wrong_component_name: pc1, 'valve2': pc2}, mapping,
+                               {3: (100, False)}, {'valve1': 'closed', 'valve2': 'open'})
+    assert not plumb.is_valid()
+
+    path = tmp_path / 'engine.ckpt'
+    plumb.save_checkpoint(path)
+    loaded = top.PlumbingEngine.load_checkpoint(path)
+    assert_same_engine(plumb, loaded)
+    assert not loaded.is_valid()
+
+
+def test_checkpoint_memory_mapped(tmp_path):
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    path = tmp_path / 'engine.ckpt'
+    plumb.save_checkpoint(path)
+
+    header, arrays = checkpoint.read_checkpoint(path)
+    assert header['edge_keys'] == [key for _, _, key in plumb.edges(data=False)]
+    assert isinstance(arrays['pressures'], np.memmap)
+    assert list(arrays['pressures']) == [0, 0, 100]
+    for name in ['pressures', 'fixed', 'src', 'dst', 'fc']:
+        assert arrays[name].offset % checkpoint.ALIGNMENT == 0
+
+
+def test_checkpoint_errors(tmp_path):
+    path = tmp_path / 'engine.ckpt'
+    path.write_bytes(b'not a checkpoint')
+    with pytest.raises(exceptions.BadInputError):
+        top.PlumbingEngine.load_checkpoint(path)
+
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    plumb.save_checkpoint(path)
+    data = bytearray(path.read_bytes())
+    data[4] = checkpoint.VERSION + 1
+    path.write_bytes(bytes(data))
+    with pytest.raises(exceptions.BadInputError):
+        top.PlumbingEngine.load_checkpoint(path)
@@ -0,0 +1,139 @@
+import numpy as np
+
+import topside.plumbing.compiled_graph as compiled
+import topside.plumbing.tests.testing_utils as test
+import topside.plumbing.plumbing_utils as utils
+
+
+def test_compiled_structure():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    graph = compiled.CompiledGraph(plumb.plumbing_graph)
+
+    assert graph.nodes == [1, 2, 3]
+    assert graph.node_index == {1: 0, 2: 1, 3: 2}
+    assert graph.edges == plumb.edges(data=False)
+
+    for idx, (start, end, _) in enumerate(graph.edges):
+        assert graph.nodes[graph.src[idx]] == start
+        assert graph.nodes[graph.dst[idx]] == end
+
+    assert np.array_equal(graph.gather_pressures(), [0, 0, 100])
+
+
+def test_compiled_fc_tracks_state():
+    plumb = test.two_valve_setup(1, 1, utils.CLOSED, utils.CLOSED, 1, 1, 1, 1)
+    graph = plumb._compiled_graph()
+    edge = (1, 2, 'valve1.A1')
+
+    assert graph.fc[graph.edge_index[edge]] == 0
+
+    plumb.set_component_state('valve1', 'open')
+
+    assert plumb._compiled_graph() is graph
+    assert graph.fc[graph.edge_index[edge]] == plumb.current_FC(edge)
+
+
+def test_compiled_recompiles_on_edit():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    graph = plumb._compiled_graph()
+
+    pc = test.create_component(1, 1, 1, 1, 'vent', 'C')
+    plumb.add_component(pc, {1: 3, 2: utils.ATM}, 'open')
+
+    new_graph = plumb._compiled_graph()
+    assert new_graph is not graph
+    assert utils.ATM in new_graph.node_index
+
+    free = new_graph.free_mask(plumb.fixed_pressures)
+    assert not free[new_graph.node_index[utils.ATM]]
+
+
+def test_free_mask():
+    plumb = test.two_valve_setup_fixed(1, 1, 1, 1, 1, 1, 1, 1)
+    graph = plumb._compiled_graph()
+
+    assert list(graph.free_mask(plumb.fixed_pressures)) == [True, True, False]
+
+
+def island_nodes(graph):
+    return sorted(sorted(graph.nodes[idx] for idx in island.nodes) for island in graph.islands())
+
+
+def test_islands_track_state():
+    plumb = test.two_valve_setup(1, 1, utils.CLOSED, utils.CLOSED,
+                                 1, 1, utils.CLOSED, utils.CLOSED)
+    graph = plumb._compiled_graph()
+
+    assert island_nodes(graph) == [[1], [2, 3]]
+
+    plumb.set_component_state('valve1', 'open')
+    assert island_nodes(graph) == [[1, 2, 3]]
+
+    plumb.set_component_state('valve2', 'closed')
+    assert island_nodes(graph) == [[1, 2], [3]]
+
+    plumb.set_component_state('valve1', 'closed')
+    assert island_nodes(graph) == [[1], [2], [3]]
+
+    fresh = compiled.CompiledGraph(plumb.plumbing_graph)
+    assert island_nodes(fresh) == island_nodes(graph)
+
+
+def test_island_edges():
+    plumb = test.two_valve_setup(1, 1, utils.CLOSED, utils.CLOSED, 1, 1, 1, 1)
+    graph = plumb._compiled_graph()
+
+    for island in graph.islands():
+        for local_idx, edge_idx in enumerate(island.edges):
+            assert island.nodes[island.src[local_idx]] == graph.src[edge_idx]
+            assert island.nodes[island.dst[local_idx]] == graph.dst[edge_idx]
+            assert island.fc[local_idx] == graph.fc[edge_idx] > 0
+
+
+def test_parked_islands_wake():
+    plumb = test.two_valve_setup(1, 1, utils.CLOSED, utils.CLOSED, 1, 1, 1, 1)
+    graph = plumb._compiled_graph()
+
+    def parked():
+        return [sorted(graph.nodes[idx] for idx in island.nodes)
+                for island in graph.islands() if graph.is_parked(island)]
+
+    for island in graph.islands():
+        graph.park(island)
+    assert parked() == [[1], [2, 3]]
+
+    plumb.set_pressure(3, 50)
+    assert parked() == [[1]]
+
+    graph.park(graph.islands()[1])
+    plumb.set_component_state('valve2', 'open')
+    assert parked() == [[1], [2, 3]]
+
+    plumb.set_teq('valve2', {'open': {(1, 2, 'B1'): 2}})
+    assert parked() == [[1]]
+
+    plumb.set_component_state('valve1', 'open')
+    assert parked() == []
+
+
+def test_resolved_states_match_recompile():
+    plumb = test.two_valve_setup(1, 1, utils.CLOSED, utils.CLOSED, 1, 1, 1, 1)
+    graph = plumb._compiled_graph()
+
+    def check():
+        fresh = compiled.CompiledGraph(plumb.plumbing_graph)
+        assert np.array_equal(graph.fc, fresh.fc)
+        for edge in plumb.edges(data=False):
+            assert graph.fc[graph.edge_index[edge]] == plumb.current_FC(edge)
+
+    plumb.set_component_state('valve1', 'open')
+    check()
+
+    plumb.set_teq('valve1', {'open': {(1, 2, 'A1'): 2}})
+    plumb.set_component_state('valve1', 'closed')
+    plumb.set_component_state('valve1', 'open')
+    assert plumb.current_FC((1, 2, 'valve1.A1')) == utils.teq_to_FC(utils.s_to_micros(2))
+    check()
+
+    plumb.set_component_state('valve2', 'closed')
+    check()
@@ -0,0 +1,552 @@
+import numpy as np
+import pytest
+
+import topside as top
+import topside.plumbing.compiled_graph as compiled
+import topside.plumbing.exceptions as exceptions
+import topside.plumbing.integrators as integrators
+import topside.plumbing.tests.testing_utils as test
+import topside.plumbing.plumbing_utils as utils
+
+
+def reference_euler_step(plumb, time_res):
+    """Per-node, dict-based forward Euler step that the vectorized kernel must match."""
+    pressures = plumb.current_pressures()
+    new_pressures = dict(pressures)
+    for node, pressure in pressures.items():
+        if node in plumb.fixed_pressures or node == utils.ATM:
+            continue
+        dp = 0
+        for edge in plumb.plumbing_graph.out_edges(node, keys=True):
+            if pressure > pressures[edge[1]]:
+                dp -= plumb.current_FC(edge) * (pressure - pressures[edge[1]])
+        for edge in plumb.plumbing_graph.in_edges(node, keys=True):
+            if pressure < pressures[edge[0]]:
+                dp += plumb.current_FC(edge) * (pressures[edge[0]] - pressure)
+        new_pressures[node] = pressure + dp * time_res
+    return new_pressures
+
+
+def three_way_engine():
+    states = {
+        'open': {
+            (1, 2, 'A1'): 1,
+            (2, 1, 'A2'): 0.5,
+            (1, 3, 'B1'): 2,
+            (3, 1, 'B2'): utils.CLOSED
+        }
+    }
+    edges = [(1, 2, 'A1'), (2, 1, 'A2'), (1, 3, 'B1'), (3, 1, 'B2')]
+    pc = top.PlumbingComponent('three', states, edges)
+    vent = test.create_component(1, 1, 1, 1, 'vent', 'C')
+    mapping = {
+        'three': {1: 1, 2: 2, 3: 3},
+        'vent': {1: 3, 2: utils.ATM}
+    }
+    pressures = {1: (100, False), 2: (20, False), 3: (70, True)}
+    return top.PlumbingEngine({'three': pc, 'vent': vent}, mapping, pressures,
+                              {'three': 'open', 'vent': 'open'})
+
+
+def test_euler_step_matches_reference():
+    plumb = three_way_engine()
+    graph = plumb._compiled_graph()
+    pressures = graph.gather_pressures()
+    free = graph.free_mask(plumb.fixed_pressures)
+
+    expected = reference_euler_step(plumb, plumb.time_res)
+    stepped = integrators.euler_step(graph, pressures, free, plumb.time_res)
+
+    for node, idx in graph.node_index.items():
+        assert stepped[idx] == pytest.approx(expected[node])
+
+
+def test_flow_rates_conserve_pressure():
+    plumb = three_way_engine()
+    graph = plumb._compiled_graph()
+
+    dp = integrators.flow_rates(graph, graph.gather_pressures())
+
+    assert np.sum(dp) == pytest.approx(0)
+    assert dp[graph.node_index[2]] > 0
+
+
+def test_expm_step_exact_two_node():
+    pc = test.create_component(1, 1, 1, 1, 'valve', 'A')
+    plumb = top.PlumbingEngine({'valve': pc}, {'valve': {1: 1, 2: 2}}, {1: (100, False)},
+                               {'valve': 'open'})
+    fc = utils.teq_to_FC(utils.s_to_micros(1))
+    timestep = utils.s_to_micros(0.2)
+
+    state = plumb.step(timestep, integrator=utils.EXPM)
+
+    assert plumb.time == timestep
+    assert state[1] == pytest.approx(50 + 50 * np.exp(-2 * fc * timestep))
+    assert state[2] == pytest.approx(50 - 50 * np.exp(-2 * fc * timestep))
+
+
+def test_expm_step_matches_fine_euler():
+    euler_plumb = three_way_engine()
+    euler_plumb.time_res = 100
+    expm_plumb = three_way_engine()
+
+    euler_state = euler_plumb.step(utils.s_to_micros(0.5))
+    expm_state = expm_plumb.step(utils.s_to_micros(0.5), integrator=utils.EXPM)
+
+    assert expm_state[3] == 70
+    assert expm_state[utils.ATM] == 0
+    for node, pressure in euler_state.items():
+        assert expm_state[node] == pytest.approx(pressure, abs=0.01)
+
+
+def test_expm_step_propagates_through_ties():
+    # Nodes 2 and 3 start at the same pressure, so flow into 3 only starts once 2 fills up.
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    plumb.set_component_state('valve1', 'open')
+    euler_plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    euler_plumb.set_component_state('valve1', 'open')
+    euler_plumb.time_res = 100
+
+    expm_state = plumb.step(utils.s_to_micros(0.1), integrator=utils.EXPM)
+    euler_state = euler_plumb.step(utils.s_to_micros(0.1))
+
+    for node, pressure in euler_state.items():
+        assert expm_state[node] == pytest.approx(pressure, abs=0.01)
+
+
+def test_expm_step_check_valve():
+    pc = test.create_component(1, utils.CLOSED, utils.CLOSED, utils.CLOSED, 'check', 'A')
+    plumb = top.PlumbingEngine({'check': pc}, {'check': {1: 1, 2: 2}},
+                               {1: (100, False), 2: (0, False)}, {'check': 'open'})
+
+    state = plumb.step(utils.s_to_micros(5), integrator=utils.EXPM)
+    assert state[1] == pytest.approx(50)
+    assert state[2] == pytest.approx(50)
+
+    plumb.set_pressure(2, 200)
+    state = plumb.step(utils.s_to_micros(5), integrator=utils.EXPM)
+    assert state == {1: pytest.approx(50), 2: 200}
+
+
+def test_implicit_step_stable_with_fast_component():
+    # A teq of 0 gives the highest possible FC, far too stiff for an explicit step this long.
+    pc = test.create_component(0, 0, 0, 0, 'qd', 'A')
+    plumb = top.PlumbingEngine({'qd': pc}, {'qd': {1: 1, 2: 2}}, {1: (100, False)},
+                               {'qd': 'open'})
+    graph = plumb._compiled_graph()
+    pressures = graph.gather_pressures()
+    free = graph.free_mask(plumb.fixed_pressures)
+
+    exploded = integrators.euler_step(graph, pressures, free, utils.STABLE_TIME_RES_MICROS)
+    assert np.max(np.abs(exploded)) > 100
+
+    stepped = integrators.implicit_step(graph, pressures, free, utils.STABLE_TIME_RES_MICROS)
+    assert stepped == pytest.approx([50, 50], abs=0.1)
+
+
+def test_implicit_step_matches_fine_euler():
+    euler_plumb = three_way_engine()
+    euler_plumb.time_res = 100
+    implicit_plumb = three_way_engine()
+
+    euler_state = euler_plumb.step(utils.s_to_micros(2))
+    implicit_state = implicit_plumb.step(utils.s_to_micros(2), integrator=utils.IMPLICIT)
+
+    assert implicit_plumb.time == utils.s_to_micros(2)
+    assert implicit_state[3] == 70
+    for node, pressure in euler_state.items():
+        assert implicit_state[node] == pytest.approx(pressure, abs=1)
+
+
+def test_implicit_solve():
+    plumb = test.two_valve_setup(0, 0, 0, 0, 1, 1, 1, 1)
+    plumb.set_component_state('valve1', 'open')
+
+    state = plumb.solve(integrator=utils.IMPLICIT)
+
+    assert state == {1: pytest.approx(33.3, abs=test.SOLVE_TOL),
+                     2: pytest.approx(33.3, abs=test.SOLVE_TOL),
+                     3: pytest.approx(33.3, abs=test.SOLVE_TOL)}
+
+
+def test_doubling_step_error_shrinks_with_step():
+    plumb = three_way_engine()
+    graph = plumb._compiled_graph()
+    pressures = graph.gather_pressures()
+    free = graph.free_mask(plumb.fixed_pressures)
+
+    _, long_error = integrators.doubling_step(graph, pressures, free, utils.s_to_micros(1))
+    _, short_error = integrators.doubling_step(graph, pressures, free, utils.s_to_micros(0.01))
+
+    assert 0 < short_error < long_error
+
+
+def test_trbdf2_step_error_shrinks_with_step():
+    plumb = three_way_engine()
+    graph = plumb._compiled_graph()
+    free = graph.free_mask(plumb.fixed_pressures)
+    short_step = utils.s_to_micros(0.01)
+
+    # Start from a state with known rates of change, the way solve() does
+    pressures, _ = integrators.doubling_step(graph, graph.gather_pressures(), free, short_step)
+    rates = integrators.flow_rates(graph, pressures) * free
+
+    _, long_error, _ = integrators.trbdf2_step(graph, pressures, free, 10 * short_step, rates)
+    new_pressures, short_error, new_rates = integrators.trbdf2_step(
+        graph, pressures, free, short_step, rates)
+
+    # The error of a second-order step shrinks with the cube of its length
+    assert 0 < short_error < long_error / 100
+    assert new_rates == pytest.approx(integrators.flow_rates(graph, new_pressures) * free)
+
+
+def test_adaptive_solve():
+    plumb = test.two_valve_setup(0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    plumb.set_component_state('valve1', 'open')
+    fixed_plumb = test.two_valve_setup(0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    fixed_plumb.set_component_state('valve1', 'open')
+
+    state = plumb.solve(adaptive=True)
+    fixed_state = fixed_plumb.solve()
+
+    assert plumb.time < utils.s_to_micros(30)
+    for node, pressure in fixed_state.items():
+        assert state[node] == pytest.approx(pressure, abs=test.SOLVE_TOL)
+
+
+def test_adaptive_solve_return_resolution():
+    plumb = test.two_valve_setup(0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    plumb.set_component_state('valve1', 'open')
+    exact_plumb = test.two_valve_setup(0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    exact_plumb.set_component_state('valve1', 'open')
+    resolution = utils.s_to_micros(0.1)
+
+    states = plumb.solve(return_resolution=resolution, adaptive=True)
+
+    assert plumb.time == len(states) * resolution
+    assert states[-1] == plumb.current_pressures()
+    for state in states:
+        exact_state = exact_plumb.step(resolution, integrator=utils.EXPM)
+        for node, pressure in exact_state.items():
+            assert state[node] == pytest.approx(pressure, abs=0.5)
+
+
+def test_adaptive_solve_takes_fewer_steps(monkeypatch):
+    # A fast valve feeding a slow one, so that most of the solve is spent settling
+    plumb = test.two_valve_setup(0.1, 0.1, 1, 1, 2, 2, 2, 2)
+    plumb.set_component_state('valve1', 'open')
+    fixed_plumb = test.two_valve_setup(0.1, 0.1, 1, 1, 2, 2, 2, 2)
+    fixed_plumb.set_component_state('valve1', 'open')
+
+    calls = []
+    for kernel in ['euler_step', 'multirate_euler_step', 'implicit_step']:
+        def counted(*args, kernel=getattr(integrators, kernel)):
+            calls.append(None)
+            return kernel(*args)
+        monkeypatch.setattr(integrators, kernel, counted)
+
+    fixed_state = fixed_plumb.solve()
+    fixed_calls = len(calls)
+    calls.clear()
+    state = plumb.solve(adaptive=True)
+
+    assert len(calls) < fixed_calls / 4
+    for node, pressure in fixed_state.items():
+        assert state[node] == pytest.approx(pressure, abs=test.SOLVE_TOL)
+
+
+def test_steady_state_closed():
+    plumb = test.two_valve_setup(0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    plumb.set_component_state('valve1', 'open')
+
+    state = plumb.solve_steady_state()
+
+    assert plumb.time == 0
+    assert state == {1: pytest.approx(100 / 3), 2: pytest.approx(100 / 3),
+                     3: pytest.approx(100 / 3)}
+
+
+def test_steady_state_between_fixed_pressures():
+    pc1 = test.create_component(0.5, 1, 1, 1, 'valve1', 'A')
+    pc2 = test.create_component(1, 0.5, 1, 1, 'valve2', 'B')
+    mapping = {'valve1': {1: 1, 2: 2}, 'valve2': {1: 2, 2: 3}}
+    pressures = {1: (100, True), 3: (0, True)}
+    states = {'valve1': 'open', 'valve2': 'open'}
+    plumb = top.PlumbingEngine({'valve1': pc1, 'valve2': pc2}, mapping, pressures, states)
+    solve_plumb = top.PlumbingEngine({'valve1': pc1, 'valve2': pc2}, mapping, pressures, states)
+
+    state = plumb.solve_steady_state()
+    solve_state = solve_plumb.solve(integrator=utils.IMPLICIT)
+
+    # Flow goes through valve1's 0.5 s edge and valve2's 1 s edge, so FCs are 9 and 4.5.
+    assert state == {1: 100, 2: pytest.approx(200 / 3), 3: 0}
+    assert state[2] == pytest.approx(solve_state[2], abs=test.SOLVE_TOL)
+
+
+def check_valve_engine(tank_pressure):
+    # A fixed source feeds a tank through a check valve, and the tank vents to atmosphere.
+    check = test.create_component(0.5, utils.CLOSED, utils.CLOSED, utils.CLOSED, 'check', 'A')
+    vent = test.create_component(1, 1, utils.CLOSED, utils.CLOSED, 'vent', 'B')
+    mapping = {'check': {1: 1, 2: 2}, 'vent': {1: 2, 2: utils.ATM}}
+    pressures = {1: (1000, True), 2: (tank_pressure, False)}
+    return top.PlumbingEngine({'check': check, 'vent': vent}, mapping, pressures,
+                              {'check': 'open', 'vent': 'open'})
+
+
+def test_steady_state_through_check_valve():
+    for tank_pressure in [0, 2000]:
+        plumb = check_valve_engine(tank_pressure)
+
+        state = plumb.solve_steady_state()
+
+        assert plumb.time == 0
+        assert state == {1: 1000, 2: pytest.approx(2000 / 3, rel=1e-12), utils.ATM: 0}
+
+
+def test_steady_state_falls_back_behind_check_valve():
+    # Without the vent, pressure above the source's is trapped in the tank.
+    plumb = check_valve_engine(2000)
+    plumb.set_component_state('vent', 'closed')
+    graph = plumb._compiled_graph()
+    free = graph.free_mask(plumb.fixed_pressures)
+
+    assert integrators.steady_state(graph, graph.gather_pressures(), free) is None
+    assert plumb.solve_steady_state()[2] == pytest.approx(2000)
+
+
+def test_steady_state_falls_back_on_trapped_pressure():
+    plumb = three_way_engine()
+    solve_plumb = three_way_engine()
+    graph = plumb._compiled_graph()
+    free = graph.free_mask(plumb.fixed_pressures)
+
+    # Node 1 drains into node 3 through a check valve, so where it stops depends on node 2.
+    assert integrators.steady_state(graph, graph.gather_pressures(), free) is None
+
+    state = plumb.solve_steady_state()
+    solve_state = solve_plumb.solve(integrator=utils.EXPM)
+
+    assert plumb.time > 0
+    for node, pressure in solve_state.items():
+        assert state[node] == pytest.approx(pressure, abs=test.SOLVE_TOL)
+
+
+def test_ensemble_euler_step_matches_euler_step():
+    plumb = three_way_engine()
+    graph = plumb._compiled_graph()
+    free = graph.free_mask(plumb.fixed_pressures)
+    pressures = np.array([graph.gather_pressures(), [10, 90, 70, 0], [50, 50, 70, 0]])
+    fcs = np.array([graph.fc, graph.fc * 2, graph.fc])
+
+    stepped = integrators.ensemble_euler_step(graph, pressures, fcs, free, 1000)
+
+    for row in range(3):
+        graph.fc = fcs[row]
+        assert stepped[row] == pytest.approx(
+            integrators.euler_step(graph, pressures[row], free, 1000))
+
+
+def test_solve_ensemble():
+    plumb = test.two_valve_setup(0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    plumb.set_component_state('valve1', 'open')
+    initial_pressures = [[0, 0, 100], [30, 60, 90], [10, 10, 10]]
+    resolution = utils.s_to_micros(0.1)
+
+    states = plumb.solve_ensemble(initial_pressures, return_resolution=resolution)
+
+    assert plumb.time == 0
+    assert states.shape[0] == 3 and states.shape[2] == 3
+    expected = np.array([[100 / 3] * 3, [60] * 3, [10] * 3])
+    assert states[:, -1] == pytest.approx(expected, abs=test.SOLVE_TOL)
+    for variant, pressures in enumerate(initial_pressures):
+        for node, pressure in zip(plumb.plumbing_graph.nodes(), pressures):
+            plumb.set_pressure(node, pressure)
+        plumb.time = 0
+        for state in states[variant]:
+            assert list(plumb.step(resolution).values()) == pytest.approx(state)
+
+
+def test_solve_ensemble_fcs():
+    plumb = test.two_valve_setup(0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    plumb.set_component_state('valve1', 'open')
+    fcs = np.array([plumb._compiled_graph().fc] * 2)
+    fcs[1, :] = 0
+
+    states = plumb.solve_ensemble([[0, 0, 100]] * 2, fcs)
+
+    assert states.shape == (2, 1, 3)
+    assert states[0, 0] == pytest.approx([100 / 3] * 3, abs=test.SOLVE_TOL)
+    assert list(states[1, 0]) == [0, 0, 100]
+
+    with pytest.raises(exceptions.BadInputError):
+        plumb.solve_ensemble([[0, 0, 100]] * 2, fcs[:, :1])
+
+
+def test_euler_islands_step_at_own_resolution():
+    # The fast valve sets time_res, but the slow valve isn't connected to it.
+    fast = test.create_component(0.01, 0.01, 0.01, 0.01, 'fast', 'A')
+    slow = test.create_component(1, 1, 1, 1, 'slow', 'B')
+    mapping = {'fast': {1: 1, 2: 2}, 'slow': {1: 3, 2: 4}}
+    pressures = {1: (100, False), 3: (100, False)}
+    plumb = top.PlumbingEngine({'fast': fast, 'slow': slow}, mapping, pressures,
+                               {'fast': 'open', 'slow': 'open'})
+    assert plumb.multirate
+    graph = compiled.CompiledGraph(plumb.plumbing_graph)
+    free = graph.free_mask(plumb.fixed_pressures)
+    fast_res = plumb.time_res
+    slow_res = plumb.multirate_res()
+
+    fast_pressures = graph.gather_pressures()
+    for _ in range(slow_res // fast_res):
+        fast_pressures = integrators.euler_step(graph, fast_pressures, free, fast_res)
+    slow_pressures = integrators.euler_step(graph, graph.gather_pressures(), free, slow_res)
+
+    state = plumb.step(slow_res)
+
+    assert fast_res < slow_res
+    assert [state[1], state[2]] == pytest.approx(list(fast_pressures[:2]))
+    assert [state[3], state[4]] == pytest.approx(list(slow_pressures[2:]))
+
+
+def test_solve_steps_slow_islands_coarsely(monkeypatch):
+    def make_engine():
+        fast = test.create_component(0.01, 0.01, 0.01, 0.01, 'fast', 'A')
+        slow = test.create_component(2, 2, 2, 2, 'slow', 'B')
+        mapping = {'fast': {1: 1, 2: 2}, 'slow': {1: 3, 2: 4}}
+        pressures = {1: (100, False), 3: (100, False)}
+        return top.PlumbingEngine({'fast': fast, 'slow': slow}, mapping, pressures,
+                                  {'fast': 'open', 'slow': 'open'})
+
+    calls = []
+    euler_step = integrators.euler_step
+    monkeypatch.setattr(integrators, 'euler_step',
+                        lambda *args: calls.append(None) or euler_step(*args))
+
+    plumb = make_engine()
+    plumb.multirate = False
+    reference = plumb.solve(max_time=2)
+    single_rate_calls = len(calls)
+
+    calls.clear()
+    state = make_engine().solve(max_time=2)
+    assert len(calls) < single_rate_calls / 4
+    assert state == pytest.approx(reference, abs=test.SOLVE_TOL)
+
+
+def test_euler_steps_at_time_res_without_multirate():
+    # Without the multirate flag, every island and edge steps at time_res, however slow it is.
+    fast = test.create_component(0.01, 0.01, 0.01, 0.01, 'fast', 'A')
+    slow = test.create_component(1, 1, 1, 1, 'slow', 'B')
+    slower = test.create_component(10, 10, 10, 10, 'slower', 'C')
+    mapping = {'fast': {1: 1, 2: 2}, 'slow': {1: 3, 2: 4}, 'slower': {1: 4, 2: 5}}
+    pressures = {1: (100, False), 3: (100, False)}
+    plumb = top.PlumbingEngine({'fast': fast, 'slow': slow, 'slower': slower}, mapping,
+                               pressures, {'fast': 'open', 'slow': 'open', 'slower': 'open'})
+    graph = compiled.CompiledGraph(plumb.plumbing_graph)
+    free = graph.free_mask(plumb.fixed_pressures)
+
+    reference = graph.gather_pressures()
+    for _ in range(utils.DEFAULT_TIME_RESOLUTION_MICROS // plumb.time_res):
+        reference = integrators.euler_step(graph, reference, free, plumb.time_res)
+
+    plumb.multirate = False
+    state = plumb.step(utils.DEFAULT_TIME_RESOLUTION_MICROS)
+
+    for node, idx in graph.node_index.items():
+        assert state[node] == pytest.approx(reference[idx], rel=1e-12)
+
+
+def test_euler_parks_settled_islands():
+    plumb = test.two_valve_setup(1, 1, utils.CLOSED, utils.CLOSED, 1, 1, 1, 1)
+    graph = plumb._compiled_graph()
+
+    plumb.step(utils.s_to_micros(30))
+    assert all(graph.is_parked(island) for island in graph.islands() if len(island) > 1)
+
+    # Parked islands stay put until something changes them.
+    state = plumb.step(utils.s_to_micros(1))
+    assert state == {1: 0, 2: pytest.approx(50, abs=0.1), 3: pytest.approx(50, abs=0.1)}
+
+    plumb.set_component_state('valve1', 'open')
+    state = plumb.solve()
+    assert state == {1: pytest.approx(100 / 3, abs=test.SOLVE_TOL),
+                     2: pytest.approx(100 / 3, abs=test.SOLVE_TOL),
+                     3: pytest.approx(100 / 3, abs=test.SOLVE_TOL)}
+
+
+def test_euler_slow_leak_converges():
+    # The leak is slow and the pressures close, so pressures barely change between steps
+    leak = test.create_component(100, 100, 100, 100, 'leak', 'A')
+    plumb = top.PlumbingEngine({'leak': leak}, {'leak': {1: 1, 2: 2}}, {1: (1, False)},
+                               {'leak': 'open'})
+
+    for _ in range(60):
+        state = plumb.step(utils.s_to_micros(10))
+
+    assert state == {1: pytest.approx(0.5, abs=1e-5), 2: pytest.approx(0.5, abs=1e-5)}
+
+
+def fast_slow_engine():
+    # A fast valve sets time_res, but is in the same island as a much slower one.
+    fast = test.create_component(0.01, 0.01, 0.01, 0.01, 'fast', 'A')
+    slow = test.create_component(1, 1, 1, 1, 'slow', 'B')
+    mapping = {'fast': {1: 1, 2: 2}, 'slow': {1: 2, 2: 3}}
+    pressures = {1: (100, False), 3: (50, False)}
+    return top.PlumbingEngine({'fast': fast, 'slow': slow}, mapping, pressures,
+                              {'fast': 'open', 'slow': 'open'})
+
+
+def test_multirate_euler_step_without_fast_edges():
+    plumb = three_way_engine()
+    graph = plumb._compiled_graph()
+    pressures = graph.gather_pressures()
+    free = graph.free_mask(plumb.fixed_pressures)
+    no_fast = np.zeros(len(graph.edges), dtype=bool)
+
+    stepped = integrators.multirate_euler_step(graph, pressures, free, 1000, no_fast, 100)
+
+    assert stepped == pytest.approx(integrators.euler_step(graph, pressures, free, 1000))
+
+
+def test_multirate_euler_step_conserves_pressure():
+    plumb = fast_slow_engine()
+    graph = plumb._compiled_graph()
+    pressures = graph.gather_pressures()
+    free = graph.free_mask(plumb.fixed_pressures)
+    fast = np.array(['fast' in edge[2] for edge in graph.edges])
+
+    stepped = integrators.multirate_euler_step(graph, pressures, free, 10000, fast, 500)
+
+    # A single step of 10 ms along the fast edge would overshoot wildly.
+    assert np.sum(stepped) == pytest.approx(np.sum(pressures))
+    assert stepped[graph.node_index[1]] == pytest.approx(stepped[graph.node_index[2]], abs=1)
+
+
+def fast_into_slow_engine():
+    # A fast valve feeds a fixed pressure into a node that drains through a much slower one.
+    fast = test.create_component(0.01, 0.01, 0.01, 0.01, 'fast', 'A')
+    slow = test.create_component(0.2, 0.2, 0.2, 0.2, 'slow', 'B')
+    mapping = {'fast': {1: 1, 2: 2}, 'slow': {1: 2, 2: 3}}
+    pressures = {1: (1000, True)}
+    return top.PlumbingEngine({'fast': fast, 'slow': slow}, mapping, pressures,
+                              {'fast': 'open', 'slow': 'open'})
+
+
+def test_multirate_euler_step_slow_edges_see_fast_transient():
+    plumb = fast_into_slow_engine()
+    graph = plumb._compiled_graph()
+    free = graph.free_mask(plumb.fixed_pressures)
+    fast = np.array(['fast' in edge[2] for edge in graph.edges])
+    fine_res = plumb.time_res
+    step_res = utils.DEFAULT_TIME_RESOLUTION_MICROS
+
+    reference = graph.gather_pressures()
+    for _ in range(step_res // fine_res):
+        reference = integrators.euler_step(graph, reference, free, fine_res)
+
+    stepped = integrators.multirate_euler_step(graph, graph.gather_pressures(), free, step_res,
+                                               fast, fine_res)
+
+    # The slow edge fills node 3 from node 2 as node 2 fills, not from its initial pressure
+    assert reference[graph.node_index[3]] > 100
+    assert stepped == pytest.approx(reference, rel=1e-9)
@@ -2,6 +2,7 @@ import pytest
 
 import topside as top
 import topside.plumbing.plumbing_utils as utils
+import topside.plumbing.tests.testing_utils as test
 
 
 def test_instantiate_node():
@@ -77,3 +78,64 @@ def test_atm_equality():
 
     almost_atm_node = top.GenericNode(0, True)
     assert atm_node != almost_atm_node
+
+
+def test_nodes_share_store():
+    store = top.PressureStore(capacity=1)
+    nodes = [top.instantiate_node(name, store) for name in ['a', utils.ATM, 'b']]
+    assert len(store) == 3
+
+    nodes[0].update_pressure(10)
+    nodes[2].update_fixed(True)
+    assert list(store.pressure[:3]) == [10, 0, 0]
+    assert list(store.fixed[:3]) == [False, True, True]
+
+    store.write([0, 2], [5, 7])
+    assert nodes[0].get_pressure() == 5
+    assert nodes[2].get_pressure() == 7
+
+
+def test_engine_pressures_in_store():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    store = plumb.get_node_body(1).store
+    assert all(plumb.get_node_body(node).store is store for node in plumb.nodes(data=False))
+
+    pressures = plumb.current_pressures()
+    pressures[1] = 50
+    assert plumb.current_pressures() == {1: 0, 2: 0, 3: 100}
+
+    plumb.step()
+    assert plumb.current_pressures() == {node: store.pressure[plumb.get_node_body(node).slot]
+                                         for node in plumb.nodes(data=False)}
+
+
+def test_store_reuses_released_slots():
+    store = top.PressureStore(capacity=1)
+    a = top.instantiate_node('a', store)
+    b = top.instantiate_node('b', store)
+    b.update_pressure(10)
+    b.update_fixed(True)
+
+    store.release(b.slot)
+    c = top.instantiate_node('c', store)
+    assert c.slot == b.slot
+    assert len(store) == 2
+    assert c.get_pressure() == 0
+    assert not store.fixed[c.slot]
+    assert a.get_pressure() == 0
+
+
+def test_engine_pressure_view():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    slots = plumb.node_slots(3, 1)
+    view = plumb.pressure_view()
+    assert list(view[slots]) == [100, 0]
+
+    plumb.step()
+    pressures = plumb.current_pressures()
+    assert list(view[slots]) == [pressures[3], pressures[1]]
+
+    with pytest.raises(ValueError):
+        view[0] = 1
+    with pytest.raises(top.BadInputError):
+        plumb.node_slots(4)
@@ -0,0 +1,169 @@
+import copy
+
+import pytest
+
+import topside.plumbing.exceptions as exceptions
+import topside.plumbing.integrators as integrators
+import topside.plumbing.plumbing_utils as utils
+import topside.plumbing.tests.testing_utils as test
+
+
+def test_watch_pressure_crossings():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    crossings = []
+    plumb.watch_pressure(2, 10, lambda *args: crossings.append(args))
+    plumb.watch_pressure(3, 60, lambda *args: crossings.append(args))
+
+    while not crossings:
+        plumb.step()
+    assert len(crossings) == 1
+    node, time, pressure, above = crossings[0]
+    assert (node, above) == (2, True)
+    assert plumb.time - plumb.time_res < time <= plumb.time
+    assert pressure == plumb.current_pressures(2) >= 10
+
+    plumb.solve()
+    assert [crossing[0] for crossing in crossings] == [2, 3]
+    assert crossings[1][3] is False
+
+    plumb.set_pressure(2, 0)
+    assert crossings[-1] == (2, plumb.time, 0, False)
+    assert len(crossings) == 3
+
+
+def test_crossing_time_localized():
+    coarse = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    fine = copy.deepcopy(coarse)
+    crossings = []
+    coarse.watch_pressure(2, 10, lambda *args: crossings.append(args))
+
+    coarse.step(int(1e6))
+    assert len(crossings) == 1
+    time = crossings[0][1]
+    assert 0 < time < 1e6
+
+    # The crossing is found as precisely as if the engine had been stepped by time_res
+    while fine.current_pressures(2) < 10:
+        fine.step()
+    assert fine.time - fine.time_res < time <= fine.time
+
+
+def test_terminal_watch():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    reference = copy.deepcopy(plumb)
+    crossings = []
+    plumb.watch_pressure(2, 10, lambda *args: crossings.append(args), terminal=True)
+
+    plumb.step(int(1e6))
+    assert len(crossings) == 1
+    time = crossings[0][1]
+    assert time <= plumb.time < time + 1
+    assert plumb.current_pressures(2) >= 10
+
+    # Stopping early doesn't change the pressures the engine reaches
+    reference.step(plumb.time)
+    assert plumb.current_pressures() == pytest.approx(reference.current_pressures())
+
+    # Once crossed, the watch no longer stops steps
+    stopped = plumb.time
+    plumb.step(int(1e6))
+    assert plumb.time == stopped + int(1e6)
+    assert len(crossings) == 1
+
+
+def count_euler_steps(monkeypatch):
+    """Count the calls to the forward Euler kernel made from now on."""
+    calls = []
+    euler_step = integrators.euler_step
+
+    def counted(*args):
+        calls.append(None)
+        return euler_step(*args)
+
+    monkeypatch.setattr(integrators, 'euler_step', counted)
+    return calls
+
+
+def test_localizing_costs_no_more_than_polling(monkeypatch):
+    watched = test.two_valve_setup_fixed(0.1, 0.1, 0.1, 0.1, 2, 2, 2, 2)
+    polled = copy.deepcopy(watched)
+    crossings = []
+    watched.watch_pressure(2, 99, lambda *args: crossings.append(args), terminal=True)
+
+    calls = count_euler_steps(monkeypatch)
+    while polled.current_pressures(2) < 99:
+        polled.step()
+    polling_calls = len(calls)
+
+    calls.clear()
+    watched.step(int(60e6))
+    assert len(crossings) == 1
+    assert polled.time - polled.time_res < crossings[0][1] <= polled.time
+
+    # A crossing early in a long step only costs the substeps up to it, plus at most a chunk
+    # more and a few to localize it
+    chunk_calls = utils.WATCH_CHUNK_SUBSTEPS * watched.multirate_res() // watched.time_res
+    assert len(calls) <= polling_calls + 2 * chunk_calls
+
+
+def test_unwatch():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    crossings = []
+    watch = plumb.watch_pressure(1, 10, lambda *args: crossings.append(args))
+    plumb.unwatch(watch)
+    plumb.solve()
+    assert crossings == []
+
+    with pytest.raises(exceptions.BadInputError) as err:
+        plumb.unwatch(watch)
+    assert str(err.value) == "Watch not registered with this engine."
+
+
+def test_watch_states():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    changes = []
+    valve1_changes = []
+    plumb.watch_states(lambda *args: changes.append(args))
+    plumb.watch_states(lambda *args: valve1_changes.append(args), 'valve1')
+
+    plumb.set_component_state('valve1', 'closed')
+    assert changes == []
+
+    plumb.set_component_state('valve2', 'closed')
+    plumb.step()
+    plumb.set_component_state('valve1', 'open')
+    assert changes == [('valve2', 'closed', 0), ('valve1', 'open', plumb.time)]
+    assert valve1_changes == [('valve1', 'open', plumb.time)]
+
+
+def test_watches_follow_restore():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    snapshot = plumb.snapshot()
+    plumb.solve()
+
+    changes = []
+    plumb.watch_states(lambda *args: changes.append(args))
+    plumb.watch_pressure(3, 90, lambda *args: changes.append(args))
+    plumb.set_component_state('valve1', 'open')
+    changes.clear()
+
+    plumb.restore(snapshot)
+    assert sorted(changes, key=str) == [('valve1', 'closed', 0), (3, 0, 100, True)]
+
+
+def test_watch_errors_and_copies():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+
+    with pytest.raises(exceptions.BadInputError) as err:
+        plumb.watch_pressure(4, 10, print)
+    assert str(err.value) == "Node 4 not found in graph."
+
+    with pytest.raises(exceptions.BadInputError) as err:
+        plumb.watch_states(print, ['valve1', 'potato'])
+    assert str(err.value) == "Component 'potato' not found in component dict."
+
+    changes = []
+    plumb.watch_states(lambda *args: changes.append(args))
+    other = copy.deepcopy(plumb)
+    other.set_component_state('valve1', 'open')
+    assert changes == []
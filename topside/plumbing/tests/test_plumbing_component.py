@@ -1,3 +1,5 @@
+import copy
+
 import topside as top
 import topside.plumbing.invalid_reasons as invalid
 import topside.plumbing.plumbing_utils as utils
@@ -159,3 +161,23 @@ def test_component_dicts_remain_unchanged():
             (2, 1, 'B2'): utils.teq_to_FC(teq)
         }
     }
+
+
+def test_component_deepcopy():
+    pc1_states, pc1_edges = two_edge_states_edges(1, 1, utils.CLOSED, 'potato')
+    pc1 = top.PlumbingComponent('valve1', pc1_states, pc1_edges)
+    pc1.current_state = 'open'
+
+    pc2 = copy.deepcopy(pc1)
+    assert pc2.name == pc1.name
+    assert pc2.current_state == 'open'
+    assert pc2.states == pc1.states
+    assert pc2.errors() == pc1.errors()
+    assert list(pc2.component_graph.edges(keys=True)) == list(pc1.component_graph.edges(keys=True))
+
+    pc2.states['open'][(1, 2, 'A1')] = 0
+    pc2.component_graph.add_edge(2, 3, 'A3')
+    pc2.error_set.clear()
+    assert pc1.states['open'][(1, 2, 'A1')] != 0
+    assert not pc1.component_graph.has_edge(2, 3)
+    assert not pc1.is_valid()
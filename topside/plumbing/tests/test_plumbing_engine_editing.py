@@ -375,6 +375,29 @@ def test_add_remove():
     assert plumb.current_state('valve2') == 'open'
 
 
+def test_remove_prefixed_component():
+    plumb = test.two_valve_setup(
+        0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    pc = test.create_component(0, 0, 0, 1, 'valve', 'C')
+    plumb.add_component(pc, {1: 3, 2: 4}, 'open')
+
+    assert list(plumb.current_FC('valve')) == [(3, 4, 'valve.C1'), (4, 3, 'valve.C2')]
+
+    plumb.remove_component('valve')
+
+    assert plumb.is_valid()
+    assert plumb.edges() == [
+        (1, 2, 'valve1.A1', {'FC': utils.teq_to_FC(utils.s_to_micros(10))}),
+        (2, 1, 'valve1.A2', {'FC': 0}),
+        (2, 3, 'valve2.B1', {'FC': utils.teq_to_FC(utils.s_to_micros(0.5))}),
+        (3, 2, 'valve2.B2', {'FC': utils.teq_to_FC(utils.s_to_micros(0.2))}),
+    ]
+    assert plumb.current_FC('valve1') == {
+        (1, 2, 'valve1.A1'): utils.teq_to_FC(utils.s_to_micros(10)),
+        (2, 1, 'valve1.A2'): 0,
+    }
+
+
 def test_remove_nonexistent_component():
     plumb = test.two_valve_setup(
         0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
@@ -768,3 +791,86 @@ def test_fix_node():
     plumb.set_pressure(3, 100, True)
 
     assert plumb.fixed_pressures == {3: 100}
+
+
+def test_snapshot_restore():
+    plumb = test.two_valve_setup(
+        0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    plumb.step(1e5)
+    before = plumb.snapshot()
+    pressures = plumb.current_pressures()
+    fcs = plumb.current_FC()
+
+    plumb.set_component_state('valve1', 'open')
+    plumb.set_pressure(3, 50, fixed=True)
+    plumb.step(1e5)
+    after = plumb.snapshot()
+    after_pressures = plumb.current_pressures()
+
+    plumb.restore(before)
+    assert plumb.time == before.time
+    assert plumb.current_state('valve1') == 'closed'
+    assert plumb.current_pressures() == pressures
+    assert plumb.current_FC() == fcs
+    assert plumb.fixed_pressures == {}
+    assert not plumb.get_node_body(3).get_fixed()
+
+    plumb.restore(after)
+    assert plumb.current_state('valve1') == 'open'
+    assert plumb.current_pressures() == after_pressures
+    assert plumb.fixed_pressures == {3: 50}
+
+
+def test_snapshot_survives_edit():
+    plumb = test.two_valve_setup(
+        0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    snapshot = plumb.snapshot()
+    graph = plumb.plumbing_graph
+    open_fc = plumb.component_dict['valve1'].states['open'][(1, 2, 'A1')]
+
+    pc = test.create_component(0, 0, 0, 1, 'valve3', 'C')
+    plumb.add_component(pc, {1: 3, 2: 4}, 'open', {4: (50, False)})
+    plumb.set_teq('valve1', {'open': {(1, 2, 'A1'): 2}})
+    assert plumb.plumbing_graph is not graph
+    assert 4 not in graph
+
+    plumb.restore(snapshot)
+    assert plumb.plumbing_graph is graph
+    assert 'valve3' not in plumb.current_state()
+    assert plumb.current_pressures() == {1: 0, 2: 0, 3: 100}
+    assert plumb.component_dict['valve1'].states['open'][(1, 2, 'A1')] == open_fc
+    plumb.step()
+
+
+def test_edit_after_undoing_topology_edit():
+    plumb = test.two_valve_setup(
+        0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    snapshot = plumb.snapshot()
+
+    plumb.remove_component('valve1')
+    plumb.step()
+    plumb.restore(snapshot)
+
+    plumb.set_pressure(1, 50)
+    plumb.set_component_state('valve1', 'open')
+    assert plumb.current_pressures() == {1: 50, 2: 0, 3: 100}
+    assert plumb.current_state('valve1') == 'open'
+    plumb.step(1e5)
+    assert plumb.current_pressures(2) > 0
+
+
+def test_remove_component_frees_slots():
+    plumb = test.two_valve_setup(
+        0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    store = plumb.get_node_body(1).store
+    size = len(store)
+
+    for _ in range(5):
+        pc = test.create_component(0, 0, 0, 1, 'valve3', 'C')
+        plumb.add_component(pc, {1: 3, 2: 4}, 'closed', {4: (50, False)})
+        assert plumb.current_pressures(4) == 50
+        plumb.remove_component('valve3')
+
+    assert len(plumb.get_node_body(1).store) == size + 1
+    assert plumb.current_pressures() == {1: 0, 2: 0, 3: 100}
+    assert list(plumb.pressure_view()[plumb.node_slots(1, 2, 3)]) == [0, 0, 100]
@@ -87,48 +87,3 @@ def test_flatten_mixed():
     test = [(1, 2), [1, 2], 'potato', ('potato')]
     assert utils.flatten(test) == [1, 2, 1, 2, 'potato', 'potato']
     assert utils.flatten(test, unpack_tuples=False) == [(1, 2), 1, 2, 'potato', ('potato')]
-
-
-def test_converged():
-    p1 = 100
-    p2 = 101
-    dt = 1e6
-    eps = 2
-    assert utils.converged(p1, p2, dt, eps)
-    assert utils.converged(p2, p1, dt, eps)
-
-    p1 = 150
-    assert not utils.converged(p1, p2, dt, eps)
-    assert not utils.converged(p2, p1, dt, eps)
-
-
-def test_all_converged():
-    converged = [
-        {
-            1: 100,
-            2: 0
-        }, {
-            1: 101,
-            2: -1
-        }
-    ]
-    assert utils.all_converged(converged, 1e6, 2)
-
-    not_converged = [
-        {
-            1: 100,
-            2: 0
-        }, {
-            1: 50,
-            2: 50
-        }
-    ]
-    assert not utils.all_converged(not_converged, 1e6, 2)
-
-    too_short = [
-        {
-            1: 100,
-            2: 0
-        }
-    ]
-    assert not utils.all_converged(too_short, 1e6, 2)
@@ -58,6 +58,27 @@ def test_step_errors():
     # This shouldn't raise an error, even though 10.0 is a float
     plumb.step(1000.0)
 
+    wrong_integrator = 'potato'
+    with pytest.raises(exceptions.BadInputError) as err:
+        plumb.step(integrator=wrong_integrator)
+    assert str(err.value) == f"Integrator '{wrong_integrator}' not recognized, must be one of " \
+        f"{utils.INTEGRATORS}."
+
+
+def test_unstable_step():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    plumb.time_res = utils.s_to_micros(1)
+    initial = plumb.current_pressures()
+
+    with pytest.raises(exceptions.BadInputError) as err:
+        plumb.step(utils.s_to_micros(1))
+    assert str(err.value) == "Invalid pressure -350.0 reached at node 3; time resolution " \
+        "(1000000 us) is too long for the step to be stable."
+
+    # Nothing is written back from a step that fails
+    assert plumb.time == 0
+    assert plumb.current_pressures() == initial
+
 
 def test_closed_engine():
     plumb = test.two_valve_setup(utils.CLOSED, utils.CLOSED, utils.CLOSED,
@@ -211,7 +232,8 @@ def test_3():
     pressures = {1: (100, False)}
     default_states = {'vent': 'closed'}
     plumb = top.PlumbingEngine({'vent': pc}, mapping, pressures, default_states)
-    test.assert_no_change(plumb)
+    # Nothing changes over the first step, so solve() stops after it
+    test.assert_no_change(plumb, min_iter=1)
 
 
 # A pressure vessel is connected to the closed direction of a check valve
@@ -226,7 +248,8 @@ def test_4():
     pressures = {1: (100, False)}
     default_states = {'check': 'closed'}
     plumb = top.PlumbingEngine({'check': pc}, mapping, pressures, default_states)
-    test.assert_no_change(plumb)
+    # Nothing changes over the first step, so solve() stops after it
+    test.assert_no_change(plumb, min_iter=1)
 
 
 # A pressure vessel is connected to the open direction of a check valve
@@ -294,3 +317,44 @@ def test_6():
     solve_len = len(len_plumb.solve(return_resolution=len_plumb.time_res))
     test.validate_plumbing_engine(step_plumb, solve_plumb, steady_by, converged,
                                   solve_state, step_state, solve_len, len_plumb.time_res)
+
+
+def test_iter_steps():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    reference = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+
+    records = list(plumb.iter_steps(until=1e5, nodes=[3, 1], decimation=3))
+    step_pressures = [reference.step() for _ in range(10)]
+
+    assert [time for time, _ in records] == [3e4, 6e4, 9e4, 1e5]
+    for (time, pressures), step in zip(records, step_pressures[2::3] + [step_pressures[-1]]):
+        assert list(pressures) == [step[3], step[1]]
+    assert plumb.current_pressures() == reference.current_pressures()
+
+    with pytest.raises(ValueError):
+        records[0][1][0] = 0
+
+
+def test_iter_steps_unbounded():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+    steps = plumb.iter_steps(dt=2e4)
+
+    for i in range(1, 4):
+        time, pressures = next(steps)
+        assert time == plumb.time == i * 2e4
+        assert list(pressures) == [plumb.current_pressures(node) for node in [1, 2, 3]]
+
+
+def test_iter_steps_errors():
+    plumb = test.two_valve_setup(1, 1, 1, 1, 1, 1, 1, 1)
+
+    with pytest.raises(exceptions.BadInputError) as err:
+        plumb.iter_steps(nodes=[4])
+    assert str(err.value) == "Node 4 not found in graph."
+
+    with pytest.raises(exceptions.BadInputError) as err:
+        plumb.iter_steps(decimation=0)
+    assert str(err.value) == "decimation (0) must be a positive integer."
+
+    with pytest.raises(exceptions.InvalidEngineError):
+        top.PlumbingEngine().iter_steps()
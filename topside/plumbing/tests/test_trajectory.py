@@ -0,0 +1,38 @@
+import numpy as np
+
+import topside as top
+import topside.plumbing.tests.testing_utils as test
+import topside.plumbing.plumbing_utils as utils
+
+
+def test_trajectory_views():
+    traj = top.Trajectory(['a', 'b'], [10, 20, 30], [[1, 2], [3, 4], [5, 6]])
+
+    assert len(traj) == 3
+    assert traj.pressures.dtype == np.float64
+    assert list(traj.node_pressures('b')) == [2, 4, 6]
+    assert np.shares_memory(traj.node_pressures('b'), traj.pressures)
+
+    assert traj[1] == {'a': 3, 'b': 4}
+    assert traj[-1] == {'a': 5, 'b': 6}
+    assert list(traj) == traj.to_dicts() == [{'a': 1, 'b': 2}, {'a': 3, 'b': 4}, {'a': 5, 'b': 6}]
+
+    tail = traj[1:]
+    assert list(tail.times) == [20, 30]
+    assert tail.to_dicts() == traj.to_dicts()[1:]
+
+
+def test_solve_returns_trajectory():
+    plumb = test.two_valve_setup(0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    plumb.set_component_state('valve1', 'open')
+    step_plumb = test.two_valve_setup(0.5, 0.2, 10, utils.CLOSED, 0.5, 0.2, 10, utils.CLOSED)
+    step_plumb.set_component_state('valve1', 'open')
+    resolution = utils.s_to_micros(0.1)
+
+    traj = plumb.solve(return_resolution=resolution)
+
+    assert traj.nodes == list(plumb.plumbing_graph.nodes())
+    assert list(traj.times) == [resolution * (idx + 1) for idx in range(len(traj))]
+    assert traj[-1] == plumb.current_pressures()
+    for state in traj:
+        assert state == step_plumb.step(resolution)
@@ -78,13 +78,12 @@ def validate_plumbing_engine(step_plumb, solve_plumb, steady_by, converged, solv
     assert solve_len < 2 * steady_by / time_res
 
 
-def assert_no_change(plumb):
+def assert_no_change(plumb, min_iter=2):
     curr_nodes = plumb.nodes()
     plumb.step()
     assert curr_nodes == plumb.nodes()
     plumb.solve()
     assert curr_nodes == plumb.nodes()
 
-    min_iter = 2
     solve_state = plumb.solve(return_resolution=plumb.time_res)
     assert len(solve_state) == min_iter
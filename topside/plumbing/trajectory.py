@@ -0,0 +1,59 @@
+import numpy as np
+
+
+class Trajectory:
+    """
+    Node pressures at a series of times, as returned by PlumbingEngine.solve().
+
+    Pressures are stored as a single (T, N) array, with one row for each of T times and one
+    column for each of N nodes. For compatibility with code that expects a list of
+    {node: pressure} dicts, a Trajectory can also be indexed, iterated over and measured like
+    one; those dicts are only built as they are asked for.
+    """
+
+    def __init__(self, nodes, times, pressures):
+        """
+        Initialize a trajectory.
+
+        Parameters
+        ----------
+
+        nodes: iterable
+            nodes holds the name of the node stored in each column of pressures.
+
+        times: array_like
+            times holds the engine time, in microseconds, at which each row of pressures was
+            taken.
+
+        pressures: array_like
+            pressures is the (T, N) array of node pressures.
+        """
+        self.nodes = list(nodes)
+        self.node_index = {node: idx for idx, node in enumerate(self.nodes)}
+        self.times = np.asarray(times)
+        self.pressures = np.ascontiguousarray(pressures, dtype=float).reshape(
+            len(self.times), len(self.nodes))
+
+    def node_pressures(self, node):
+        """Return a view of the pressures at one node over time, without copying them."""
+        return self.pressures[:, self.node_index[node]]
+
+    def state(self, idx):
+        """Return the pressures at the idx-th time as a dict of {node: pressure}."""
+        return dict(zip(self.nodes, self.pressures[idx].tolist()))
+
+    def to_dicts(self):
+        """Return a list of {node: pressure} dicts, one for each time."""
+        return [self.state(idx) for idx in range(len(self))]
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return Trajectory(self.nodes, self.times[idx], self.pressures[idx])
+        return self.state(idx)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self.state(idx)
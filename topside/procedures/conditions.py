@@ -38,6 +38,37 @@ class Condition(ABC):
         """
         pass
 
+    def thresholds(self):
+        """
+        Return a list of (node, pressure) pairs, such that the condition
+        can only change between satisfied and unsatisfied when the
+        pressure at one of the nodes crosses the paired pressure.
+
+        Conditions that don't depend on pressures return an empty list.
+        """
+        return []
+
+    def wait_times(self):
+        """
+        Return a list of engine times, in microseconds, at which the
+        condition can change between satisfied and unsatisfied without
+        any pressure crossing one of its thresholds.
+
+        Conditions that don't depend on time return an empty list.
+        """
+        return []
+
+    def watchable(self):
+        """
+        Return True if the condition can only change between satisfied
+        and unsatisfied at its thresholds and wait times, so that it
+        doesn't need updating until one of them is reached.
+
+        Conditions are assumed to depend on the state in other ways
+        unless they say otherwise.
+        """
+        return False
+
 
 class Immediate:
     """Condition that is always satisfied."""
@@ -57,6 +88,18 @@ class Immediate:
         """Return True, since this condition is always satisfied."""
         return True
 
+    def thresholds(self):
+        """Return no thresholds, since this condition never changes."""
+        return []
+
+    def wait_times(self):
+        """Return no wait times, since this condition never changes."""
+        return []
+
+    def watchable(self):
+        """Return True, since this condition never changes."""
+        return True
+
     def __eq__(self, other):
         return type(other) == Immediate
 
@@ -121,6 +164,18 @@ class And:
                 return False
         return True
 
+    def thresholds(self):
+        """Return the thresholds of all child conditions."""
+        return [threshold for cond in self._conditions for threshold in cond.thresholds()]
+
+    def wait_times(self):
+        """Return the wait times of all child conditions."""
+        return [time for cond in self._conditions for time in cond.wait_times()]
+
+    def watchable(self):
+        """Return True if all child conditions are watchable."""
+        return all(cond.watchable() for cond in self._conditions)
+
     def __eq__(self, other):
         return type(self) == type(other) and self._conditions == other._conditions
 
@@ -191,6 +246,18 @@ class Or:
                 return True
         return False
 
+    def thresholds(self):
+        """Return the thresholds of all child conditions."""
+        return [threshold for cond in self._conditions for threshold in cond.thresholds()]
+
+    def wait_times(self):
+        """Return the wait times of all child conditions."""
+        return [time for cond in self._conditions for time in cond.wait_times()]
+
+    def watchable(self):
+        """Return True if all child conditions are watchable."""
+        return all(cond.watchable() for cond in self._conditions)
+
     def __eq__(self, other):
         return type(self) == type(other) and self._conditions == other._conditions
 
@@ -261,6 +328,20 @@ class WaitFor:
             return False
         return self.current_t >= self.target_t
 
+    def thresholds(self):
+        """Return no thresholds, since this condition only depends on time."""
+        return []
+
+    def wait_times(self):
+        """Return the target time, once the condition has been initialized."""
+        if self.target_t is None:
+            return []
+        return [self.target_t]
+
+    def watchable(self):
+        """Return True, since this condition only changes at its wait time."""
+        return True
+
     def __eq__(self, other):
         return type(self) == type(other) and self.wait_t == other.wait_t
 
@@ -342,6 +423,18 @@ class Comparison:
             return False
         return self.compare(self.current_pressure, self.reference_pressure)
 
+    def thresholds(self):
+        """Return the reference pressure at the monitored node."""
+        return [(self.node, self.reference_pressure)]
+
+    def wait_times(self):
+        """Return no wait times, since this condition only depends on pressure."""
+        return []
+
+    def watchable(self):
+        """Return True, since this condition only changes at its thresholds."""
+        return True
+
     def __eq__(self, other):
         return type(self) == type(other) and \
             self.node == other.node and \
@@ -385,6 +478,13 @@ class Equal(Comparison):
         """Return True if the pressures differ by less than eps."""
         return abs(current_pressure - reference_pressure) <= self.eps
 
+    def thresholds(self):
+        """Return both edges of the margin around the reference pressure."""
+        if self.eps == 0:
+            return [(self.node, self.reference_pressure)]
+        return [(self.node, self.reference_pressure - self.eps),
+                (self.node, self.reference_pressure + self.eps)]
+
     def __eq__(self, other):
         return type(self) == type(other) and \
             self.node == other.node and \
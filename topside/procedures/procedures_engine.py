@@ -1,12 +1,17 @@
 from enum import Enum
 import copy
-import queue
+import math
 
 import topside as top
 
+from .state_history import StateHistory, DEFAULT_CHECKPOINT_INTERVAL, DEFAULT_MAX_HISTORY_BYTES
 from .state_stack_element import StackElement
 
 
+# Longest single step, in microseconds, taken by run_until_transition() by default
+DEFAULT_MAX_STEP = 1000000
+
+
 class StepPosition(Enum):
     Before = 1
     After = 2
@@ -20,7 +25,9 @@ class ProceduresEngine:
     represent transitions between these steps.
     """
 
-    def __init__(self, plumbing_engine=None, suite=None):
+    def __init__(self, plumbing_engine=None, suite=None,
+                 checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+                 max_history_bytes=DEFAULT_MAX_HISTORY_BYTES):
         """
         Initialize the ProceduresEngine.
 
@@ -33,6 +40,14 @@ class ProceduresEngine:
         suite: topside.ProcedureSuite
             The ProcedureSuite that this engine should execute,
             including information about the starting procedure.
+
+        checkpoint_interval: int
+            The number of undo history entries between full snapshots
+            of the plumbing engine.
+
+        max_history_bytes: int
+            The estimated memory, in bytes, above which the oldest undo
+            history entries are dropped.
         """
         self._plumb = plumbing_engine
         self._suite = None
@@ -40,7 +55,19 @@ class ProceduresEngine:
         self.current_step = None
         self.step_position = None
         # Stack
-        self.state_stack = queue.LifoQueue()
+        self.state_stack = StateHistory(checkpoint_interval, max_history_bytes)
+
+        # Pressure watches on the thresholds of the current step's conditions, along with the
+        # plumbing engine and step that they were registered for
+        self._watches = []
+        self._watched_plumb = None
+        self._watched_step = None
+        # When the current conditions were last updated, the earliest time after that at which
+        # one could change without a pressure crossing a threshold, and whether they could have
+        # changed in some other way since
+        self._conditions_time = None
+        self._next_wait_time = None
+        self._conditions_stale = True
 
         if suite is not None:
             self.load_suite(suite)
@@ -55,7 +82,7 @@ class ProceduresEngine:
             self.current_procedure_id = self._suite.starting_procedure_id
             self.current_step = self._suite[self.current_procedure_id].step_list[0]
             self.step_position = StepPosition.Before
-            self.state_stack = queue.LifoQueue()
+            self.state_stack.clear()
 
     def load_suite(self, suite):
         """
@@ -87,18 +114,67 @@ class ProceduresEngine:
 
             for condition, _ in self.current_step.conditions:
                 condition.reinitialize(state)
+            self._conditions_updated(time, pressures)
 
     def update_conditions(self):
         """
         Update all current conditions by querying the managed plumbing engine.
+
+        Conditions are only re-evaluated if they could have changed since
+        they were last updated: if a pressure crossed one of their
+        thresholds, one of their wait times was reached, or they aren't
+        watchable. Returns True if they were re-evaluated.
         """
-        if self._plumb is not None and self.current_step is not None:
-            time = self._plumb.time
-            pressures = self._plumb.current_pressures()
-            state = {'time': time, 'pressures': pressures}
+        if self._plumb is None or self.current_step is None:
+            return False
 
+        time = self._plumb.time
+        if self._plumb is self._watched_plumb and self.current_step is self._watched_step \
+                and not self._conditions_stale and self._conditions_time <= time \
+                and (self._next_wait_time is None or time < self._next_wait_time):
+            return False
+
+        pressures = self._plumb.current_pressures()
+        state = {'time': time, 'pressures': pressures}
+
+        for condition, _ in self.current_step.conditions:
+            condition.update(state)
+        self._conditions_updated(time, pressures)
+        return True
+
+    def _conditions_updated(self, time, pressures):
+        """
+        Record that the current conditions were just evaluated at time, watching their thresholds
+        if they weren't already.
+        """
+        if self._plumb is not self._watched_plumb or self.current_step is not self._watched_step:
+            self._unwatch_conditions()
+            self._watched_plumb = self._plumb
+            self._watched_step = self.current_step
             for condition, _ in self.current_step.conditions:
-                condition.update(state)
+                for node, pressure in condition.thresholds():
+                    self._watches.append(
+                        self._plumb.watch_pressure(node, pressure, self._threshold_crossed))
+
+        self._conditions_time = time
+        self._next_wait_time = min([wait_time for condition, _ in self.current_step.conditions
+                                    for wait_time in condition.wait_times() if wait_time > time],
+                                   default=None)
+
+        # A pressure sitting exactly on a threshold can leave it again without crossing it
+        self._conditions_stale = False
+        for condition, _ in self.current_step.conditions:
+            if not condition.watchable() or \
+                    any(pressures[node] == pressure for node, pressure in condition.thresholds()):
+                self._conditions_stale = True
+
+    def _threshold_crossed(self, node, time, pressure, above):
+        self._conditions_stale = True
+
+    def _unwatch_conditions(self):
+        for watch in self._watches:
+            self._watched_plumb.unwatch(watch)
+        self._watches = []
 
     def execute_current(self):
         """
@@ -161,7 +237,7 @@ class ProceduresEngine:
         self.proceed()
         self.execute_current()
 
-    def step_time(self, timestep=None):
+    def step_time(self, timestep=None, stop_on_conditions=False):
         """
         Step the managed plumbing engine in time and update conditions.
 
@@ -170,15 +246,83 @@ class ProceduresEngine:
         timestep: int
             The number of microseconds that the managed plumbing engine
             should be stepped in time by.
+
+        stop_on_conditions: bool
+            If True and the engine is in a post-node, the step is cut
+            short as soon as a pressure crosses one of the thresholds of
+            the current step's conditions, so that a large timestep
+            doesn't delay the transition. The managed plumbing engine's
+            time shows how far it was actually stepped.
         """
         if self._plumb is not None:
-            self._plumb.step(timestep)
+            watches = []
+            if stop_on_conditions and self.current_step is not None \
+                    and self.step_position == StepPosition.After:
+                for condition, _ in self.current_step.conditions:
+                    for node, pressure in condition.thresholds():
+                        watches.append(self._plumb.watch_pressure(
+                            node, pressure, lambda *args: None, terminal=True))
+
+            try:
+                self._plumb.step(timestep)
+            finally:
+                for watch in watches:
+                    self._plumb.unwatch(watch)
             self.update_conditions()
 
         # TODO(jacob): Consider if this function should return anything
         # about the state of the system: plumbing engine state, current
         # time, etc.
 
+    def run_until_transition(self, max_time=30, max_step=DEFAULT_MAX_STEP):
+        """
+        Step the managed plumbing engine until a condition of the
+        current step is satisfied, and return whether one is.
+
+        Rather than stepping by time_res, the engine jumps straight to
+        the next time at which a WaitFor condition could be satisfied.
+        Steps are cut short as soon as a pressure crosses one of the
+        thresholds of the current step's conditions, so the transition
+        happens within a microsecond of the crossing.
+
+        Only has an effect if called from a post-node.
+
+        Parameters
+        ----------
+        max_time: float
+            The longest time, in seconds, that the managed plumbing
+            engine should be stepped by before giving up.
+
+        max_step: int
+            The longest single step, in microseconds. Conditions are
+            only updated between steps, so this bounds how late a
+            transition can be on a condition (other than the built-in
+            ones) that doesn't report its thresholds and wait times. If
+            None, steps are only limited by wait times and max_time.
+        """
+        if self._plumb is None or self.current_step is None or \
+                self.step_position == StepPosition.Before:
+            return False
+
+        end_time = self._plumb.time + top.s_to_micros(max_time)
+        while not self.ready_to_proceed() and self._plumb.time < end_time:
+            time = self._plumb.time
+            stop = end_time
+            for condition, _ in self.current_step.conditions:
+                for wait_time in condition.wait_times():
+                    if time < wait_time < stop:
+                        stop = wait_time
+            timestep = stop - time
+            if max_step is not None:
+                timestep = min(timestep, max_step)
+
+            # Overshoot rather than take a step shorter than time_res, which would lower
+            # time_res for every step after it
+            self.step_time(max(int(math.ceil(timestep)), self._plumb.time_res),
+                           stop_on_conditions=True)
+
+        return self.ready_to_proceed()
+
     def current_procedure(self):
         """Return the procedure currently being executed."""
         if self._suite is None:
@@ -187,28 +331,21 @@ class ProceduresEngine:
         return self._suite[self.current_procedure_id]
 
     def push_stack(self):
-        curent_plumb = copy.deepcopy(self._plumb)
+        snapshot = self._plumb.snapshot() if self._plumb is not None else None
         prod_id = self.current_procedure_id
         step = copy.deepcopy(self.current_step)
         step_pos = self.step_position
 
-        self.state_stack.put(StackElement(curent_plumb, prod_id, step, step_pos))
+        self.state_stack.push(StackElement(snapshot, prod_id, step, step_pos))
 
     def pop_and_set_stack(self):
         if(not self.state_stack.empty()):
-            stack_element = self.state_stack.get()
+            stack_element = self.state_stack.pop()
 
             if(stack_element.plumb != None):
                 if(self._plumb == None):
-                    self._plumb = stack_element.plumb
-                else:
-                    self._plumb.component_dict = stack_element.plumb.component_dict
-                    self._plumb.error_set = stack_element.plumb.error_set
-                    self._plumb.fixed_pressures = stack_element.plumb.fixed_pressures
-                    self._plumb.mapping = stack_element.plumb.mapping
-                    self._plumb.plumbing_graph = stack_element.plumb.plumbing_graph
-                    self._plumb.time = stack_element.plumb.time
-                    self._plumb.time_res = stack_element.plumb.time_res
+                    self._plumb = stack_element.plumb.engine
+                self._plumb.restore(stack_element.plumb)
 
                 self.current_procedure_id = stack_element.prod_id
                 self.current_step = stack_element.curr_step
@@ -0,0 +1,241 @@
+import collections
+import copy
+
+import numpy as np
+
+from .state_stack_element import StackElement
+
+
+DEFAULT_CHECKPOINT_INTERVAL = 16
+DEFAULT_MAX_HISTORY_BYTES = 64 * 2**20
+
+# Rough size of one entry in a dict or list, and of the fixed parts of an entry, in bytes.
+# Only used to estimate how much memory the history holds.
+_ITEM_BYTES = 64
+_ENTRY_BYTES = 1024
+
+
+def _array_delta(old, new):
+    """Return (indices, values) of the entries of new that differ from old."""
+    idx = np.flatnonzero(old != new)
+    return idx, new[idx]
+
+
+class SnapshotDelta:
+    """
+    The difference between two EngineSnapshots that share a topology.
+
+    Only the node pressures, fixed flags, edge FCs and component states that changed are stored,
+    along with the scalar fields.
+    """
+
+    def __init__(self, old, new):
+        self.pressures = _array_delta(old.pressures, new.pressures)
+        self.fixed = _array_delta(old.fixed, new.fixed)
+        self.fcs = {idx: fc for idx, (old_fc, fc) in enumerate(zip(old.fcs, new.fcs))
+                    if old_fc != fc}
+        self.states = {name: state for name, state in new.states.items()
+                       if old.states.get(name) != state}
+        self.fixed_pressures = None
+        if new.fixed_pressures != old.fixed_pressures:
+            self.fixed_pressures = new.fixed_pressures
+        self.time = new.time
+        self.time_res = new.time_res
+
+    @staticmethod
+    def applies(old, new):
+        """Return True if new can be stored as a delta against old."""
+        return (old.plumbing_graph is new.plumbing_graph
+                and old.component_dict is new.component_dict
+                and len(old.pressures) == len(new.pressures)
+                and len(old.fcs) == len(new.fcs))
+
+    def apply(self, old):
+        """Return the EngineSnapshot that results from applying this delta to old."""
+        new = copy.copy(old)
+
+        new.pressures = old.pressures.copy()
+        new.pressures[self.pressures[0]] = self.pressures[1]
+        new.fixed = old.fixed.copy()
+        new.fixed[self.fixed[0]] = self.fixed[1]
+
+        new.fcs = list(old.fcs)
+        for idx, fc in self.fcs.items():
+            new.fcs[idx] = fc
+        new.states = dict(old.states)
+        new.states.update(self.states)
+        if self.fixed_pressures is not None:
+            new.fixed_pressures = self.fixed_pressures
+
+        new.time = self.time
+        new.time_res = self.time_res
+        return new
+
+    def nbytes(self):
+        """Return an estimate of the memory held by the delta, in bytes."""
+        return (sum(arr.nbytes for arr in self.pressures + self.fixed)
+                + _ITEM_BYTES * (len(self.fcs) + len(self.states)))
+
+
+def _snapshot_nbytes(snapshot):
+    """Return an estimate of the memory held by an EngineSnapshot, in bytes."""
+    return (snapshot.pressures.nbytes + snapshot.fixed.nbytes
+            + _ITEM_BYTES * (len(snapshot.fcs) + len(snapshot.states)
+                             + len(snapshot.fixed_pressures)))
+
+
+class StateHistory:
+    """
+    A bounded history of ProceduresEngine states, used to undo steps.
+
+    Every checkpoint_interval-th entry holds a full EngineSnapshot of the plumbing engine; the
+    entries in between only hold a SnapshotDelta against the entry before them. Once the history
+    is estimated to hold more than max_bytes, the oldest entries are dropped.
+
+    Entries are numbered from 0 in the order they were pushed, and keep their number even after
+    older entries have been dropped, so the entries held are numbered from first_index() to
+    first_index() + len(history) - 1. The entries since the last checkpoint are also kept in
+    full, so that pushing and popping are O(1) amortized; they count towards max_bytes too.
+    """
+
+    def __init__(self, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+                 max_bytes=DEFAULT_MAX_HISTORY_BYTES):
+        """
+        Initialize an empty history.
+
+        Parameters
+        ----------
+
+        checkpoint_interval: int
+            checkpoint_interval is the number of entries between full snapshots.
+
+        max_bytes: int
+            max_bytes is the estimated memory, in bytes, above which the oldest entries are
+            dropped. The most recent entry is always kept.
+        """
+        self.checkpoint_interval = checkpoint_interval
+        self.max_bytes = max_bytes
+        self.clear()
+
+    def clear(self):
+        """Remove every entry from the history."""
+        self._entries = collections.deque()
+        self._sizes = collections.deque()
+        # Full snapshots of the entries since (and including) the last checkpoint.
+        self._tail = []
+        # Estimated memory held by the snapshots in _tail after the first, which is the
+        # checkpoint itself and so is already counted in _sizes.
+        self._tail_bytes = 0
+        self._first = 0
+        self.nbytes = 0
+
+    def _set_tail(self, tail):
+        """Replace the full snapshots since the last checkpoint, updating nbytes."""
+        self._tail = tail
+        tail_bytes = sum(_snapshot_nbytes(snapshot) for snapshot in tail[1:])
+        self.nbytes += tail_bytes - self._tail_bytes
+        self._tail_bytes = tail_bytes
+
+    def __len__(self):
+        """Return the number of entries held, which excludes any that have been dropped."""
+        return len(self._entries)
+
+    def first_index(self):
+        """Return the number of the oldest entry held."""
+        return self._first
+
+    def empty(self):
+        """Return True if there are no entries left to pop."""
+        return not self._entries
+
+    def push(self, element):
+        """Add a StackElement to the end of the history."""
+        snapshot = element.plumb
+        stored = snapshot
+        size = _ENTRY_BYTES
+        if snapshot is not None:
+            prev = self._tail[-1] if self._tail else None
+            if prev is not None and len(self._tail) < self.checkpoint_interval \
+                    and SnapshotDelta.applies(prev, snapshot):
+                stored = SnapshotDelta(prev, snapshot)
+                size += stored.nbytes()
+                self._tail.append(snapshot)
+                tail_size = _snapshot_nbytes(snapshot)
+                self._tail_bytes += tail_size
+                self.nbytes += tail_size
+            else:
+                self._set_tail([snapshot])
+                size += _snapshot_nbytes(snapshot)
+        else:
+            self._set_tail([])
+
+        self._entries.append(StackElement(stored, element.prod_id, element.curr_step,
+                                          element.step_pos))
+        self._sizes.append(size)
+        self.nbytes += size
+
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            self._evict()
+
+    def pop(self):
+        """Remove and return the most recently pushed StackElement."""
+        if not self._entries:
+            raise IndexError('pop from an empty StateHistory')
+        element = self._entries.pop()
+        self.nbytes -= self._sizes.pop()
+
+        snapshot = self._tail.pop() if self._tail else None
+        if self._tail:
+            tail_size = _snapshot_nbytes(snapshot)
+            self._tail_bytes -= tail_size
+            self.nbytes -= tail_size
+        elif self._entries:
+            self._set_tail(self._materialize(len(self._entries) - 1))
+        return StackElement(snapshot, element.prod_id, element.curr_step, element.step_pos)
+
+    def __getitem__(self, idx):
+        """
+        Return the StackElement for the entry numbered idx, with a full snapshot. Negative
+        indices count back from the most recent entry.
+        """
+        pos = idx - self._first if idx >= 0 else idx + len(self._entries)
+        if not 0 <= pos < len(self._entries):
+            raise IndexError(f'Entry {idx} is not in the history')
+        element = self._entries[pos]
+        snapshot = self._materialize(pos)[-1] if element.plumb is not None else None
+        return StackElement(snapshot, element.prod_id, element.curr_step, element.step_pos)
+
+    def _checkpoint(self, pos):
+        """Return the position of the last checkpoint at or before pos."""
+        while isinstance(self._entries[pos].plumb, SnapshotDelta):
+            pos -= 1
+        return pos
+
+    def _materialize(self, pos):
+        """Return full snapshots of every entry from the last checkpoint at or before pos."""
+        start = self._checkpoint(pos)
+        snapshots = [self._entries[start].plumb]
+        if snapshots[0] is None:
+            return []
+        for offset in range(start + 1, pos + 1):
+            snapshots.append(self._entries[offset].plumb.apply(snapshots[-1]))
+        return snapshots
+
+    def _evict(self):
+        """Drop the oldest entry, turning the entry after it into a checkpoint if needed."""
+        element = self._entries.popleft()
+        self.nbytes -= self._sizes.popleft()
+        self._first += 1
+
+        following = self._entries[0]
+        if not isinstance(following.plumb, SnapshotDelta):
+            return
+        if len(self._tail) > len(self._entries):
+            # The following entry is in the tail, so its full snapshot is already at hand.
+            self._set_tail(self._tail[1:])
+            following.plumb = self._tail[0]
+        else:
+            following.plumb = following.plumb.apply(element.plumb)
+        size = _ENTRY_BYTES + _snapshot_nbytes(following.plumb)
+        self.nbytes += size - self._sizes[0]
+        self._sizes[0] = size
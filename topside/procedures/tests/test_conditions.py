@@ -410,3 +410,29 @@ def test_string_representations():
     assert str(greaterEqual_cond) == 'A5 >= 100'
     assert str(and_cond) == '(A2 < 100 and A3 > 100)'
     assert str(or_cond) == '(A4 <= 100 or A5 >= 100)'
+
+
+def test_thresholds():
+    less_cond = top.Less('A2', 100)
+    equal_cond = top.Equal('A1', 100, 5)
+    nested_cond = top.Or([top.And([less_cond, top.WaitFor(10)]), equal_cond])
+
+    assert top.Immediate().thresholds() == []
+    assert top.WaitFor(10).thresholds() == []
+    assert NeverSatisfied().thresholds() == []
+    assert less_cond.thresholds() == [('A2', 100)]
+    assert top.Equal('A1', 100).thresholds() == [('A1', 100)]
+    assert nested_cond.thresholds() == [('A2', 100), ('A1', 95), ('A1', 105)]
+
+
+def test_wait_times():
+    wait_cond = top.WaitFor(10)
+    nested_cond = top.Or([top.And([top.Less('A2', 100), wait_cond]), top.Immediate()])
+
+    assert wait_cond.wait_times() == []
+    assert nested_cond.wait_times() == []
+    assert NeverSatisfied().wait_times() == []
+
+    nested_cond.reinitialize({'time': 5, 'pressures': {'A2': 0}})
+    assert wait_cond.wait_times() == [15]
+    assert nested_cond.wait_times() == [15]
@@ -1,6 +1,8 @@
 import copy
 
 import topside as top
+import topside.plumbing.integrators as integrators
+import topside.plumbing.plumbing_utils as utils
 from topside.procedures.tests.testing_utils import NeverSatisfied
 
 
@@ -318,6 +320,53 @@ def test_update_conditions_updates_time():
     assert proc_eng.ready_to_proceed() is True
 
 
+def test_update_conditions_waits_for_crossing(monkeypatch):
+    plumb_eng = one_component_engine()
+    plumb_eng.set_component_state('c1', 'open')
+
+    s1 = top.ProcedureStep('s1', None, [(top.Less(1, 75), top.Transition('p1', 's2'))], 'PRIMARY')
+    s2 = top.ProcedureStep('s2', None, [], 'PRIMARY')
+    proc = top.Procedure('p1', [s1, s2])
+    proc_suite = top.ProcedureSuite([proc], 'p1')
+
+    proc_eng = top.ProceduresEngine(plumb_eng, proc_suite)
+    proc_eng.execute_current()
+    assert len(plumb_eng._observers.pressure_watches) == 1
+
+    queries = []
+    current_pressures = plumb_eng.current_pressures
+
+    def counting_current_pressures(*args):
+        queries.append(args)
+        return current_pressures(*args)
+
+    monkeypatch.setattr(plumb_eng, 'current_pressures', counting_current_pressures)
+
+    plumb_eng.step(10)
+    queries.clear()
+    assert proc_eng.update_conditions() is False
+    assert queries == []
+    assert proc_eng.ready_to_proceed() is False
+
+    plumb_eng.solve()
+    queries.clear()
+    assert proc_eng.update_conditions() is True
+    assert len(queries) == 1
+    assert proc_eng.ready_to_proceed() is True
+
+    proc_eng.next_step()
+    assert plumb_eng._observers.pressure_watches == []
+
+
+def test_update_conditions_polls_unwatchable_conditions():
+    plumb_eng = one_component_engine()
+    proc_eng = top.ProceduresEngine(plumb_eng, branching_procedure_suite_no_options())
+    proc_eng.execute_current()
+
+    assert proc_eng.update_conditions() is True
+    assert proc_eng.update_conditions() is True
+
+
 def test_step_advances_time_equally():
     managed_eng = one_component_engine()
     managed_eng.set_component_state('c1', 'open')
@@ -352,6 +401,104 @@ def test_step_updates_conditions():
     assert proc_eng.ready_to_proceed() is True
 
 
+def test_step_stops_on_conditions():
+    plumb_eng = one_component_engine()
+    plumb_eng.set_component_state('c1', 'open')
+
+    s1 = top.ProcedureStep('s1', None, [(top.Less(1, 75), 's2')], 'PRIMARY')
+    proc = top.Procedure('p1', [s1])
+    proc_suite = top.ProcedureSuite([proc], 'p1')
+
+    proc_eng = top.ProceduresEngine(plumb_eng, proc_suite)
+    proc_eng.execute_current()
+
+    proc_eng.step_time(1e6, stop_on_conditions=True)
+
+    assert proc_eng.ready_to_proceed() is True
+    assert 0 < plumb_eng.time < 1e6
+
+    reference_eng = one_component_engine()
+    reference_eng.set_component_state('c1', 'open')
+    while reference_eng.current_pressures(1) >= 75:
+        reference_eng.step()
+    assert reference_eng.time - reference_eng.time_res < plumb_eng.time <= reference_eng.time
+
+
+def test_run_until_transition_jumps_to_wait():
+    plumb_eng = one_component_engine()
+
+    s1 = top.ProcedureStep('s1', None, [(top.WaitFor(60e6), 's2')], 'PRIMARY')
+    proc = top.Procedure('p1', [s1])
+    proc_suite = top.ProcedureSuite([proc], 'p1')
+
+    proc_eng = top.ProceduresEngine(plumb_eng, proc_suite)
+    assert proc_eng.run_until_transition(max_time=120) is False
+    assert plumb_eng.time == 0
+
+    proc_eng.execute_current()
+    steps = []
+    original_step = plumb_eng.step
+    plumb_eng.step = lambda *args, **kwargs: steps.append(args) or original_step(*args, **kwargs)
+
+    assert proc_eng.run_until_transition(max_time=120, max_step=None) is True
+    assert plumb_eng.time == 60e6
+    assert len(steps) == 1
+
+
+def test_run_until_transition_stops_on_pressure():
+    plumb_eng = one_component_engine()
+
+    s1 = top.ProcedureStep('s1', None, [(top.WaitFor(60e6), 's2'), (top.Less(1, 75), 's3')],
+                           'PRIMARY')
+    proc = top.Procedure('p1', [s1])
+    proc_suite = top.ProcedureSuite([proc], 'p1')
+
+    proc_eng = top.ProceduresEngine(plumb_eng, proc_suite)
+    proc_eng.execute_current()
+    assert proc_eng.run_until_transition() is True
+
+    reference_eng = one_component_engine()
+    while reference_eng.current_pressures(1) >= 75:
+        reference_eng.step()
+    assert reference_eng.time - reference_eng.time_res < plumb_eng.time <= reference_eng.time
+
+
+def test_run_until_transition_no_slower_than_polling(monkeypatch):
+    calls = []
+    euler_step = integrators.euler_step
+    monkeypatch.setattr(integrators, 'euler_step',
+                        lambda *args: calls.append(None) or euler_step(*args))
+
+    def make_engine():
+        s1 = top.ProcedureStep('s1', None, [(top.Less(1, 50.5), 's2')], 'PRIMARY')
+        suite = top.ProcedureSuite([top.Procedure('p1', [s1])], 'p1')
+        proc_eng = top.ProceduresEngine(one_component_engine(), suite)
+        proc_eng.execute_current()
+        return proc_eng
+
+    polled = make_engine()
+    while not polled.ready_to_proceed():
+        polled.step_time()
+    polling_calls = len(calls)
+
+    calls.clear()
+    assert make_engine().run_until_transition() is True
+    assert len(calls) <= polling_calls + 2 * utils.WATCH_CHUNK_SUBSTEPS
+
+
+def test_run_until_transition_gives_up():
+    plumb_eng = one_component_engine()
+
+    s1 = top.ProcedureStep('s1', None, [(top.Greater(1, 200), 's2')], 'PRIMARY')
+    proc = top.Procedure('p1', [s1])
+    proc_suite = top.ProcedureSuite([proc], 'p1')
+
+    proc_eng = top.ProceduresEngine(plumb_eng, proc_suite)
+    proc_eng.execute_current()
+    assert proc_eng.run_until_transition(max_time=5, max_step=1e6) is False
+    assert plumb_eng.time == 5e6
+
+
 def test_reset():
     plumb_eng = one_component_engine()
     proc_eng = top.ProceduresEngine(plumb_eng, branching_procedure_suite_one_option())
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+import topside as top
+from topside.procedures.state_history import StateHistory, SnapshotDelta, _snapshot_nbytes, \
+    _ENTRY_BYTES
+from topside.procedures.state_stack_element import StackElement
+from topside.procedures.tests.test_procedures_engine import one_component_engine
+
+
+def push_steps(history, plumb, num_steps):
+    """Push num_steps snapshots of plumb, stepping and toggling it in between."""
+    snapshots = []
+    for i in range(num_steps):
+        plumb.set_component_state('c1', 'open' if i % 3 else 'closed')
+        plumb.step(1e5)
+        snapshot = plumb.snapshot()
+        history.push(StackElement(snapshot, 'p1', i, None))
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def assert_same_snapshot(snapshot, expected):
+    assert np.array_equal(snapshot.pressures, expected.pressures)
+    assert np.array_equal(snapshot.fixed, expected.fixed)
+    assert snapshot.fcs == expected.fcs
+    assert snapshot.states == expected.states
+    assert snapshot.fixed_pressures == expected.fixed_pressures
+    assert snapshot.time == expected.time
+
+
+def held_bytes(history):
+    """Estimate the memory held by every distinct snapshot and delta in the history."""
+    held = {}
+    for element in history._entries:
+        if isinstance(element.plumb, SnapshotDelta):
+            held[id(element.plumb)] = element.plumb.nbytes()
+        elif element.plumb is not None:
+            held[id(element.plumb)] = _snapshot_nbytes(element.plumb)
+    for snapshot in history._tail:
+        held[id(snapshot)] = _snapshot_nbytes(snapshot)
+    return _ENTRY_BYTES * len(history._entries) + sum(held.values())
+
+
+def test_history_checkpoints():
+    history = StateHistory(checkpoint_interval=4)
+    snapshots = push_steps(history, one_component_engine(), 10)
+
+    stored = [element.plumb for element in history._entries]
+    assert [isinstance(plumb, SnapshotDelta) for plumb in stored] == \
+        [False, True, True, True] * 2 + [False, True]
+
+    for i, snapshot in enumerate(snapshots):
+        assert history[i].curr_step == i
+        assert_same_snapshot(history[i].plumb, snapshot)
+
+
+def test_history_pop():
+    history = StateHistory(checkpoint_interval=3)
+    snapshots = push_steps(history, one_component_engine(), 7)
+
+    for i in reversed(range(7)):
+        element = history.pop()
+        assert element.curr_step == i
+        assert_same_snapshot(element.plumb, snapshots[i])
+    assert history.empty()
+
+    with pytest.raises(IndexError):
+        history.pop()
+
+
+def test_history_evicts_oldest():
+    history = StateHistory(checkpoint_interval=4)
+    plumb = one_component_engine()
+    push_steps(history, plumb, 4)
+    history.max_bytes = history.nbytes
+    snapshots = push_steps(history, plumb, 6)
+
+    first = history.first_index()
+    assert first > 0
+    assert first + len(history) == 10
+    assert history.nbytes <= history.max_bytes
+    with pytest.raises(IndexError):
+        history[first - 1]
+    with pytest.raises(IndexError):
+        history[-len(history) - 1]
+    assert_same_snapshot(history[-1].plumb, snapshots[-1])
+    assert_same_snapshot(history[-len(history)].plumb, snapshots[first - 4])
+
+    assert not isinstance(history._entries[0].plumb, SnapshotDelta)
+    for i in range(first, 10):
+        assert_same_snapshot(history[i].plumb, snapshots[i - 4])
+    for i in reversed(range(first, 10)):
+        assert_same_snapshot(history.pop().plumb, snapshots[i - 4])
+    assert history.empty()
+
+
+def test_undo_many_steps():
+    plumb = one_component_engine()
+    proc_eng = top.ProceduresEngine(plumb, None, checkpoint_interval=2)
+    times = []
+    for i in range(9):
+        times.append(plumb.time)
+        proc_eng.push_stack()
+        plumb.set_component_state('c1', 'closed' if i % 2 else 'open')
+        plumb.step(1e5)
+
+    for time in reversed(times):
+        proc_eng.pop_and_set_stack()
+        assert plumb.time == time
+
+
+def test_history_counts_tail_snapshots():
+    history = StateHistory(checkpoint_interval=100)
+    plumb = one_component_engine()
+    push_steps(history, plumb, 1)
+    history.max_bytes = 8 * history.nbytes
+
+    for _ in range(30):
+        push_steps(history, plumb, 1)
+        assert history.nbytes == held_bytes(history)
+        assert history.nbytes <= history.max_bytes
+    assert len(history) < 30
+
+    while not history.empty():
+        history.pop()
+        assert history.nbytes == held_bytes(history)
+    assert history.nbytes == 0
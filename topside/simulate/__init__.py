@@ -0,0 +1 @@
+from topside.simulate.simulation_runner import *
@@ -0,0 +1,237 @@
+import concurrent.futures
+import functools
+import pathlib
+
+import numpy as np
+
+import topside as top
+
+
+DEFAULT_MAX_TIME_S = 300
+
+# Number of samples that the sample buffer starts out with room for. It doubles whenever it
+# fills up, so a run only ever copies its samples O(log T) times.
+_INITIAL_CAPACITY = 1024
+
+
+class SimulationResult:
+    """
+    The node pressures over time and the step transitions from one procedure simulation.
+
+    Members
+    -------
+
+    nodes: list
+        The nodes whose pressures were recorded, in the order that they are stored in.
+
+    times: numpy.ndarray
+        The engine time (in microseconds) at which each sample was taken.
+
+    pressures: numpy.ndarray
+        A (T, N) array of the pressures at each of N nodes at each of T samples. It is stored in
+        column-major order, so the pressures at one node over time are contiguous.
+
+    transitions: list
+        A list of (time, procedure ID, step ID) for each step that was entered, in the order that
+        they were entered, including the step the simulation started in.
+    """
+
+    def __init__(self, nodes, times, pressures, transitions):
+        self.nodes = nodes
+        self.times = times
+        self.pressures = pressures
+        self.transitions = transitions
+
+    def save(self, path):
+        """Write the result to an .npz file at path, which can be read with load_result()."""
+        np.savez(path,
+                 nodes=np.array([str(node) for node in self.nodes]),
+                 times=self.times,
+                 pressures=np.asfortranarray(self.pressures),
+                 transition_times=np.array([time for time, _, _ in self.transitions],
+                                           dtype=np.int64),
+                 transition_procedures=np.array([proc for _, proc, _ in self.transitions],
+                                                dtype=str),
+                 transition_steps=np.array([step for _, _, step in self.transitions], dtype=str))
+
+
+def load_result(path):
+    """Read a SimulationResult written by SimulationResult.save()."""
+    with np.load(path) as data:
+        transitions = list(zip(data['transition_times'].tolist(),
+                               data['transition_procedures'].tolist(),
+                               data['transition_steps'].tolist()))
+        return SimulationResult(data['nodes'].tolist(), data['times'], data['pressures'],
+                                transitions)
+
+
+class _SampleBuffer:
+    """A growable (T, N) array of samples, appended to one row at a time."""
+
+    def __init__(self, num_nodes):
+        self.times = np.empty(_INITIAL_CAPACITY, dtype=np.int64)
+        self.pressures = np.empty((_INITIAL_CAPACITY, num_nodes))
+        self.size = 0
+
+    def append(self, time, pressures):
+        if self.size == len(self.times):
+            self.times = np.concatenate([self.times, np.empty_like(self.times)])
+            self.pressures = np.concatenate([self.pressures, np.empty_like(self.pressures)])
+        self.times[self.size] = time
+        self.pressures[self.size] = pressures
+        self.size += 1
+
+    def arrays(self):
+        return self.times[:self.size].copy(), self.pressures[:self.size].copy()
+
+
+def simulate(plumb, suite, nodes=None, max_time=DEFAULT_MAX_TIME_S, resolution=None,
+             decimation=1):
+    """
+    Execute a procedure suite on a plumbing engine, without any user interaction.
+
+    The suite is executed from its starting step, moving on as soon as any condition of the
+    current step is satisfied, until it reaches a step with no conditions or max_time runs out.
+    The engine is advanced with ProceduresEngine.run_until_transition(), so steps that only wait
+    are jumped over and transitions on pressure conditions happen at the time of the crossing.
+
+    Parameters
+    ----------
+
+    plumb: topside.PlumbingEngine
+        plumb is the engine to simulate. It is stepped in place.
+
+    suite: topside.ProcedureSuite
+        suite is the procedure suite to execute.
+
+    nodes: iterable
+        nodes is the nodes whose pressures are recorded. If None, every node is recorded, in the
+        order given by plumb.nodes(data=False).
+
+    max_time: float
+        max_time is the maximum time in seconds that the simulation will last.
+
+    resolution: int
+        resolution is the longest time, in microseconds, between two samples. Samples are also
+        taken at every transition. If None, it defaults to the engine's time_res.
+
+    decimation: int
+        Only every decimation-th sample is kept. The first and last samples, and those taken at
+        transitions, are always kept.
+
+    Returns a SimulationResult. The samples are held in memory until the simulation ends, which
+    takes 8 * (N + 1) bytes per sample for N nodes and up to three times that at the end of the
+    run, while they are copied out of the buffer. For long runs on large engines, bound the
+    number of samples with resolution and decimation, or record fewer nodes.
+    """
+    if nodes is None:
+        nodes = plumb.nodes(data=False)
+    nodes = list(nodes)
+    for node in nodes:
+        if node not in plumb.plumbing_graph:
+            raise top.BadInputError(f"Node {node} not found in graph.")
+    if int(decimation) != decimation or decimation < 1:
+        raise top.BadInputError(f"decimation ({decimation}) must be a positive integer.")
+    if resolution is None:
+        resolution = plumb.time_res
+
+    proc_eng = top.ProceduresEngine(plumb, suite)
+    samples = _SampleBuffer(len(nodes))
+    transitions = []
+
+    # The node slots belong to the engine's graph, which resetting or restoring the engine can
+    # swap for another.
+    layout = None
+    slots = None
+
+    def sample():
+        nonlocal layout, slots
+        if layout is not plumb.plumbing_graph:
+            layout = plumb.plumbing_graph
+            slots = plumb.node_slots(nodes)
+        samples.append(plumb.time, plumb.pressure_view()[slots])
+
+    def enter_step():
+        proc_eng.execute_current()
+        transitions.append((plumb.time, proc_eng.current_procedure_id,
+                            proc_eng.current_step.step_id))
+
+    def proceed_while_ready():
+        proceeded = False
+        while proc_eng.ready_to_proceed():
+            proc_eng.proceed()
+            enter_step()
+            proceeded = True
+        return proceeded
+
+    end_time = plumb.time + top.s_to_micros(max_time)
+    enter_step()
+    proceed_while_ready()
+    sample()
+
+    count = 0
+    while plumb.time < end_time and proc_eng.current_step.conditions:
+        interval = min(resolution, end_time - plumb.time)
+        proc_eng.run_until_transition(top.micros_to_s(interval))
+        count += 1
+        proceeded = proceed_while_ready()
+        if proceeded or count % decimation == 0:
+            sample()
+
+    if samples.times[samples.size - 1] != plumb.time:
+        sample()
+
+    times, pressures = samples.arrays()
+    return SimulationResult(nodes, times, pressures, transitions)
+
+
+def simulate_files(proc_path, pdl_paths, output_path=None, **kwargs):
+    """
+    Simulate a ProcLang file on the engine described by one or more PDL files.
+
+    The engine is built with topside.Parser from pdl_paths, and the suite is parsed from
+    proc_path. If output_path is given, the result is also written there, as with
+    SimulationResult.save(). Any other keyword arguments are passed through to simulate().
+
+    Returns a SimulationResult.
+    """
+    if isinstance(pdl_paths, (str, pathlib.PurePath)):
+        pdl_paths = [pdl_paths]
+    plumb = top.Parser([str(path) for path in pdl_paths]).make_engine()
+    suite = top.proclang.parse_from_file(str(proc_path))
+
+    result = simulate(plumb, suite, **kwargs)
+    if output_path is not None:
+        result.save(output_path)
+    return result
+
+
+def _simulate_job(job, **kwargs):
+    proc_path, pdl_paths, output_path = job
+    try:
+        result = simulate_files(proc_path, pdl_paths, output_path, **kwargs)
+    except Exception as err:
+        return None, f'{type(err).__name__}: {err}'
+    return result.transitions[-1], None
+
+
+def simulate_batch(jobs, max_workers=None, **kwargs):
+    """
+    Simulate many ProcLang and PDL file pairs, in parallel.
+
+    jobs is an iterable of (proc_path, pdl_paths, output_path) tuples, each describing a call to
+    simulate_files(). Each job is run in its own worker process, of which there are max_workers
+    (or one for each processor, if None). Any other keyword arguments are passed through to
+    simulate_files().
+
+    If max_workers is 1, the jobs are run one after another in this process instead. A failed
+    job doesn't stop the others. Returns a list with one (last_transition, error) tuple
+    for each job, in the order they were given: last_transition is the (time, procedure ID,
+    step ID) of the last step entered, and error is None if the job succeeded or a description
+    of what went wrong otherwise.
+    """
+    run = functools.partial(_simulate_job, **kwargs)
+    if max_workers == 1:
+        return [run(job) for job in jobs]
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        return list(executor.map(run, jobs))
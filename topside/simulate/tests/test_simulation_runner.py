@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+import topside as top
+import topside.simulate as simulate
+from topside.__main__ import main
+
+
+pdl = '''
+name: example
+
+body:
+- component:
+    name: valve
+    edges:
+      edge1:
+        nodes: [0, 1]
+    states:
+      open:
+        edge1: 1
+      closed:
+        edge1: closed
+
+- graph:
+    name: main
+    nodes:
+      A:
+        initial_pressure: 100
+        components:
+          - [valve, 0]
+
+      B:
+        initial_pressure: 0
+        components:
+          - [valve, 1]
+
+    states:
+      valve: closed
+'''
+
+proclang = '''
+main:
+    1. PRIMARY: Set valve to closed
+    2. PRIMARY: [60s] Set valve to open
+    3. PRIMARY: [B > 40] Set valve to closed
+    4. OPS: Done
+'''
+
+
+def make_files(tmp_path):
+    pdl_path = tmp_path / 'example.yaml'
+    pdl_path.write_text(pdl)
+    proc_path = tmp_path / 'example.proc'
+    proc_path.write_text(proclang)
+    return proc_path, pdl_path
+
+
+def test_simulate(tmp_path):
+    proc_path, pdl_path = make_files(tmp_path)
+    result = simulate.simulate_files(proc_path, pdl_path, resolution=1e6)
+
+    assert result.nodes == ['A', 'B']
+    steps = [(proc, step) for _, proc, step in result.transitions]
+    assert steps == [('main', '1'), ('main', '2'), ('main', '3'), ('main', '4')]
+
+    # Step 3 is entered as soon as B passes 40, rather than at the next sample
+    times = [time for time, _, _ in result.transitions]
+    assert times[:2] == [0, 60e6]
+    assert times[1] < times[2] < times[1] + 1e6
+    assert times[3] == times[2]
+
+    assert result.times[0] == 0
+    assert result.times[-1] == times[3]
+    assert np.all(result.pressures[result.times <= 60e6, 1] == 0)
+    assert 40 < result.pressures[-1, 1] < 40.1
+    assert result.pressures.shape == (len(result.times), 2)
+
+
+def test_simulate_nodes_and_decimation(tmp_path):
+    proc_path, pdl_path = make_files(tmp_path)
+    full = simulate.simulate_files(proc_path, pdl_path, resolution=1e5)
+    decimated = simulate.simulate_files(proc_path, pdl_path, nodes=['B'], resolution=1e5,
+                                        decimation=10)
+
+    assert decimated.nodes == ['B']
+    assert decimated.transitions == full.transitions
+    assert len(decimated.times) < len(full.times) / 5
+    assert set(decimated.times.tolist()) <= set(full.times.tolist())
+    assert decimated.pressures[-1, 0] == full.pressures[-1, 1]
+
+    with pytest.raises(top.BadInputError):
+        simulate.simulate_files(proc_path, pdl_path, nodes=['C'])
+    with pytest.raises(top.BadInputError):
+        simulate.simulate_files(proc_path, pdl_path, decimation=0)
+
+
+def test_save_and_load(tmp_path):
+    proc_path, pdl_path = make_files(tmp_path)
+    output_path = tmp_path / 'out.npz'
+    result = simulate.simulate_files(proc_path, pdl_path, output_path, resolution=1e6)
+
+    loaded = simulate.load_result(output_path)
+    assert loaded.nodes == result.nodes
+    assert loaded.transitions == result.transitions
+    assert np.array_equal(loaded.times, result.times)
+    assert np.array_equal(loaded.pressures, result.pressures)
+    assert loaded.pressures.flags.f_contiguous
+
+
+def test_simulate_cli(tmp_path, capsys):
+    proc_path, pdl_path = make_files(tmp_path)
+    output_path = tmp_path / 'out.npz'
+
+    assert main(['simulate', str(proc_path), str(pdl_path), '-o', str(output_path),
+                 '--nodes', 'B', '--resolution', '1000000']) == 0
+    assert 'ended in main.4' in capsys.readouterr().out
+    assert simulate.load_result(output_path).nodes == ['B']
+
+
+def test_simulate_cli_jobs(tmp_path, capsys):
+    proc_path, pdl_path = make_files(tmp_path)
+    jobs_path = tmp_path / 'jobs.txt'
+    jobs_path.write_text('# procedure library\n'
+                         'example.proc example.yaml\n'
+                         '\n'
+                         'example.proc example.yaml\n'
+                         'missing.proc example.yaml\n')
+    output_dir = tmp_path / 'results'
+
+    assert main(['simulate', '--jobs', str(jobs_path), '-o', str(output_dir),
+                 '--resolution', '1000000', '-j', '2']) == 1
+    captured = capsys.readouterr()
+    assert captured.out.count('ended in main.4') == 2
+    assert 'missing.proc: FAILED' in captured.err
+
+    first = simulate.load_result(output_dir / 'example.npz')
+    second = simulate.load_result(output_dir / 'example_2.npz')
+    assert first.transitions == second.transitions
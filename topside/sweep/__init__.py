@@ -0,0 +1 @@
+from topside.sweep.sweep_runner import *
@@ -0,0 +1,247 @@
+import concurrent.futures
+import copy
+import functools
+import itertools
+
+import numpy as np
+
+import topside as top
+import topside.plumbing.plumbing_utils as utils
+
+
+OVERRIDE_KEYS = ['initial_pressures', 'teqs', 'states']
+
+# Engine and procedure suite that every run in a worker process starts from. They are set once
+# per worker by _init_worker(), so only the overrides need to be sent along with each run.
+_base_engine = None
+_base_suite = None
+
+
+class SweepResult:
+    """
+    The node pressures over time from every run of a parameter sweep.
+
+    Members
+    -------
+
+    overrides: list
+        The overrides that each run was made with, in the order that the runs were given.
+
+    nodes: list
+        The nodes of the engine, in the order that their pressures are stored in.
+
+    times: numpy.ndarray
+        The time (in microseconds) since the start of the run at which each sample was taken,
+        or None if only the final state of each run was kept.
+
+    end_times: numpy.ndarray
+        The time (in microseconds) since the start of the run at which each run ended.
+
+    pressures: numpy.ndarray
+        A (R, T, N) array of the pressures at each of N nodes, at each of T samples, for each of
+        R runs. Runs that ended before the last sample are padded with their final state, or
+        with NaN if they ended before taking any samples.
+
+    steps: list
+        For sweeps run with a procedure suite, a list for each run of the (procedure ID,
+        step ID) of the step that had last been executed at each sample, padded the same way
+        as pressures (with None in place of NaN). None for sweeps without a procedure suite.
+    """
+
+    def __init__(self, overrides, nodes, times, end_times, pressures, steps):
+        self.overrides = overrides
+        self.nodes = nodes
+        self.times = times
+        self.end_times = end_times
+        self.pressures = pressures
+        self.steps = steps
+
+
+def _merge(target, source):
+    """Recursively merge the nested dict source into target."""
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+
+
+def grid(*axes):
+    """
+    Return the overrides for every combination of one entry from each of the given axes.
+
+    Each axis is a list of overrides (see run_sweep()). Each combination is merged into a single
+    override, with entries from later axes taking precedence.
+    """
+    overrides = []
+    for combination in itertools.product(*axes):
+        merged = {}
+        for override in combination:
+            _merge(merged, override)
+        overrides.append(merged)
+    return overrides
+
+
+def apply_overrides(plumb, override):
+    """Apply a single override (see run_sweep()) to a plumbing engine."""
+    for key in override:
+        if key not in OVERRIDE_KEYS:
+            raise top.BadInputError(f"Override '{key}' not recognized, must be one of "
+                                    f"{OVERRIDE_KEYS}.")
+
+    for component, state in override.get('states', {}).items():
+        plumb.set_component_state(component, state)
+    for component, teqs in override.get('teqs', {}).items():
+        plumb.set_teq(component, teqs)
+    for node, (pressure, fixed) in override.get('initial_pressures', {}).items():
+        plumb.set_pressure(node, pressure, fixed)
+
+
+def _init_worker(plumb, suite):
+    global _base_engine, _base_suite
+    _base_engine = plumb
+    _base_suite = suite
+
+
+def _run_procedure(plumb, suite, min_delta, max_time, return_resolution):
+    """Run a procedure suite to its last step, then let the engine settle."""
+    proc_eng = top.ProceduresEngine(plumb, suite)
+    interval = return_resolution
+    if interval is None:
+        interval = utils.DEFAULT_TIME_RESOLUTION_MICROS
+
+    def current_step():
+        return (proc_eng.current_procedure_id, proc_eng.current_step.step_id)
+
+    def proceed_while_ready():
+        while proc_eng.ready_to_proceed():
+            proc_eng.proceed()
+            proc_eng.execute_current()
+
+    states = []
+    steps = []
+    end_time = plumb.time + utils.s_to_micros(max_time)
+    proc_eng.execute_current()
+    proceed_while_ready()
+    while plumb.time < end_time and proc_eng.current_step.conditions:
+        proc_eng.step_time(min(interval, end_time - plumb.time))
+        proceed_while_ready()
+        states.append(plumb.current_pressures())
+        steps.append(current_step())
+
+    states = [list(state.values()) for state in states]
+    if plumb.time < end_time:
+        remaining = utils.micros_to_s(end_time - plumb.time)
+        settled = plumb.solve(min_delta, remaining, return_resolution)
+        if return_resolution is None:
+            settled = [list(settled.values())]
+        else:
+            settled = settled.pressures
+        states.extend(settled)
+        steps.extend([current_step()] * len(settled))
+
+    if return_resolution is None:
+        if not states:
+            # No time passed, so the final state is the initial one
+            states = [list(plumb.current_pressures().values())]
+            steps = [current_step()]
+        return np.array(states[-1:]), steps[-1:]
+    return np.array(states).reshape(len(states), len(plumb.plumbing_graph)), steps
+
+
+def _run(override, min_delta, max_time, return_resolution):
+    plumb = copy.deepcopy(_base_engine)
+    start_time = plumb.time
+    apply_overrides(plumb, override)
+
+    steps = None
+    if _base_suite is None:
+        states = plumb.solve(min_delta, max_time, return_resolution)
+        if return_resolution is None:
+            pressures = np.array([list(states.values())])
+        else:
+            pressures = states.pressures
+    else:
+        suite = copy.deepcopy(_base_suite)
+        pressures, steps = _run_procedure(plumb, suite, min_delta, max_time, return_resolution)
+
+    return pressures, steps, plumb.time - start_time
+
+
+def run_sweep(parser, overrides, suite=None, min_delta=0.1, max_time=30, return_resolution=None,
+              max_workers=None):
+    """
+    Simulate a plumbing engine once for each of a list of parameter overrides, in parallel.
+
+    The engine is built from parser once, and sent to each worker process along with suite when
+    the worker starts. Each run then starts from a copy of it with one override applied.
+
+    Without a procedure suite, each run is a call to PlumbingEngine.solve(). With one, each run
+    executes the suite from its starting step, stepping the engine in time and moving on
+    whenever a condition is satisfied, until it reaches a step with no conditions. The engine is
+    then left to settle, as in solve(), for what remains of max_time.
+
+    Parameters
+    ----------
+
+    parser: topside.Parser
+        parser is the PDL parser to build the engine from.
+
+    overrides: iterable
+        overrides holds one dict per run of changes to make to the engine before simulating it,
+        such as those returned by grid(). Each may contain any of:
+            'initial_pressures': {node: (pressure, fixed)}, as for Parser.initial_pressures
+            'teqs': {component_name: {state_id: {edge: teq}}}, as for PlumbingEngine.set_teq()
+            'states': {component_name: state_id}, as for PlumbingEngine.set_component_state()
+
+    suite: topside.ProcedureSuite
+        suite is the procedure suite to execute in each run. If set to None, the engine is only
+        left to settle.
+
+    min_delta: float
+        min_delta is passed through to PlumbingEngine.solve().
+
+    max_time: int
+        max_time is the maximum time in seconds that each run will last.
+
+    return_resolution: int
+        return_resolution specifies (in microseconds) the intervals at which node pressures will
+        be sampled, as in PlumbingEngine.solve(). If set to None, only the final state of each
+        run is kept.
+
+    max_workers: int
+        max_workers is the number of worker processes to run in. If set to None, one is used for
+        each processor.
+
+    Returns a SweepResult.
+    """
+    overrides = list(overrides)
+    plumb = parser.make_engine()
+    # Compile the engine's graph up front so that workers don't each have to.
+    plumb._compiled_graph()
+
+    run = functools.partial(_run, min_delta=min_delta, max_time=max_time,
+                            return_resolution=return_resolution)
+    with concurrent.futures.ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                                initargs=(plumb, suite)) as executor:
+        results = list(executor.map(run, overrides))
+
+    num_samples = max((len(pressures) for pressures, _, _ in results), default=0)
+    all_pressures = np.empty((len(results), num_samples, len(plumb.plumbing_graph)))
+    all_steps = None if suite is None else []
+    for idx, (pressures, steps, _) in enumerate(results):
+        # A run with no samples at all (e.g. one given no time) is padded with NaN
+        padding = pressures[-1] if len(pressures) > 0 else np.nan
+        all_pressures[idx, :len(pressures)] = pressures
+        all_pressures[idx, len(pressures):] = padding
+        if suite is not None:
+            last_step = steps[-1] if steps else None
+            all_steps.append(steps + [last_step] * (num_samples - len(steps)))
+
+    times = None
+    if return_resolution is not None:
+        times = np.arange(1, num_samples + 1) * return_resolution
+    end_times = np.array([end_time for _, _, end_time in results])
+
+    return SweepResult(overrides, list(plumb.plumbing_graph.nodes()), times, end_times,
+                       all_pressures, all_steps)
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+import topside as top
+import topside.sweep as sweep
+
+
+pdl = '''
+name: example
+
+body:
+- component:
+    name: valve
+    edges:
+      edge1:
+        nodes: [0, 1]
+    states:
+      open:
+        edge1: 1
+      closed:
+        edge1: closed
+
+- graph:
+    name: main
+    nodes:
+      A:
+        initial_pressure: 100
+        components:
+          - [valve, 0]
+
+      B:
+        initial_pressure: 0
+        components:
+          - [valve, 1]
+
+    states:
+      valve: open
+'''
+
+proclang = '''
+main:
+    1. PRIMARY: Set valve to closed
+    2. PRIMARY: [1s] Set valve to open
+'''
+
+
+def test_grid():
+    overrides = sweep.grid([{'states': {'valve': 'open'}}, {'states': {'valve': 'closed'}}],
+                           [{'initial_pressures': {'A': (p, False)}} for p in [50, 100, 200]])
+
+    assert len(overrides) == 6
+    assert overrides[0] == {'states': {'valve': 'open'}, 'initial_pressures': {'A': (50, False)}}
+    assert overrides[5] == {'states': {'valve': 'closed'},
+                            'initial_pressures': {'A': (200, False)}}
+
+
+def test_grid_merges_nested_overrides():
+    overrides = sweep.grid([{'teqs': {'valve': {'open': {('A', 'B', 'x'): 1}}}}],
+                           [{'teqs': {'valve': {'open': {('B', 'A', 'x'): 2}}}}])
+
+    assert overrides == [{'teqs': {'valve': {'open': {('A', 'B', 'x'): 1,
+                                                      ('B', 'A', 'x'): 2}}}}]
+
+
+def test_apply_overrides_errors():
+    plumb = top.Parser([pdl], 's').make_engine()
+
+    with pytest.raises(top.BadInputError):
+        sweep.apply_overrides(plumb, {'pressure': {'A': (1, False)}})
+
+
+def test_run_sweep_matches_serial_solves():
+    parser = top.Parser([pdl], 's')
+    overrides = sweep.grid([{'states': {'valve': 'open'}}, {'states': {'valve': 'closed'}}],
+                           [{'initial_pressures': {'A': (p, False)}} for p in [50, 100]])
+
+    result = sweep.run_sweep(parser, overrides, return_resolution=100000, max_workers=2)
+
+    assert result.steps is None
+    assert result.pressures.shape == (4, len(result.times), 2)
+    for override, pressures, end_time in zip(overrides, result.pressures, result.end_times):
+        plumb = parser.make_engine()
+        sweep.apply_overrides(plumb, override)
+        states = plumb.solve(return_resolution=100000)
+
+        assert end_time == plumb.time
+        assert pressures[:len(states)] == pytest.approx(
+            np.array([list(state.values()) for state in states]))
+        assert np.all(pressures[len(states):] == pressures[len(states) - 1])
+
+
+def test_run_sweep_with_procedure():
+    parser = top.Parser([pdl], 's')
+    suite = top.proclang.parse(proclang)
+
+    result = sweep.run_sweep(parser, [{}, {'initial_pressures': {'B': (100, False)}}], suite,
+                             return_resolution=100000, max_workers=2)
+
+    # The valve stays closed for the first second, then the pressures equalize.
+    first = result.steps[0].index(('main', '2'))
+    assert result.times[first] == 1000000
+    assert result.pressures[0, first - 1] == pytest.approx([100, 0])
+    assert result.pressures[0, -1] == pytest.approx([50, 50], abs=1)
+    assert result.pressures[1, -1] == pytest.approx([100, 100])
+    assert result.steps[0][0] == ('main', '1')
+
+
+def test_run_sweep_with_no_time():
+    parser = top.Parser([pdl], 's')
+    suite = top.proclang.parse(proclang)
+
+    result = sweep.run_sweep(parser, [{}, {'initial_pressures': {'B': (100, False)}}], suite,
+                             max_time=0, max_workers=1)
+    assert result.pressures.tolist() == [[[100, 0]], [[100, 100]]]
+    assert result.steps == [[('main', '1')], [('main', '1')]]
+    assert result.end_times.tolist() == [0, 0]
+
+    result = sweep.run_sweep(parser, [{}], suite, max_time=0, return_resolution=100000,
+                             max_workers=1)
+    assert result.pressures.shape == (1, 0, 2)
+    assert result.steps == [[]]